@@ -1,4 +1,6 @@
+import { useEffect, useState } from "react";
 import { Modal, Button, Badge, Card, Form } from "react-bootstrap";
+import { ticketApi } from "../utils/DjangoApiUtil";
 
 export default function TicketDetailModal({
   show,
@@ -10,8 +12,25 @@ export default function TicketDetailModal({
   onCommentChange,
   onCommentSubmit,
 }) {
+  // the ticket only embeds its newest comments, older ones load on demand
+  const [olderComments, setOlderComments] = useState([]);
+  const [commentsNext, setCommentsNext] = useState(null);
+
+  useEffect(() => {
+    setOlderComments([]);
+    setCommentsNext(ticket?.comments_next || null);
+  }, [ticket]);
+
+  const loadOlderComments = async () => {
+    const page = await ticketApi.getCommentPage(commentsNext);
+    setOlderComments((comments) => [...comments, ...page.results]);
+    setCommentsNext(page.next);
+  };
+
   if (!ticket) return null;
 
+  const comments = [...(ticket.comments || []), ...olderComments];
+
   return (
     <Modal show={show} onHide={onHide} size="lg">
       <Modal.Header closeButton>
@@ -64,11 +83,11 @@ export default function TicketDetailModal({
 
         {/* Comments Section */}
         <div>
-          <h6 className="mb-3">Comments ({ticket.comments?.length || 0})</h6>
+          <h6 className="mb-3">Comments ({ticket.comment_count ?? comments.length})</h6>
 
           <div style={{ maxHeight: "300px", overflowY: "auto" }} className="mb-3">
-            {ticket.comments && ticket.comments.length > 0 ? (
-              ticket.comments.map((comment) => (
+            {comments.length > 0 ? (
+              comments.map((comment) => (
                 <Card key={comment.id} className="mb-2">
                   <Card.Body className="py-2">
                     <div className="d-flex justify-content-between">
@@ -84,6 +103,11 @@ export default function TicketDetailModal({
             ) : (
               <p className="text-muted">No comments yet</p>
             )}
+            {commentsNext && (
+              <Button variant="link" size="sm" onClick={loadOlderComments}>
+                Load older comments
+              </Button>
+            )}
           </div>
 
           {/* Add Comment Form */}
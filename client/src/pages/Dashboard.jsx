@@ -21,15 +21,19 @@ export default function Dashboard() {
 
   const loadStats = async () => {
     try {
-      const tickets = await ticketApi.getAll();
-      
+      const [ticketStats, assigned, created] = await Promise.all([
+        ticketApi.getStats(),
+        ticketApi.getAll({ assigned_to: user?.id, fields: "id" }),
+        ticketApi.getAll({ created_by: user?.id, fields: "id" }),
+      ]);
+      const countFor = (buckets, key, value) =>
+        buckets.find((b) => b[key] === value)?.count || 0;
+
       setStats({
-        totalTickets: tickets.length,
-        myTickets: tickets.filter(
-          (t) => t.assigned_to === user?.id || t.created_by === user?.id
-        ).length,
-        openTickets: tickets.filter((t) => t.status === 1).length,
-        urgentTickets: tickets.filter((t) => t.priority === 1).length,
+        totalTickets: ticketStats.total,
+        myTickets: new Set([...assigned, ...created].map((t) => t.id)).size,
+        openTickets: countFor(ticketStats.by_status, "status", 1),
+        urgentTickets: countFor(ticketStats.by_priority, "priority", 1),
       });
     } catch (err) {
       console.error("Failed to load stats:", err);
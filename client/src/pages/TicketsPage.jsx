@@ -56,7 +56,7 @@ export default function TicketsPage() {
       const [ticketsData, categoriesData, teamsData] = await Promise.all([
         ticketApi.getAll(),
         categoryApi.getAll(),
-        teamApi.getAll(),
+        teamApi.getAll({ summary: 1 }),
       ]);
       setTickets(ticketsData);
       setCategories(categoriesData);
@@ -79,7 +79,9 @@ export default function TicketsPage() {
     setShowTicketModal(true);
   };
 
-  const openEditModal = (ticket) => {
+  const openEditModal = async (row) => {
+    // list rows are compact, the form needs the full ticket
+    const ticket = await ticketApi.getById(row.id);
     setModalMode("edit");
     setSelectedTicket(ticket);
     setTicketFormData({
@@ -92,7 +94,8 @@ export default function TicketsPage() {
     setShowTicketModal(true);
   };
 
-  const openDetailModal = async (ticket) => {
+  const openDetailModal = async (row) => {
+    const ticket = await ticketApi.getById(row.id);
     setSelectedTicket(ticket);
     setCommentText("");
     setShowDetailModal(true);
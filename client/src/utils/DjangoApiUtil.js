@@ -86,12 +86,25 @@ export const userApi = {
     return response.data;
   },
 
-  // Get all users (admin/team lead only)
-  getAll: async () => {
-    const response = await api.get("user/all/");
+  // Get one page of the user directory ({ next, previous, results }), filter
+  // with { role, is_active, team } and search with { q } (email/name prefix)
+  getPage: async (params = {}) => {
+    const response = await api.get("user/all/", { params });
     return response.data;
   },
 
+  // Get all users (admin/team lead only) by following the page cursors
+  getAll: async (params = {}) => {
+    const users = [];
+    let response = await api.get("user/all/", { params });
+    users.push(...response.data.results);
+    while (response.data.next) {
+      response = await api.get(response.data.next);
+      users.push(...response.data.results);
+    }
+    return users;
+  },
+
   // Get single user
   getById: async (id) => {
     const response = await api.get(`user/${id}/`);
@@ -120,9 +133,9 @@ export const userApi = {
 
 // ========== TEAM API ==========
 export const teamApi = {
-  // Get all teams
-  getAll: async () => {
-    const response = await api.get("team/");
+  // Get all teams, { summary: 1 } leaves out the member lists
+  getAll: async (params = {}) => {
+    const response = await api.get("team/", { params });
     return response.data;
   },
 
@@ -150,9 +163,9 @@ export const teamApi = {
     return response.data;
   },
 
-  // Get team members
-  getMembers: async (teamId) => {
-    const response = await api.get(`team/${teamId}/members/`);
+  // Get a page of team members: { next, previous, results }
+  getMembers: async (teamId, params = {}) => {
+    const response = await api.get(`team/${teamId}/members/`, { params });
     return response.data;
   },
 
@@ -165,6 +178,14 @@ export const teamApi = {
     return response.data;
   },
 
+  // Add, remove and change the role of many members in one request:
+  // { add: [userIds], remove: [userIds], roles: { lead: [userIds], member: [userIds] } }
+  // Returns { added, removed, updated, unchanged }
+  bulkMembers: async (teamId, changes) => {
+    const response = await api.post(`team/${teamId}/members/bulk/`, changes);
+    return response.data;
+  },
+
   // Update member role (admin/team lead)
   updateMemberRole: async (membershipId, role) => {
     const response = await api.patch(`team/members/${membershipId}/`, { role });
@@ -181,21 +202,68 @@ export const teamApi = {
 
 // ========== TICKET API ==========
 export const ticketApi = {
-  // Get all tickets
-  getAll: async () => {
-    const response = await api.get("ticket/tickets/");
+  // Get one page of tickets ({ next, previous, results })
+  getPage: async (params = {}) => {
+    const response = await api.get("ticket/tickets/", { params });
     return response.data;
   },
 
+  // Get all tickets (optionally filtered) by following the page cursors
+  getAll: async (params = {}) => {
+    const tickets = [];
+    let response = await api.get("ticket/tickets/", { params });
+    tickets.push(...response.data.results);
+    while (response.data.next) {
+      response = await api.get(response.data.next);
+      tickets.push(...response.data.results);
+    }
+    return tickets;
+  },
+
   // Get single ticket
   getById: async (id) => {
     const response = await api.get(`ticket/tickets/${id}/`);
     return response.data;
   },
 
-  // Create ticket
-  create: async (data) => {
-    const response = await api.post("ticket/tickets/", data);
+  // Counts of the tickets the user can see by status, priority, category and team
+  getStats: async () => {
+    const response = await api.get("ticket/stats/");
+    return response.data;
+  },
+
+  // Open / in progress / urgent counts and oldest open ticket per team and
+  // member (admins and team leads), { team: "1,2" } narrows it down
+  getWorkload: async (params = {}) => {
+    const response = await api.get("ticket/workload/", { params });
+    return response.data;
+  },
+
+  // Tickets changed since a change token, plus deleted ticket/comment ids and
+  // tickets reassigned out of view (deleted.hidden). Start with since=0 and
+  // pass back the returned token, 410 means resync from 0
+  getChanges: async (since = 0, params = {}) => {
+    const response = await api.get("ticket/tickets/changes/", { params: { ...params, since } });
+    return response.data;
+  },
+
+  // Live ticket/comment events (EventSource can't send headers, so the token
+  // goes in the query string). Filter with { assigned_to_team, assigned_to }
+  openEventStream: (params = {}) => {
+    const query = new URLSearchParams({ ...params, token: localStorage.getItem("token") || "" });
+    return new EventSource(`${api.defaults.baseURL}ticket/tickets/events/?${query}`);
+  },
+
+  // Update many tickets in one request: [{ id, status, priority, category,
+  // assigned_to, assigned_to_team }], returns a result per item
+  bulkUpdate: async (tickets) => {
+    const response = await api.post("ticket/tickets/bulk/", { tickets });
+    return response.data;
+  },
+
+  // Create ticket, { auto: true } gives a ticket filed to a team to its least loaded member
+  create: async (data, { auto = false } = {}) => {
+    const response = await api.post("ticket/tickets/", data, { params: auto ? { auto: 1 } : {} });
     return response.data;
   },
 
@@ -217,9 +285,27 @@ export const ticketApi = {
     return response.data;
   },
 
-  // Get ticket comments
-  getComments: async (ticketId) => {
-    const response = await api.get(`ticket/tickets/${ticketId}/comments/`);
+  // Assign to the least loaded member of assigned_to_team (default: the ticket's team)
+  autoAssign: async (id, data = {}) => {
+    const response = await api.patch(`ticket/tickets/${id}/assign/`, data, { params: { auto: 1 } });
+    return response.data;
+  },
+
+  // Move an archived ticket back into the live list (editing one does this too)
+  restore: async (id) => {
+    const response = await api.post(`ticket/tickets/${id}/restore/`);
+    return response.data;
+  },
+
+  // Get a page of ticket comments (newest first): { next, previous, results }
+  getComments: async (ticketId, params = {}) => {
+    const response = await api.get(`ticket/tickets/${ticketId}/comments/`, { params });
+    return response.data;
+  },
+
+  // Follow a next link from getComments or a ticket's comments_next
+  getCommentPage: async (url) => {
+    const response = await api.get(url);
     return response.data;
   },
 
@@ -3,6 +3,11 @@ ASGI config for QuikTik project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The ticket event stream (ticket/tickets/events/) holds one connection per
+client, serve it through an ASGI server rather than WSGI workers. The
+ticket export and import progress stream as they go under ASGI too, WSGI
+buffers them.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def _cache_key(key):
+    return f'authn:token:{key}'
+
+
+def _timeout():
+    return getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+
+
+def resolve_token(key):
+    """
+    The Token for key with its user joined, or None
+
+    Served from the cache for AUTH_TOKEN_CACHE_TIMEOUT seconds after the
+    first lookup. Unknown keys aren't cached, a new token works at once.
+    """
+    token = cache.get(_cache_key(key))
+    if token is None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is not None:
+            cache.set(_cache_key(key), token, _timeout())
+    return token
+
+
+async def aresolve_token(key):
+    """resolve_token() for async views"""
+    token = await cache.aget(_cache_key(key))
+    if token is None:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        if token is not None:
+            await cache.aset(_cache_key(key), token, _timeout())
+    return token
+
+
+def forget_tokens(keys):
+    """
+    Drops cached tokens so the next request re-reads token and user
+
+    Called on logout, on user saves (deactivation, role changes) and token
+    deletes, see User_app.signals. Done straight away and again on commit
+    in case another request cached the old rows in between.
+    """
+    cache_keys = [_cache_key(key) for key in keys]
+    if cache_keys:
+        cache.delete_many(cache_keys)
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication without the per-request token/user query
+
+    Same header and errors as DRF's, the token lookup goes through
+    resolve_token() so a warm request authenticates without touching the
+    database. Revocation doesn't wait for the TTL, see forget_tokens().
+    """
+
+    def authenticate_credentials(self, key):
+        token = resolve_token(key)
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
@@ -0,0 +1,144 @@
+import enum
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import cached_property
+from Team_app.models import TeamMembership
+
+
+class Perm(enum.IntFlag):
+    VIEW_ALL_TICKETS = 1
+    ASSIGN_TICKETS = 2
+    CLOSE_TICKETS = 4
+    DELETE_TICKETS = 8
+
+
+# Team flag -> permission it grants every member of the team
+TEAM_FLAGS = {
+    'can_view_all_tickets': Perm.VIEW_ALL_TICKETS,
+    'can_assign_tickets': Perm.ASSIGN_TICKETS,
+    'can_close_tickets': Perm.CLOSE_TICKETS,
+    'can_delete_tickets': Perm.DELETE_TICKETS,
+}
+ALL_PERMS = Perm(sum(TEAM_FLAGS.values()))
+
+
+def _cache_key(user_id):
+    return f'authz:roles:{user_id}'
+
+
+def load_roles(user_id):
+    """
+    (team id -> membership role, Perm bitmask) for a user
+
+    Read from the cache, or from one membership query joined to the team
+    flags on a miss. Kept until a membership or team write invalidates it
+    (Team_app.signals), AUTHZ_CACHE_TIMEOUT only bounds how long a missed
+    invalidation can linger.
+    """
+    key = _cache_key(user_id)
+    roles = cache.get(key)
+    if roles is None:
+        team_roles = {}
+        perms = 0
+        rows = TeamMembership.objects.filter(user_id=user_id).values_list(
+            'team_id', 'role', *(f'team__{flag}' for flag in TEAM_FLAGS)
+        )
+        for team_id, role, *flags in rows:
+            team_roles[team_id] = role
+            for granted, perm in zip(flags, TEAM_FLAGS.values()):
+                if granted:
+                    perms |= perm
+        roles = (team_roles, int(perms))
+        cache.set(key, roles, getattr(settings, 'AUTHZ_CACHE_TIMEOUT', 3600))
+    return roles
+
+
+def invalidate_roles(user_ids):
+    """
+    Drops the cached roles of user_ids
+
+    Done straight away so the writing request sees its own change, and
+    again on commit in case another request cached the old rows in between.
+    Bulk writes that skip model signals call this themselves.
+    """
+    keys = [_cache_key(pk) for pk in set(user_ids)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class AuthContext:
+    """
+    The request user's roles and permissions, loaded once per request
+
+    All team role and permission checks for the request user go through
+    here instead of User.is_team_lead / get_led_teams(), which query on
+    every read. Memberships and the Perm bitmask come from load_roles(), so
+    in the steady state a permission check costs no query at all. Admins
+    hold every Perm.
+
+    Usage: auth = get_auth(request)
+           if auth.is_admin or auth.leads(team.pk): ...
+           if auth.has_perm(Perm.DELETE_TICKETS): ...
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def _roles(self):
+        if not self.user.is_authenticated:
+            return {}, 0
+        return load_roles(self.user.pk)
+
+    @property
+    def team_roles(self):
+        # team id -> membership role
+        return self._roles[0]
+
+    @property
+    def perms(self):
+        if self.is_admin:
+            return ALL_PERMS
+        return Perm(self._roles[1])
+
+    def has_perm(self, perm):
+        return perm in self.perms
+
+    @property
+    def is_admin(self):
+        return self.user.is_authenticated and self.user.is_admin
+
+    @property
+    def is_team_lead(self):
+        return bool(self.led_team_ids)
+
+    @cached_property
+    def led_team_ids(self):
+        return frozenset(team for team, role in self.team_roles.items() if role == TeamMembership.TeamRole.LEAD)
+
+    @property
+    def team_ids(self):
+        return frozenset(self.team_roles)
+
+    def leads(self, team_id):
+        return team_id in self.led_team_ids
+
+    def is_member(self, team_id):
+        return team_id in self.team_roles
+
+
+def get_auth(request):
+    """
+    The AuthContext for request.user, built on first use
+
+    Kept on the underlying HttpRequest so the DRF request, permissions and
+    serializers handed the same request all share it.
+    """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    auth = getattr(http_request, '_auth_context', None)
+    if auth is None or auth.user is not user:
+        auth = http_request._auth_context = AuthContext(user)
+    return auth
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+# sent instead of the queued messages when a subscriber falls too far behind,
+# it should catch up from the changes feed
+RESYNC = {'type': 'resync'}
+
+
+class BaseBackend:
+    """
+    Pub/sub backend for the event stream
+
+    publish() is called from request threads once a transaction commits,
+    subscribe() from the event loop serving a stream. A backend for several
+    server processes (Redis, PostgreSQL LISTEN/NOTIFY, ...) implements the
+    same two methods and is selected with settings.EVENT_BROKER.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """Returns a Subscription, call close() on it when the client goes away"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        pass
+
+
+class Subscription:
+    """One subscriber's queue, fed thread-safely and read on its event loop"""
+
+    def __init__(self, backend, channel, queue_size):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # the loop is gone, the stream ended without closing us
+            self.close()
+
+    def _put(self, message):
+        if self.queue.full():
+            # slow consumer, drop the backlog and tell it to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or None if nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class LocalBackend(BaseBackend):
+    """
+    In-process fan-out
+
+    Enough for a single ASGI worker and for tests, with several workers each
+    one only sees the events published in its own process.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.get(subscription.channel, set()).discard(subscription)
+
+
+_broker = None
+
+
+def get_broker():
+    """The configured backend, built once per process"""
+    global _broker
+    if _broker is None:
+        config = getattr(settings, 'EVENT_BROKER', {})
+        backend = import_string(config.get('BACKEND', 'QuikTik.broker.LocalBackend'))
+        _broker = backend(**config.get('OPTIONS', {}))
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'EVENT_BROKER':
+        _broker = None
@@ -0,0 +1,50 @@
+import hashlib
+from functools import wraps
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, parts):
+    # the query string is part of the representation (?fields=, ?expand=)
+    raw = '|'.join(str(part) for part in parts) + '|' + request.META.get('QUERY_STRING', '')
+    return quote_etag(hashlib.sha256(raw.encode()).hexdigest()[:32])
+
+
+def conditional_get(validator):
+    """
+    Conditional GET for APIView methods
+
+    validator(request, *args, **kwargs) returns (parts, last_modified), or None
+    when the resource doesn't exist. parts must change whenever the response
+    body would, it is hashed into a strong ETag. Matching If-None-Match /
+    If-Modified-Since requests get a 304 before the view runs, so keep the
+    validator to one cheap query.
+
+    Usage:
+        @conditional_get(ticket_validator)
+        def get(self, request, pk): ...
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            result = validator(request, *args, **kwargs)
+            if result is None:
+                return method(view, request, *args, **kwargs)
+
+            parts, last_modified = result
+            etag = make_etag(request, parts)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if timestamp:
+                    response.headers.setdefault('Last-Modified', http_date(timestamp))
+                # per-user data: let the browser keep it but always revalidate
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
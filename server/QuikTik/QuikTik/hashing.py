@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class PoolBusy(Exception):
+    """Raised instead of queueing when the hashing pool is full"""
+
+
+class HashingPool:
+    """
+    A fixed number of threads for password hashing, shared by async views
+
+    PBKDF2, scrypt, Argon2 and bcrypt all release the GIL while hashing, so
+    threads hash in parallel without a process pool. At most workers +
+    queue_size jobs are accepted, past that run() raises PoolBusy straight
+    away so a burst of sign-ins gets 503s instead of an ever growing queue.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self.limit = workers + queue_size
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.limit:
+                raise PoolBusy
+            self.pending += 1
+        # counted until the job finishes, even if the request waiting on it is gone
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, sized by PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or min(4, os.cpu_count() or 1)
+            _pool = HashingPool(workers, getattr(settings, 'PASSWORD_HASH_QUEUE', 32))
+        return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    global _pool
+    if setting in ('PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_QUEUE'):
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = None
+
+
+async def ahash_password(raw_password):
+    """make_password() on the pool"""
+    return await get_pool().run(make_password, raw_password)
+
+
+async def acheck_password(raw_password, encoded):
+    """
+    (is_correct, new_encoded) with the hashing done on the pool
+
+    new_encoded is only set when the password is right and was stored with
+    an older hasher or weaker parameters than PASSWORD_HASHERS[0] now uses,
+    the caller saves it so the user is upgraded on this login. Pass None
+    for encoded when there is no such user, the default hasher still runs
+    once so unknown emails take as long as wrong passwords.
+    """
+    if encoded is None:
+        await ahash_password(raw_password)
+        return False, None
+    is_correct, must_update = await get_pool().run(verify_password, raw_password, encoded)
+    if is_correct and must_update:
+        return True, await ahash_password(raw_password)
+    return is_correct, None
@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor (keyset) pagination over a fixed ordering
+
+    Each page is a range scan that starts right after the last row of the
+    previous one, so page N costs the same as page 1 no matter how deep it is.
+    The last ordering field must be unique so a position is never ambiguous.
+
+    Usage: paginator.paginate_queryset(queryset, request, view=self)
+           paginator.get_paginated_response(serializer.data)
+    """
+
+    ordering = ('-created_at', 'id')
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = list(self.ordering)
+        if reverse:
+            # walk backwards from the cursor, then flip the page back around
+            ordering = [self._flip(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek(queryset, ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.first_position = self._position(rows[0]) if rows else None
+        self.last_position = self._position(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        default = api_settings.PAGE_SIZE or 50
+        if self.page_size_query_param:
+            try:
+                requested = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                return default
+            if requested > 0:
+                return min(requested, self.max_page_size)
+        return default
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def link_after(self, base_url, obj):
+        """
+        Next-page link for a first page served some other way, e.g. the latest
+        comments embedded in a ticket. obj is the last row of that page.
+        """
+        self.base_url = base_url
+        return self.encode_cursor(self._position(obj), reverse=False)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # only what _position writes, a None or a nested value can't be seeked past
+        if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def _position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                # as text, a JSON float could come back as a different number
+                value = str(value)
+            position.append(value)
+        return position
+
+    def _seek(self, queryset, ordering, position):
+        # (a, b) "after" (x, y) expands to: a > x OR (a = x AND b > y)
+        # per-field direction is honoured so mixed orderings still work
+        values = []
+        for field, raw in zip(ordering, position):
+            name = field.lstrip('-')
+            try:
+                target = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # annotations (e.g. a search rank) convert by their output field
+                target = queryset.query.annotations[name].output_field
+            try:
+                values.append(target.to_python(raw))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        clause = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values):
+                term &= Q(**{prev_field.lstrip('-'): prev_value})
+            clause |= term
+        return clause
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from .authz import get_auth
 
 
 class IsAdmin(BasePermission):
@@ -70,7 +71,5 @@ class SpecialPermission(BasePermission):
             return False
         
         # Admin or team lead can perform special actions
-        return (
-            request.user.is_admin or
-            request.user.is_team_lead()
-        )
\ No newline at end of file
+        auth = get_auth(request)
+        return auth.is_admin or auth.is_team_lead
@@ -115,15 +115,53 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Threads the async login/register views hash passwords on (QuikTik.hashing),
+# None for min(4, CPU count). Up to PASSWORD_HASH_QUEUE more wait for a
+# thread, further sign-ins get a 503 until the queue drains
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_QUEUE = 32
+
 AUTH_USER_MODEL = "User_app.User"
 
 # Uncomment this when ready to impliment tokens
 REST_FRAMEWORK = {
        'DEFAULT_AUTHENTICATION_CLASSES': [
-           'rest_framework.authentication.TokenAuthentication',
+           # TokenAuthentication with the token/user lookup cached, see QuikTik.authentication
+           'QuikTik.authentication.CachedTokenAuthentication',
        ],
+       'DEFAULT_PAGINATION_CLASS': 'QuikTik.pagination.KeysetPagination',
+       # default page size for list endpoints, clients can ask for up to 200 with ?page_size=
+       'PAGE_SIZE': 50,
    }
 
+# Pub/sub behind the ticket event stream (ticket/tickets/events/). LocalBackend
+# fans out inside one process, running several ASGI workers needs a shared
+# backend implementing QuikTik.broker.BaseBackend
+EVENT_BROKER = {
+    'BACKEND': 'QuikTik.broker.LocalBackend',
+    'OPTIONS': {'queue_size': 100},
+}
+
+# Holds the per-user roles and permission bitmask (QuikTik.authz). The
+# local-memory default is per process, with several workers point this at
+# a shared cache (Redis, Memcached) so invalidations reach all of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+AUTHZ_CACHE_TIMEOUT = 3600
+# seconds an API token and its user are served from the cache, logout,
+# deactivation and role changes drop the entry straight away
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+# seconds the ticket workload report (ticket/workload/) is served from the
+# cache, ticket writes drop it straight away
+WORKLOAD_REPORT_CACHE_TIMEOUT = 30
+
+# Resolved and closed tickets untouched for this many days are moved to the
+# archive tables by `manage.py archive_tickets` (run it from cron)
+TICKET_ARCHIVE_AFTER_DAYS = 180
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
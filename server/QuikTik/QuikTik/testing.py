@@ -0,0 +1,83 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from QuikTik.authentication import resolve_token
+from QuikTik.authz import load_roles
+from Team_app.models import Team, TeamMembership
+from Ticket_app.models import Category, Comment, Ticket
+from User_app.models import User
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Fixture and helpers for query-count tests, shared by the apps' tests
+
+    Every request goes through real token authentication. Budgets are for
+    the steady state, assertQueryBudget warms the token and role caches
+    first, so they cover what the endpoint itself queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin@example.com', 'pass1234a', role=User.Role.ADMIN)
+        cls.lead = User.objects.create_user('lead@example.com', 'pass1234a', first_name='Lea', last_name='Lead')
+        cls.member = User.objects.create_user('member@example.com', 'pass1234a', first_name='Mem')
+        cls.team = Team.objects.create(name='Support')
+        cls.other_team = Team.objects.create(name='Network')
+        TeamMembership.objects.create(user=cls.lead, team=cls.team, role=TeamMembership.TeamRole.LEAD)
+        TeamMembership.objects.create(user=cls.member, team=cls.team)
+        TeamMembership.objects.create(user=cls.member, team=cls.other_team)
+        cls.category = Category.objects.create(name='Hardware')
+        cls.tokens = {user.pk: Token.objects.create(user=user).key for user in (cls.admin, cls.lead, cls.member)}
+        cls.make_tickets(5)
+        cls.ticket = Ticket.objects.first()
+        call_command('reconcile_ticket_stats', stdout=StringIO())
+
+    def setUp(self):
+        # rolled back rows don't invalidate the cached roles, start cold
+        cache.clear()
+
+    @classmethod
+    def make_tickets(cls, count):
+        for i in range(count):
+            ticket = Ticket.objects.create(
+                title=f'Ticket {i}',
+                description='Printer on fire',
+                category=cls.category,
+                created_by=cls.member,
+                assigned_to=cls.lead,
+                assigned_to_team=cls.team,
+            )
+            Comment.objects.create(ticket=ticket, author=cls.lead, content='Looking')
+            Comment.objects.create(ticket=ticket, author=cls.member, content='Thanks')
+            Ticket.objects.filter(pk=ticket.pk).refresh_comment_stats()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.tokens[user.pk]}')
+        return client
+
+    def warm_caches(self, user):
+        # budgets are for the steady state, with the token and roles already cached
+        resolve_token(self.tokens[user.pk])
+        load_roles(user.pk)
+
+    def assertQueryBudget(self, budget, user, method, url, data=None, status_code=None):
+        # writes that run in a transaction also count its SAVEPOINT/RELEASE pair
+        client = self.client_for(user)
+        self.warm_caches(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(client, method)(url, data, format='json')
+        if status_code is not None:
+            self.assertEqual(response.status_code, status_code, response.content)
+        queries = '\n'.join(q['sql'] for q in ctx.captured_queries)
+        self.assertLessEqual(
+            len(ctx), budget,
+            f'{method.upper()} {url} ran {len(ctx)} queries (budget {budget}):\n{queries}'
+        )
+        return response
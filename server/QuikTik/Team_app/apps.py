@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TeamAppConfig(AppConfig):
     name = 'Team_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
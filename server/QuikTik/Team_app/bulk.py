@@ -0,0 +1,128 @@
+from collections import Counter
+from django.utils import timezone
+from QuikTik.authz import invalidate_roles
+from Ticket_app.workload import invalidate_workload_report
+from User_app.models import User
+from .models import TeamMembership
+from .signals import batched_membership_changes
+
+
+MAX_USERS = 1000
+ROLES = tuple(TeamMembership.TeamRole.values)
+
+
+class BulkError(Exception):
+    """Rejects the whole batch, users holds the offending ids if any"""
+
+    def __init__(self, message, users=()):
+        super().__init__(message)
+        self.users = sorted(users)
+
+
+def _user_ids(value, name):
+    if value is None:
+        return set()
+    if not isinstance(value, list) or not all(type(pk) is int for pk in value):
+        raise BulkError(f'{name} must be a list of user ids')
+    return set(value)
+
+
+def parse_member_changes(data):
+    """
+    (add, remove, roles) from {"add": [...], "remove": [...], "roles": {"lead": [...], ...}}
+
+    add and remove are sets of user ids, roles maps a role to a set of ids.
+    Checked as a whole: nobody may be both removed and added or re-roled,
+    or be given two roles.
+    """
+    if not isinstance(data, dict):
+        raise BulkError('Expected an object with add, remove and/or roles')
+    add = _user_ids(data.get('add'), 'add')
+    remove = _user_ids(data.get('remove'), 'remove')
+    raw_roles = data.get('roles') or {}
+    if not isinstance(raw_roles, dict) or set(raw_roles) - set(ROLES):
+        raise BulkError(f"roles maps {', '.join(ROLES)} to lists of user ids")
+    roles = {role: _user_ids(ids, f'roles.{role}') for role, ids in raw_roles.items()}
+
+    given = [pk for ids in roles.values() for pk in ids]
+    twice = {pk for pk, count in Counter(given).items() if count > 1}
+    if twice:
+        raise BulkError('Users given more than one role', twice)
+    if remove & (add | set(given)):
+        raise BulkError('Users both removed and added or changed', remove & (add | set(given)))
+    if not (add or remove or given):
+        raise BulkError('Nothing to change')
+    if len(add | remove | set(given)) > MAX_USERS:
+        raise BulkError(f'At most {MAX_USERS} users per request')
+    return add, remove, roles
+
+
+def apply_member_changes(team, add=(), remove=(), roles=None):
+    """
+    Adds, removes and re-roles members of team in a fixed number of queries
+
+    One lookup of the current memberships and of the users to add, then a
+    bulk_create and a read of the rows it left, a delete and one update per
+    role. New members join as members unless roles names them. Lock the
+    team row first (select_for_update inside a transaction), as the single
+    add does, so concurrent changes to a team apply one after the other and
+    each diff is exact. Nothing is written when a user to add doesn't exist
+    or a role change names someone who isn't and won't be a member,
+    BulkError is raised instead.
+
+    Returns {'added': [{'user', 'role'}], 'removed': [ids],
+             'updated': [{'user', 'role', 'previous'}], 'unchanged': [ids]}
+    """
+    add, remove = set(add), set(remove)
+    role_of = {pk: role for role, ids in (roles or {}).items() for pk in ids}
+    wanted = add | remove | set(role_of)
+    existing = dict(TeamMembership.objects.filter(team=team, user_id__in=wanted).values_list('user_id', 'role'))
+
+    new = add - set(existing)
+    if new:
+        missing = new - set(User.objects.filter(pk__in=new).values_list('pk', flat=True))
+        if missing:
+            raise BulkError('Users not found', missing)
+    strangers = set(role_of) - set(existing) - add
+    if strangers:
+        raise BulkError('Not members of this team', strangers)
+
+    added = []
+    if new:
+        # a member someone else added first is skipped rather than failing the
+        # batch, added then reports the rows that are there afterwards
+        TeamMembership.objects.bulk_create(
+            (TeamMembership(team=team, user_id=pk, role=role_of.get(pk, TeamMembership.TeamRole.MEMBER))
+             for pk in new),
+            ignore_conflicts=True,
+        )
+        rows = TeamMembership.objects.filter(team=team, user_id__in=new).values_list('user_id', 'role')
+        added = [{'user': pk, 'role': role} for pk, role in sorted(rows)]
+
+    removed = sorted(remove & set(existing))
+    if removed:
+        # post_delete receivers still run, the membership one leaves its
+        # invalidation to the single one below
+        with batched_membership_changes():
+            TeamMembership.objects.filter(team=team, user_id__in=removed).delete()
+
+    updated = [
+        {'user': pk, 'role': role, 'previous': existing[pk]}
+        for pk, role in sorted(role_of.items()) if pk in existing and existing[pk] != role
+    ]
+    now = timezone.now()
+    for role in roles or {}:
+        ids = [row['user'] for row in updated if row['role'] == role]
+        if ids:
+            TeamMembership.objects.filter(team=team, user_id__in=ids).update(role=role, updated_at=now)
+
+    # bulk_create and update() send no signals, removals skipped theirs
+    invalidate_roles([*new, *removed, *(row['user'] for row in updated)])
+    invalidate_workload_report()
+    changed = new | set(removed) | {row['user'] for row in updated}
+    return {
+        'added': added,
+        'removed': removed,
+        'updated': updated,
+        'unchanged': sorted(wanted - changed),
+    }
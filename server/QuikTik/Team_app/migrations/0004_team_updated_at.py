@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0003_alter_team_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='teammembership',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0004_team_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teammembership',
+            index=models.Index(fields=['team', 'id'], name='membership_team_page_idx'),
+        ),
+    ]
@@ -1,6 +1,20 @@
 from django.db import models
 
 
+class TeamQuerySet(models.QuerySet):
+    def with_members(self, summary=False):
+        """
+        Teams with member_count annotated and, unless summary, their
+        memberships and each member's user loaded in one more query
+        """
+        queryset = self.annotate(member_count=models.Count('memberships'))
+        if not summary:
+            queryset = queryset.prefetch_related(models.Prefetch(
+                'memberships', queryset=TeamMembership.objects.select_related('user').order_by('id'),
+            ))
+        return queryset
+
+
 class Team(models.Model):
     name = models.CharField(max_length=50, unique=True)
     can_view_all_tickets = models.BooleanField(default=False)
@@ -8,6 +22,7 @@ class Team(models.Model):
     can_close_tickets = models.BooleanField(default=False)
     can_delete_tickets = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     members = models.ManyToManyField(
         'User_app.User',
@@ -15,6 +30,8 @@ class Team(models.Model):
         related_name='teams'
     )
     
+    objects = TeamQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
 
@@ -40,9 +57,14 @@ class TeamMembership(models.Model):
         default=TeamRole.MEMBER
     )
     joined_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['user', 'team']
+        indexes = [
+            # a team's members page by page (TeamMemberListView)
+            models.Index(fields=['team', 'id'], name='membership_team_page_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.team.name} ({self.role})"
\ No newline at end of file
@@ -14,6 +14,11 @@ class TeamMembershipSerializer(serializers.ModelSerializer):
 
 
 class TeamSerializer(serializers.ModelSerializer):
+    """
+    Serialize Team.objects.with_members() rows, member_count and members then
+    come from the annotation and prefetch. context['summary'] leaves out
+    the members.
+    """
     members = TeamMembershipSerializer(source='memberships', many=True, read_only=True)
     member_count = serializers.SerializerMethodField()
 
@@ -28,6 +33,9 @@ class TeamSerializer(serializers.ModelSerializer):
         fields = super().get_fields()
         request = self.context.get('request')
         
+        if self.context.get('summary'):
+            fields.pop('members', None)
+        
         # Only admin can see permission flags
         if request and not request.user.is_admin:
             fields.pop('can_view_all_tickets', None)
@@ -38,4 +46,6 @@ class TeamSerializer(serializers.ModelSerializer):
         return fields
     
     def get_member_count(self, obj):
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
         return obj.memberships.count()
\ No newline at end of file
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from QuikTik.authz import invalidate_roles
+from Ticket_app.workload import invalidate_workload_report
+from .models import Team, TeamMembership
+
+
+# the cached roles and permission bitmask (QuikTik.authz.load_roles) come
+# from memberships and team flags, drop them whenever either changes.
+# Deleting a team cascades to its memberships, which land in post_delete below.
+# The cached workload report lists teams and their members, it goes too.
+
+
+_batched = ContextVar('batched_membership_changes', default=False)
+
+
+@contextmanager
+def batched_membership_changes():
+    """
+    Skips membership_changed's per-row invalidation inside the block
+
+    For set-based writes (Team_app.bulk) that invalidate every user they
+    touch once afterwards. Other receivers still run.
+    """
+    token = _batched.set(True)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+
+
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def membership_changed(sender, instance, **kwargs):
+    if _batched.get():
+        return
+    invalidate_roles([instance.user_id])
+    invalidate_workload_report()
+
+
+@receiver(post_save, sender=Team)
+def team_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_roles(instance.memberships.values_list('user_id', flat=True))
+        invalidate_workload_report()
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    invalidate_workload_report()
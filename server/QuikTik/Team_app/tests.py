@@ -1,3 +1,94 @@
-from django.test import TestCase
+from unittest.mock import patch
+from QuikTik.authz import load_roles
+from QuikTik.testing import QueryBudgetTestCase
+from User_app.models import User
 
-# Create your tests here.
+
+class TeamQueryBudgetTests(QueryBudgetTestCase):
+    def test_team_list(self):
+        # validator, teams with counts, memberships with users
+        response = self.assertQueryBudget(3, self.admin, 'get', '/api/v1/team/', status_code=200)
+        support = next(team for team in response.data if team['id'] == self.team.pk)
+        self.assertEqual(support['member_count'], 2)
+        self.assertEqual({member['user_email'] for member in support['members']}, {'lead@example.com', 'member@example.com'})
+        self.assertEqual(support['members'][0]['team_name'], 'Support')
+
+    def test_team_list_summary(self):
+        response = self.assertQueryBudget(2, self.admin, 'get', '/api/v1/team/?summary=1', status_code=200)
+        self.assertNotIn('members', response.data[0])
+        self.assertEqual({team['id']: team['member_count'] for team in response.data}, {self.team.pk: 2, self.other_team.pk: 1})
+
+    def test_team_detail(self):
+        self.assertQueryBudget(2, self.admin, 'get', f'/api/v1/team/{self.team.pk}/', status_code=200)
+
+    def test_team_members(self):
+        self.assertQueryBudget(2, self.lead, 'get', f'/api/v1/team/{self.team.pk}/members/', status_code=200)
+
+    def test_team_members_paginate(self):
+        client = self.client_for(self.lead)
+        page = client.get(f'/api/v1/team/{self.team.pk}/members/?page_size=1').data
+        self.assertEqual(page['results'][0]['user'], self.lead.pk)
+        page = client.get(page['next']).data
+        self.assertEqual([row['user_email'] for row in page['results']], ['member@example.com'])
+        self.assertIsNone(page['next'])
+
+
+class TeamMemberBulkTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.newcomers = [User.objects.create_user(f'new{i}@example.com', 'pass1234a') for i in range(3)]
+
+    def url(self, team=None):
+        return f'/api/v1/team/{(team or self.team).pk}/members/bulk/'
+
+    def test_diff(self):
+        new = [user.pk for user in self.newcomers]
+        load_roles(self.member.pk)
+        # team lock, memberships, users, insert, read back, one update per role, savepoint pair
+        response = self.assertQueryBudget(8, self.lead, 'post', self.url(), {
+            'add': new + [self.lead.pk],
+            'remove': [self.admin.pk],
+            'roles': {'lead': [new[0], self.member.pk]},
+        }, status_code=200)
+        self.assertEqual(response.data, {
+            'added': [{'user': new[0], 'role': 'lead'}, {'user': new[1], 'role': 'member'}, {'user': new[2], 'role': 'member'}],
+            'removed': [],
+            'updated': [{'user': self.member.pk, 'role': 'lead', 'previous': 'member'}],
+            'unchanged': sorted([self.lead.pk, self.admin.pk]),
+        })
+        self.assertEqual(self.team.memberships.count(), 5)
+        # the member's cached roles were dropped
+        self.assertEqual(load_roles(self.member.pk)[0][self.team.pk], 'lead')
+
+        load_roles(new[0])
+        response = self.client_for(self.lead).post(self.url(), {'remove': new}, format='json')
+        self.assertEqual(response.data['removed'], new)
+        self.assertEqual(self.team.memberships.count(), 2)
+        self.assertNotIn(self.team.pk, load_roles(new[0])[0])
+
+    def test_invalidates_once_per_batch(self):
+        new = [user.pk for user in self.newcomers]
+        client = self.client_for(self.lead)
+        client.post(self.url(), {'add': new}, format='json')
+        with patch('Team_app.signals.invalidate_roles') as per_row, patch('Team_app.bulk.invalidate_roles') as batch:
+            response = client.post(self.url(), {'remove': new[:2], 'roles': {'lead': [new[2]]}}, format='json')
+        self.assertEqual(response.data['removed'], new[:2])
+        per_row.assert_not_called()
+        batch.assert_called_once_with([*new[:2], new[2]])
+
+    def test_rejects_whole_batch(self):
+        client = self.client_for(self.admin)
+        response = client.post(self.url(), {'add': [self.newcomers[0].pk, 9999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['users'], [9999])
+        self.assertFalse(self.team.memberships.filter(user=self.newcomers[0]).exists())
+
+        for body in ({'roles': {'lead': [self.newcomers[1].pk]}}, {'add': [1], 'remove': [1]},
+                     {'roles': {'owner': [1]}}, {'add': 'all'}, {}):
+            self.assertEqual(client.post(self.url(), body, format='json').status_code, 400, body)
+
+    def test_lead_of_other_team_forbidden(self):
+        response = self.client_for(self.lead).post(
+            self.url(self.other_team), {'add': [self.newcomers[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
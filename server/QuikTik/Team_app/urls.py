@@ -3,6 +3,7 @@ from .views import (
     TeamListView,
     TeamDetailView,
     TeamMemberListView,
+    TeamMemberBulkView,
     TeamMemberDetailView
 )
 
@@ -10,5 +11,6 @@ urlpatterns = [
     path('', TeamListView.as_view(), name='team-list'),
     path('<int:pk>/', TeamDetailView.as_view(), name='team-detail'),
     path('<int:team_pk>/members/', TeamMemberListView.as_view(), name='team-members'),
+    path('<int:team_pk>/members/bulk/', TeamMemberBulkView.as_view(), name='team-members-bulk'),
     path('members/<int:pk>/', TeamMemberDetailView.as_view(), name='team-member-detail'),
 ]
\ No newline at end of file
@@ -1,18 +1,48 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from QuikTik.authz import get_auth
+from QuikTik.conditional import conditional_get
+from QuikTik.pagination import KeysetPagination
 from User_app.models import User
+from .bulk import BulkError, apply_member_changes, parse_member_changes
 from .models import Team, TeamMembership
 from .serializers import TeamSerializer, TeamMembershipSerializer
 
 
+def wants_summary(request):
+    return request.query_params.get('summary') in ('1', 'true')
+
+
+def team_list_validator(request):
+    # teams embed their memberships and each member's name and email
+    summary = Team.objects.aggregate(
+        team_count=Count('id', distinct=True),
+        teams_modified=Max('updated_at'),
+        membership_count=Count('memberships', distinct=True),
+        memberships_modified=Max('memberships__updated_at'),
+        members_modified=Max('memberships__user__updated_at'),
+    )
+    last_modified = max(
+        (value for key, value in summary.items() if key.endswith('_modified') and value),
+        default=None,
+    )
+    # admins also see the permission flags, ?summary=1 leaves out the members
+    return (request.user.is_admin, wants_summary(request), *summary.values()), last_modified
+
+
 class TeamListView(APIView):
+    """Teams with their members, ?summary=1 for just the teams and member counts"""
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(team_list_validator)
     def get(self, request):
-        teams = Team.objects.all()
-        serializer = TeamSerializer(teams, many=True, context={'request': request})
+        summary = wants_summary(request)
+        teams = Team.objects.with_members(summary=summary)
+        serializer = TeamSerializer(teams, many=True, context={'request': request, 'summary': summary})
         return Response(serializer.data)
     
     def post(self, request):
@@ -32,7 +62,7 @@ class TeamDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            team = Team.objects.get(pk=pk)
+            team = Team.objects.with_members().get(pk=pk)
         except Team.DoesNotExist:
             return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -45,7 +75,7 @@ class TeamDetailView(APIView):
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            team = Team.objects.get(pk=pk)
+            team = Team.objects.with_members().get(pk=pk)
         except Team.DoesNotExist:
             return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -70,7 +100,10 @@ class TeamDetailView(APIView):
 
 
 class TeamMemberListView(APIView):
+    """A team's memberships in the order they were added, cursor paginated"""
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ('id',)
     
     def get(self, request, team_pk):
         try:
@@ -78,19 +111,25 @@ class TeamMemberListView(APIView):
         except Team.DoesNotExist:
             return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        memberships = team.memberships.all()
-        serializer = TeamMembershipSerializer(memberships, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        paginator.ordering = self.ordering
+        # the related manager hands each membership this team, only users need the join
+        page = paginator.paginate_queryset(team.memberships.select_related('user'), request, view=self)
+        serializer = TeamMembershipSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
+    @transaction.atomic
     def post(self, request, team_pk):
+        # the team lock queues this behind a bulk change to the same team (Team_app.bulk)
         try:
-            team = Team.objects.get(pk=team_pk)
+            team = Team.objects.select_for_update().get(pk=team_pk)
         except Team.DoesNotExist:
             return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Admin can add to any team, team leads can only add to their own teams
-        if not request.user.is_admin:
-            if not team.memberships.filter(user=request.user, role='lead').exists():
+        auth = get_auth(request)
+        if not auth.is_admin:
+            if not auth.leads(team.pk):
                 return Response({'error': 'Must be team lead of this team'}, status=status.HTTP_403_FORBIDDEN)
         
         user_id = request.data.get('user_id')
@@ -101,14 +140,47 @@ class TeamMemberListView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if TeamMembership.objects.filter(user=user, team=team).exists():
+        # the unique (user, team) constraint catches duplicates, even two racing adds
+        try:
+            with transaction.atomic():
+                membership = TeamMembership.objects.create(user=user, team=team, role=role)
+        except IntegrityError:
             return Response({'error': 'User already in team'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        membership = TeamMembership.objects.create(user=user, team=team, role=role)
         serializer = TeamMembershipSerializer(membership)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class TeamMemberBulkView(APIView):
+    """
+    Adds, removes and changes the role of many members at once
+
+    POST {"add": [4, 5, 6], "remove": [7], "roles": {"lead": [4], "member": [8]}}
+    New members join as members unless roles says otherwise. The batch is
+    validated as a whole and applies completely or not at all, the response
+    lists who was added, removed, updated and left unchanged.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, team_pk):
+        # Admin can change any team, team leads only their own
+        auth = get_auth(request)
+        with transaction.atomic():
+            team = Team.objects.select_for_update().filter(pk=team_pk).first()
+            if team is None:
+                return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not (auth.is_admin or auth.leads(team.pk)):
+                return Response({'error': 'Must be team lead of this team'}, status=status.HTTP_403_FORBIDDEN)
+            
+            try:
+                diff = apply_member_changes(team, *parse_member_changes(request.data))
+            except BulkError as error:
+                body = {'error': str(error)}
+                if error.users:
+                    body['users'] = error.users
+                return Response(body, status=status.HTTP_400_BAD_REQUEST)
+        return Response(diff)
+
+
 class TeamMemberDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -119,8 +191,9 @@ class TeamMemberDetailView(APIView):
             return Response({'error': 'Membership not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Admin can update any, team leads can only update their own teams
-        if not request.user.is_admin:
-            if not membership.team.memberships.filter(user=request.user, role='lead').exists():
+        auth = get_auth(request)
+        if not auth.is_admin:
+            if not auth.leads(membership.team_id):
                 return Response({'error': 'Must be team lead of this team'}, status=status.HTTP_403_FORBIDDEN)
         
         role = request.data.get('role')
@@ -138,8 +211,9 @@ class TeamMemberDetailView(APIView):
             return Response({'error': 'Membership not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Admin can remove from any team, team leads can only remove from their own teams
-        if not request.user.is_admin:
-            if not membership.team.memberships.filter(user=request.user, role='lead').exists():
+        auth = get_auth(request)
+        if not auth.is_admin:
+            if not auth.leads(membership.team_id):
                 return Response({'error': 'Must be team lead of this team'}, status=status.HTTP_403_FORBIDDEN)
         
         membership.delete()
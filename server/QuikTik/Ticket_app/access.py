@@ -0,0 +1,71 @@
+from django.db.models import Q
+from QuikTik.authz import Perm
+from .models import Ticket
+
+
+# what a can_close_tickets team member may set on a ticket they can't otherwise edit
+CLOSING_STATUSES = (Ticket.Status.RESOLVED, Ticket.Status.CLOSED)
+
+# Permission rules for ticket writes, shared by the ticket views and
+# bulk updates. auth is the request's QuikTik.authz.AuthContext, so none of
+# these query once its roles are cached.
+
+
+def can_edit(auth, created_by_id, changes=None):
+    """
+    Admins, team leads and the creator edit any field, members of a
+    can_close_tickets team may only resolve or close. changes is the
+    submitted data, None checks general edit access.
+    """
+    if auth.is_admin or auth.is_team_lead or created_by_id == auth.user.id:
+        return True
+    if changes is None or set(changes) != {'status'} or not auth.has_perm(Perm.CLOSE_TICKETS):
+        return False
+    try:
+        return int(changes['status']) in CLOSING_STATUSES
+    except (TypeError, ValueError):
+        return False
+
+
+def can_delete(auth, created_by_id):
+    return (
+        auth.is_admin or auth.is_team_lead or created_by_id == auth.user.id
+        or auth.has_perm(Perm.DELETE_TICKETS)
+    )
+
+
+def can_assign(auth):
+    return auth.is_admin or auth.is_team_lead or auth.has_perm(Perm.ASSIGN_TICKETS)
+
+
+def assigns_anywhere(auth):
+    # can_assign_tickets teams dispatch like admins, plain leads only within their own teams
+    return auth.has_perm(Perm.ASSIGN_TICKETS)
+
+
+def visible_tickets(auth, queryset):
+    """
+    queryset (live or archived tickets) narrowed to what auth.user may read
+
+    Admins and can_view_all_tickets members get it back unchanged, everyone
+    else through visible_to(), so the check is part of the query itself.
+    """
+    if auth.has_perm(Perm.VIEW_ALL_TICKETS):
+        return queryset
+    return queryset.visible_to(auth.user)
+
+
+def visible_tombstones(auth, queryset):
+    """
+    Tombstones narrowed to tickets auth.user could read when they were written
+
+    visible_to()'s rule on the owners each tombstone recorded, so deletes
+    and moves elsewhere don't leak ids. Unchanged for admins and
+    can_view_all_tickets members.
+    """
+    if auth.has_perm(Perm.VIEW_ALL_TICKETS):
+        return queryset
+    return queryset.filter(
+        Q(previous_creator_id=auth.user.id) | Q(previous_assignee_id=auth.user.id)
+        | Q(previous_team_id__in=auth.team_ids)
+    )
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .events import EventType, publish_ticket_event
+from .models import ArchivedComment, ArchivedTicket, ChangeCounter, Comment, Ticket, Tombstone
+
+
+ARCHIVE_STATUSES = (Ticket.Status.RESOLVED, Ticket.Status.CLOSED)
+
+TICKET_COLUMNS = (
+    'id', 'title', 'description', 'status', 'priority', 'category_id', 'created_by_id', 'assigned_to_id',
+    'assigned_to_team_id', 'created_at', 'updated_at', 'search_vector', 'comment_count', 'last_activity_at',
+)
+COMMENT_COLUMNS = ('id', 'ticket_id', 'author_id', 'content', 'created_at')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'TICKET_ARCHIVE_AFTER_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    """Resolved or closed tickets nobody has touched since cutoff"""
+    return Ticket.objects.filter(
+        Q(status__in=ARCHIVE_STATUSES), Q(updated_at__lt=cutoff), Q(last_activity_at__lt=cutoff),
+    )
+
+
+@transaction.atomic
+def archive_batch(cutoff, batch_size=500):
+    """
+    Moves up to batch_size archivable tickets and their comments to the archive
+
+    Rows someone else holds locked are skipped rather than waited on, they
+    get picked up by a later run. Returns how many tickets moved.
+    """
+    ids = list(
+        archivable(cutoff).select_for_update(skip_locked=True).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+
+    archived_at = timezone.now()
+    archived = ArchivedTicket.objects.bulk_create(
+        ArchivedTicket(archived_at=archived_at, **row)
+        for row in Ticket.objects.filter(pk__in=ids).values(*TICKET_COLUMNS)
+    )
+    ArchivedComment.objects.bulk_create(
+        ArchivedComment(**row) for row in Comment.objects.filter(ticket_id__in=ids).values(*COMMENT_COLUMNS)
+    )
+    seq = ChangeCounter.advance()
+    Tombstone.objects.bulk_create(Tombstone.for_ticket(seq, Tombstone.Kind.ARCHIVED, ticket) for ticket in archived)
+    # the stats rollup counts archived tickets too, nothing to adjust there
+    Comment.objects.filter(ticket_id__in=ids).delete()
+    Ticket.objects.filter(pk__in=ids).delete()
+    for ticket in archived:
+        publish_ticket_event(EventType.TICKET_ARCHIVED, ticket, seq)
+    return len(ids)
+
+
+@transaction.atomic
+def restore_ticket(pk):
+    """
+    Moves an archived ticket and its comments back into the live tables
+
+    Ids and timestamps are kept. Returns the Ticket, or None when pk isn't
+    archived (never was, or another request restored it first).
+    """
+    archived = ArchivedTicket.objects.select_for_update().filter(pk=pk).values(*TICKET_COLUMNS).first()
+    if archived is None:
+        return None
+    comments = list(ArchivedComment.objects.filter(ticket_id=pk).values(*COMMENT_COLUMNS))
+
+    # comments first: each one's insert trigger (migration 0007) then finds
+    # no ticket to touch, and the ticket's insert builds search_vector once
+    # over all of them, where the other order rebuilt it after every comment.
+    # The foreign key is deferred, it's checked at commit.
+    restored = Comment.objects.bulk_create(Comment(**row) for row in comments)
+    ticket = Ticket(change_seq=ChangeCounter.advance(), **archived)
+    ticket.save(force_insert=True)
+    # auto_now/auto_now_add overwrote the original times on insert, put them back
+    Ticket.objects.filter(pk=pk).update(created_at=archived['created_at'], updated_at=archived['updated_at'])
+    if restored:
+        for comment, row in zip(restored, comments):
+            comment.created_at = row['created_at']
+        Comment.objects.bulk_update(restored, ['created_at'])
+
+    ArchivedTicket.objects.filter(pk=pk).delete()
+    ticket.created_at, ticket.updated_at = archived['created_at'], archived['updated_at']
+    publish_ticket_event(EventType.TICKET_RESTORED, ticket, ticket.change_seq)
+    return ticket
@@ -0,0 +1,174 @@
+from django.utils import timezone
+from Team_app.models import Team, TeamMembership
+from User_app.models import User
+from .access import assigns_anywhere, can_assign, can_edit, visible_tickets
+from .events import EventType, publish_ticket_event
+from .models import Category, ChangeCounter, Ticket, Tombstone
+from .stats import record_ticket_changes, ticket_buckets
+
+
+MAX_ITEMS = 500
+
+# bulk field -> Ticket attribute, edits follow TicketDetailView's rules and
+# assignments TicketAssignView's
+EDIT_FIELDS = {
+    'status': 'status',
+    'priority': 'priority',
+    'category': 'category_id',
+}
+ASSIGN_FIELDS = {
+    'assigned_to': 'assigned_to_id',
+    'assigned_to_team': 'assigned_to_team_id',
+}
+FIELDS = {**EDIT_FIELDS, **ASSIGN_FIELDS}
+
+
+class BulkError(Exception):
+    pass
+
+
+def bulk_update_tickets(auth, items):
+    """
+    Applies [{'id': 1, 'status': 4}, {'id': 2, 'assigned_to': 5}, ...] in one go
+
+    Same rules as TicketDetailView.patch (status, priority, category) and
+    TicketAssignView.patch (assigned_to, assigned_to_team), but the user's
+    role and every referenced category, team and user are looked up once for
+    the whole batch and the changed tickets are written with one bulk_update.
+    auth is the request's QuikTik.authz.AuthContext. Items fail on their own,
+    the rest still apply. Call inside a transaction.
+
+    Returns one {'id', 'status': 'updated' | 'unchanged' | 'error', 'error'} per item
+    """
+    parsed = [_parse(item) for item in items]
+    ids = {changes['id'] for changes in parsed if 'error' not in changes}
+    # lock in id order so two overlapping batches can't deadlock, tickets
+    # the user can't read are not found
+    locked = visible_tickets(auth, Ticket.objects.select_for_update()).filter(pk__in=ids).order_by('pk')
+    tickets = {ticket.pk: ticket for ticket in locked.only('id', 'created_by', 'change_seq', *FIELDS.values())}
+    refs = _lookup_references(parsed, None if assigns_anywhere(auth) else auth.led_team_ids)
+
+    results = []
+    changed = {}
+    before = {}
+    columns = set()
+    for changes in parsed:
+        if 'error' in changes:
+            results.append({'id': changes.get('id'), 'status': 'error', 'error': changes['error']})
+            continue
+        ticket = tickets.get(changes['id'])
+        try:
+            if ticket is None:
+                raise BulkError('Ticket not found')
+            _check(auth, ticket, changes, refs)
+        except BulkError as error:
+            results.append({'id': changes['id'], 'status': 'error', 'error': str(error)})
+            continue
+
+        snapshot = (ticket_buckets(ticket), (ticket.assigned_to_team_id, ticket.assigned_to_id))
+        updated = False
+        for field, value in changes.items():
+            if field != 'id' and getattr(ticket, FIELDS[field]) != value:
+                setattr(ticket, FIELDS[field], value)
+                columns.add(FIELDS[field])
+                updated = True
+        if updated:
+            # the first snapshot wins when an id is listed twice
+            before.setdefault(ticket.pk, snapshot)
+            changed[ticket.pk] = ticket
+        results.append({'id': ticket.pk, 'status': 'updated' if updated else 'unchanged'})
+
+    if changed:
+        _save(list(changed.values()), before, columns)
+    return results
+
+
+def _parse(item):
+    if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+        return {'error': 'Each item needs an integer id'}
+    unknown = set(item) - set(FIELDS) - {'id'}
+    if unknown:
+        return {'id': item['id'], 'error': f"Unsupported fields: {', '.join(sorted(unknown))}"}
+    changes = {'id': item['id']}
+    for field in FIELDS:
+        if field not in item:
+            continue
+        value = item[field]
+        if value == '':
+            value = None
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return {'id': item['id'], 'error': f'{field} must be an integer'}
+        if value is None and field in ('status', 'priority'):
+            return {'id': item['id'], 'error': f'{field} is required'}
+        changes[field] = value
+    return changes
+
+
+def _lookup_references(parsed, led_teams):
+    # one query per kind of reference for the whole batch
+    wanted = {field: set() for field in ('category', 'assigned_to', 'assigned_to_team')}
+    for changes in parsed:
+        for field in wanted:
+            if changes.get(field):
+                wanted[field].add(changes[field])
+    refs = {
+        'category': set(Category.objects.filter(pk__in=wanted['category']).values_list('id', flat=True))
+        if wanted['category'] else set(),
+        'assigned_to_team': set(Team.objects.filter(pk__in=wanted['assigned_to_team']).values_list('id', flat=True))
+        if wanted['assigned_to_team'] else set(),
+        'assigned_to': set(User.objects.filter(pk__in=wanted['assigned_to']).values_list('id', flat=True))
+        if wanted['assigned_to'] else set(),
+        'lead_members': set(),
+    }
+    if led_teams and refs['assigned_to']:
+        # team leads can only assign to members of their own teams
+        refs['lead_members'] = set(TeamMembership.objects.filter(
+            user_id__in=refs['assigned_to'], team_id__in=led_teams).values_list('user_id', flat=True))
+    return refs
+
+
+def _check(auth, ticket, changes, refs):
+    if 'status' in changes and changes['status'] not in Ticket.Status.values:
+        raise BulkError(f"Invalid status: {changes['status']}")
+    if 'priority' in changes and changes['priority'] not in Ticket.Priority.values:
+        raise BulkError(f"Invalid priority: {changes['priority']}")
+    if changes.get('category') and changes['category'] not in refs['category']:
+        raise BulkError('Category not found')
+    if changes.get('assigned_to') and changes['assigned_to'] not in refs['assigned_to']:
+        raise BulkError('User not found')
+    if changes.get('assigned_to_team') and changes['assigned_to_team'] not in refs['assigned_to_team']:
+        raise BulkError('Team not found')
+
+    edits = {field: value for field, value in changes.items() if field in EDIT_FIELDS}
+    if edits and not can_edit(auth, ticket.created_by_id, edits):
+        raise BulkError('Permission denied')
+    if set(ASSIGN_FIELDS) & set(changes):
+        if not can_assign(auth):
+            raise BulkError('Permission denied')
+        if not assigns_anywhere(auth):
+            if changes.get('assigned_to') and changes['assigned_to'] not in refs['lead_members']:
+                raise BulkError('Can only assign to members of your teams')
+            if changes.get('assigned_to_team') and changes['assigned_to_team'] not in auth.led_team_ids:
+                raise BulkError('Can only assign to your teams')
+
+
+def _save(tickets, before, columns):
+    seq = ChangeCounter.advance()
+    now = timezone.now()
+    for ticket in tickets:
+        ticket.change_seq = seq
+        # bulk_update skips auto_now
+        ticket.updated_at = now
+    # only the columns some item changed
+    Ticket.objects.bulk_update(tickets, [*sorted(columns), 'change_seq', 'updated_at'])
+    Tombstone.record_moves(seq, [
+        (ticket, before[ticket.pk][1]) for ticket in tickets
+        if before[ticket.pk][1] != (ticket.assigned_to_team_id, ticket.assigned_to_id)
+    ])
+    record_ticket_changes(added=tickets, removed=[before[ticket.pk][0] for ticket in tickets])
+
+    for ticket in tickets:
+        owners = before[ticket.pk][1]
+        assigned = owners != (ticket.assigned_to_team_id, ticket.assigned_to_id)
+        event_type = EventType.TICKET_ASSIGNED if assigned else EventType.TICKET_UPDATED
+        publish_ticket_event(event_type, ticket, seq, before=owners)
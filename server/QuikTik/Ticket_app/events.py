@@ -0,0 +1,64 @@
+from django.db import transaction
+from QuikTik.broker import get_broker
+
+
+CHANNEL = 'tickets'
+
+
+class EventType:
+    TICKET_CREATED = 'ticket.created'
+    TICKET_UPDATED = 'ticket.updated'
+    TICKET_ASSIGNED = 'ticket.assigned'
+    TICKET_DELETED = 'ticket.deleted'
+    TICKET_ARCHIVED = 'ticket.archived'
+    TICKET_RESTORED = 'ticket.restored'
+    COMMENT_CREATED = 'comment.created'
+    COMMENT_UPDATED = 'comment.updated'
+    COMMENT_DELETED = 'comment.deleted'
+
+
+def publish_ticket_event(event_type, ticket, seq, before=None, comment_id=None):
+    """
+    Publishes a ticket event once the current transaction commits
+
+    The event only names what changed, clients fetch the rows from
+    tickets/changes/?since= with a token below seq. teams/assignees hold the
+    ticket's team and assignee before and after the write so both the old
+    and new owner's streams see a reassignment, creator lets the stream
+    apply the same visibility rule as the changes feed.
+
+    Usage: publish_ticket_event(EventType.TICKET_ASSIGNED, ticket, seq, before=(team_id, assignee_id))
+    """
+    teams = {ticket.assigned_to_team_id}
+    assignees = {ticket.assigned_to_id}
+    if before:
+        teams.add(before[0])
+        assignees.add(before[1])
+    event = {
+        'type': event_type,
+        'ticket': ticket.pk,
+        'change': seq,
+        'teams': sorted(team for team in teams if team),
+        'assignees': sorted(user for user in assignees if user),
+        'creator': ticket.created_by_id,
+    }
+    if comment_id:
+        event['comment'] = comment_id
+    transaction.on_commit(lambda: get_broker().publish(CHANNEL, event))
+
+
+def event_visible(event, user_id, team_ids):
+    # the changes feed's visibility rule (Ticket.objects.visible_to) applied to an event
+    if event['type'] == 'resync':
+        return True
+    return (
+        event.get('creator') == user_id or user_id in event['assignees']
+        or bool(set(team_ids) & set(event['teams']))
+    )
+
+
+def event_matches(event, teams=(), assignees=()):
+    # no filter gets everything, otherwise the team or the assignee has to match
+    if event['type'] == 'resync' or not (teams or assignees):
+        return True
+    return bool(set(teams) & set(event['teams']) or set(assignees) & set(event['assignees']))
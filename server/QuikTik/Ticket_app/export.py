@@ -0,0 +1,69 @@
+import csv
+import json
+from .models import Ticket
+
+
+# export column -> queryset value, the names match what Ticket_app.importer
+# reads so an export can be imported elsewhere
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'status': 'status',
+    'priority': 'priority',
+    'category': 'category__name',
+    'assigned_to_team': 'assigned_to_team__name',
+    'assigned_to': 'assigned_to__email',
+    'created_by': 'created_by__email',
+    'comment_count': 'comment_count',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'last_activity_at': 'last_activity_at',
+}
+FORMATS = ('csv', 'ndjson')
+
+# rows fetched per round trip and written per chunk of the response
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    # csv.writer target that hands back the formatted line instead of buffering it
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    """
+    Yields one dict per ticket, reading chunk by chunk
+
+    .values() skips model instances and .iterator() a server-side cursor on
+    PostgreSQL, so memory stays flat however many tickets match.
+    """
+    statuses = dict(Ticket.Status.choices)
+    priorities = dict(Ticket.Priority.choices)
+    rows = queryset.values_list(*EXPORT_COLUMNS.values()).iterator(chunk_size=CHUNK_SIZE)
+    for values in rows:
+        row = dict(zip(EXPORT_COLUMNS, values))
+        row['status'] = statuses.get(row['status'], row['status'])
+        row['priority'] = priorities.get(row['priority'], row['priority'])
+        for column in ('created_at', 'updated_at', 'last_activity_at'):
+            row[column] = row[column].isoformat() if row[column] else None
+        yield row
+
+
+def stream_export(queryset, fmt):
+    """Yields the export as text chunks, the header first so bytes go out straight away"""
+    writer = csv.writer(_Echo())
+    if fmt == 'csv':
+        yield writer.writerow(EXPORT_COLUMNS)
+    lines = []
+    for row in export_rows(queryset):
+        if fmt == 'csv':
+            lines.append(writer.writerow(['' if value is None else value for value in row.values()]))
+        else:
+            lines.append(json.dumps(row) + '\n')
+        if len(lines) >= CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
@@ -0,0 +1,130 @@
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Ticket
+
+
+# ?ordering= value -> keyset ordering, every ordering ends in a unique column
+# and each descending/ascending pair is the same index scanned either way
+ORDERINGS = {
+    '-created_at': ('-created_at', 'id'),
+    '-updated_at': ('-updated_at', 'id'),
+    'priority': ('priority', '-created_at', 'id'),
+    'status': ('status', '-created_at', 'id'),
+    '-last_activity_at': ('-last_activity_at', 'id'),
+    '-comment_count': ('-comment_count', '-created_at', 'id'),
+}
+ORDERINGS.update({
+    key[1:] if key.startswith('-') else f'-{key}':
+        tuple(field[1:] if field.startswith('-') else f'-{field}' for field in fields)
+    for key, fields in list(ORDERINGS.items())
+})
+DEFAULT_ORDERING = '-created_at'
+
+# ?param= -> (model field, allowed values)
+CHOICE_FILTERS = {
+    'status': ('status', Ticket.Status.values),
+    'priority': ('priority', Ticket.Priority.values),
+}
+RELATION_FILTERS = {
+    'category': 'category',
+    'assigned_to': 'assigned_to',
+    'assigned_to_team': 'assigned_to_team',
+    'created_by': 'created_by',
+}
+# ?param= -> lookup, accepts a date or a full ISO datetime
+DATE_FILTERS = {
+    'created_after': 'created_at__gte',
+    'created_before': 'created_at__lt',
+    'updated_after': 'updated_at__gte',
+    'updated_before': 'updated_at__lt',
+    'active_after': 'last_activity_at__gte',
+    'active_before': 'last_activity_at__lt',
+}
+
+
+def _int_list(param, raw):
+    try:
+        return [int(value) for value in raw.split(',') if value]
+    except ValueError:
+        raise ValidationError({param: ['Expected an integer or comma separated integers']})
+
+
+def _parse_moment(param, raw):
+    try:
+        value = parse_datetime(raw)
+        if value is None and parse_date(raw):
+            value = datetime.combine(parse_date(raw), time.min)
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({param: ['Expected an ISO date or datetime']})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def filter_tickets(queryset, params):
+    """
+    Applies the ticket list query parameters to a queryset
+
+    status=1,2  priority=1  category=3  assigned_to=5  assigned_to_team=2
+    created_by=7  min_comments=10  created_after=2025-01-01  created_before=...
+    updated_after=...  updated_before=...  active_after=...  active_before=...
+    Relation filters take 'none' for unassigned/uncategorised.
+    """
+    for param, (field, allowed) in CHOICE_FILTERS.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        values = _int_list(param, raw)
+        if any(value not in allowed for value in values):
+            raise ValidationError({param: [f'Expected one of {sorted(allowed)}']})
+        queryset = queryset.filter(**{f'{field}__in': values})
+
+    for param, field in RELATION_FILTERS.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        if raw == 'none':
+            queryset = queryset.filter(**{f'{field}__isnull': True})
+        else:
+            queryset = queryset.filter(**{f'{field}_id__in': _int_list(param, raw)})
+
+    min_comments = params.get('min_comments')
+    if min_comments:
+        queryset = queryset.filter(comment_count__gte=_int_list('min_comments', min_comments)[0])
+
+    for param, lookup in DATE_FILTERS.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        queryset = queryset.filter(**{lookup: _parse_moment(param, raw)})
+
+    return queryset
+
+
+def get_ordering(params):
+    """Returns the keyset ordering for ?ordering=, defaulting to newest first"""
+    key = params.get('ordering') or DEFAULT_ORDERING
+    if key not in ORDERINGS:
+        raise ValidationError({'ordering': [f'Expected one of {sorted(ORDERINGS)}']})
+    return ORDERINGS[key]
+
+
+def event_filters(params, user):
+    """
+    Team and assignee filters for the event stream
+
+    assigned_to_team=1,2  assigned_to=5 (or 'me')
+    """
+    teams = _int_list('assigned_to_team', params.get('assigned_to_team', ''))
+    raw = params.get('assigned_to', '')
+    assignees = [user.pk] if raw == 'me' else _int_list('assigned_to', raw)
+    return teams, assignees
+
+
+def team_filter(params):
+    """?team=1,2 for the workload report"""
+    return set(_int_list('team', params.get('team', '')))
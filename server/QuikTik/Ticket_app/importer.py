@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.db import DatabaseError, transaction
+from Team_app.models import Team
+from User_app.models import User
+from .models import Category, ChangeCounter, Ticket
+from .stats import record_ticket_changes
+
+
+FORMATS = ('csv', 'ndjson')
+
+
+class RowError(Exception):
+    pass
+
+
+def guess_format(name):
+    """'csv' or 'ndjson' from a file name, None when it can't tell"""
+    name = (name or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def iter_records(stream, fmt):
+    """
+    Yields (line, record) from a binary stream one row at a time
+
+    CSV needs a header row, NDJSON one JSON object per line. Blank lines are
+    skipped, a row that can't be parsed comes back as (line, RowError). The
+    file is read as UTF-8, bytes that aren't end the stream with a RowError
+    on the line reached so far, the rows before it still import.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    line = 0
+    try:
+        for line, record in _parse(text, fmt):
+            yield line, record
+    except UnicodeDecodeError:
+        yield line + 1, RowError('File is not valid UTF-8, stopped reading here')
+
+
+def _parse(text, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line, raw in enumerate(text, start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as error:
+                yield line, RowError(f'Invalid JSON: {error}')
+                continue
+            if not isinstance(record, dict):
+                yield line, RowError('Expected a JSON object')
+                continue
+            yield line, record
+
+
+class TicketImporter:
+    """
+    Turns import records into Ticket rows and writes them in batches
+
+    Columns: title, description, status, priority (value or label, e.g.
+    'In Progress'), category and assigned_to_team (name), assigned_to and
+    created_by (email, created_by defaults to the importing user).
+    Categories, teams and users are read once into lookup maps, so a row
+    costs no queries of its own.
+
+    Usage:
+        importer = TicketImporter(created_by=request.user)
+        for progress in importer.run(iter_records(upload, 'csv')):
+            ...
+    """
+
+    def __init__(self, created_by, batch_size=1000):
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.categories = {name.lower(): pk for pk, name in Category.objects.values_list('id', 'name')}
+        self.teams = {name.lower(): pk for pk, name in Team.objects.values_list('id', 'name')}
+        self.users = {email.lower(): pk for pk, email in User.objects.values_list('id', 'email')}
+        self.statuses = self._choice_map(Ticket.Status)
+        self.priorities = self._choice_map(Ticket.Priority)
+
+    @staticmethod
+    def _choice_map(choices):
+        lookup = {str(value): value for value in choices.values}
+        lookup.update({label.lower(): value for value, label in choices.choices})
+        return lookup
+
+    def run(self, records):
+        """
+        Imports records from iter_records, one transaction per batch
+
+        Yields a progress dict after every batch: processed/created/failed
+        so far and the errors ({'line', 'error'}) found in that batch.
+        Nothing is kept between batches, memory stays flat for any file size.
+        """
+        processed = created = failed = 0
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.batch_size))
+            if not chunk:
+                break
+            tickets, errors = [], []
+            for line, record in chunk:
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    tickets.append(self.build(record))
+                except RowError as error:
+                    errors.append({'line': line, 'error': str(error)})
+            if tickets:
+                try:
+                    self.save(tickets)
+                    created += len(tickets)
+                except DatabaseError as error:
+                    # the whole batch rolled back
+                    errors.append({
+                        'line': chunk[0][0],
+                        'error': f'Batch ending at line {chunk[-1][0]} failed: {error}',
+                    })
+                    tickets = []
+            processed += len(chunk)
+            failed += len(chunk) - len(tickets)
+            yield {'processed': processed, 'created': created, 'failed': failed, 'errors': errors}
+
+    def build(self, record):
+        title = str(record.get('title') or '').strip()
+        if not title:
+            raise RowError('title is required')
+        if len(title) > Ticket._meta.get_field('title').max_length:
+            raise RowError('title is too long')
+        return Ticket(
+            title=title,
+            description=str(record.get('description') or ''),
+            status=self._choice(record, 'status', self.statuses, Ticket.Status.OPEN),
+            priority=self._choice(record, 'priority', self.priorities, Ticket.Priority.MEDIUM),
+            category_id=self._reference(record, 'category', self.categories, 'Category'),
+            assigned_to_team_id=self._reference(record, 'assigned_to_team', self.teams, 'Team'),
+            assigned_to_id=self._reference(record, 'assigned_to', self.users, 'User'),
+            created_by_id=self._reference(record, 'created_by', self.users, 'User') or self.created_by.pk,
+        )
+
+    @staticmethod
+    def _choice(record, field, lookup, default):
+        raw = str(record.get(field) or '').strip().lower()
+        if not raw:
+            return default
+        if raw not in lookup:
+            raise RowError(f'Unknown {field}: {record[field]}')
+        return lookup[raw]
+
+    @staticmethod
+    def _reference(record, field, lookup, label):
+        raw = str(record.get(field) or '').strip().lower()
+        if not raw:
+            return None
+        if raw not in lookup:
+            raise RowError(f'{label} not found: {record[field]}')
+        return lookup[raw]
+
+    @staticmethod
+    @transaction.atomic
+    def save(tickets):
+        seq = ChangeCounter.advance()
+        for ticket in tickets:
+            ticket.change_seq = seq
+        Ticket.objects.bulk_create(tickets)
+        record_ticket_changes(added=tickets)
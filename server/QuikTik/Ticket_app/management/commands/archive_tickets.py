@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from Ticket_app.archive import archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move resolved/closed tickets nobody has touched in a while, with their comments, to the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive tickets untouched for this many days (default TICKET_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Tickets moved per transaction (default 500)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        cutoff = archive_cutoff(options['days'])
+
+        # short transactions so row locks are held briefly, tickets someone
+        # is editing right now are skipped until the next run
+        total = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'{total} tickets archived')
+
+        self.stdout.write(self.style.SUCCESS(f'Done, {total} tickets archived'))
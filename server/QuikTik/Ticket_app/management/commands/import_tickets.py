@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from User_app.models import User
+from Ticket_app.importer import FORMATS, TicketImporter, guess_format, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Stream tickets from a CSV or NDJSON file into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or NDJSON file')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--created-by', required=True,
+                            help='Email of the user rows without a created_by column are filed under')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Tickets inserted per transaction (default 1000)')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError('Unknown file type, pass --format csv or --format ndjson')
+        try:
+            created_by = User.objects.get(email=options['created_by'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['created_by']}")
+
+        importer = TicketImporter(created_by, batch_size=options['batch_size'])
+        progress = {'processed': 0, 'created': 0, 'failed': 0}
+        with open(options['path'], 'rb') as stream:
+            for progress in importer.run(iter_records(stream, fmt)):
+                for error in progress['errors']:
+                    self.stderr.write(f"line {error['line']}: {error['error']}")
+                self.stdout.write(
+                    f"{progress['processed']} rows, {progress['created']} created, {progress['failed']} failed"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done, {progress['created']} tickets imported, {progress['failed']} rows failed"
+        ))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from Ticket_app.models import ChangeCounter, Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete old ticket/comment tombstones, clients with older change tokens must resync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Keep tombstones younger than this many days (default 30)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        with transaction.atomic():
+            newest = Tombstone.objects.filter(deleted_at__lt=cutoff).aggregate(newest=Max('seq'))['newest']
+            if newest is None:
+                self.stdout.write(self.style.SUCCESS('Nothing to prune'))
+                return
+            # tokens up to here can no longer be answered with a complete delta
+            ChangeCounter.objects.filter(pk=1).update(pruned_through=Greatest('pruned_through', newest))
+            pruned, _ = Tombstone.objects.filter(seq__lte=newest).delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} tombstones (through change {newest})'))
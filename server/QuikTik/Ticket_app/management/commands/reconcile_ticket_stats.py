@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Ticket_app.models import MemberWorkload, TicketStat
+from Ticket_app.stats import actual_counts
+from Ticket_app.workload import actual_loads
+
+
+class Command(BaseCommand):
+    help = 'Compare the TicketStat rollup and member workloads with the ticket table and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # lock the rollup first so ticket writes that commit after our
+            # count wait and apply their deltas on top of the fixed values
+            stored = {
+                (stat.dimension, stat.key): stat
+                for stat in TicketStat.objects.select_for_update()
+            }
+            actual = actual_counts()
+
+            drift = []
+            for bucket in set(stored) | set(actual):
+                stat = stored.get(bucket)
+                expected = actual.get(bucket, 0)
+                current = stat.count if stat else 0
+                if current != expected:
+                    drift.append((bucket, current, expected))
+
+            stored_loads = {
+                row.user_id: (row.open_count, row.load)
+                for row in MemberWorkload.objects.select_for_update()
+            }
+            loads = actual_loads()
+            load_drift = [
+                (user, stored_loads.get(user, (0, 0)), loads.get(user, (0, 0)))
+                for user in set(stored_loads) | set(loads)
+                if stored_loads.get(user, (0, 0)) != loads.get(user, (0, 0))
+            ]
+
+            for (dimension, key), current, expected in sorted(drift):
+                self.stdout.write(f'{dimension}={key}: {current} -> {expected}')
+            for user, current, expected in sorted(load_drift):
+                self.stdout.write(f'workload user={user}: {current} -> {expected}')
+
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            else:
+                TicketStat.objects.bulk_create(
+                    [TicketStat(dimension=d, key=k, count=expected) for (d, k), _, expected in drift],
+                    update_conflicts=True,
+                    unique_fields=['dimension', 'key'],
+                    update_fields=['count'],
+                )
+                MemberWorkload.objects.bulk_create(
+                    [MemberWorkload(user_id=user, open_count=count, load=load) for user, _, (count, load) in load_drift],
+                    update_conflicts=True,
+                    unique_fields=['user'],
+                    update_fields=['open_count', 'load'],
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drift)} drifted buckets, {len(load_drift)} drifted workloads'))
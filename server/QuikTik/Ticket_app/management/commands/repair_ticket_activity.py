@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Ticket_app.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Recompute Ticket.comment_count and Ticket.last_activity_at from the comments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Tickets updated per transaction (default 1000)')
+        parser.add_argument('--ticket', type=int, action='append', dest='tickets',
+                            help='Only repair this ticket id, can be given more than once')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tickets = Ticket.objects.order_by('id')
+        if options['tickets']:
+            tickets = tickets.filter(pk__in=options['tickets'])
+
+        # walk the primary key in ranges so each transaction stays short
+        last_id = 0
+        repaired = 0
+        while True:
+            ids = list(tickets.filter(pk__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                repaired += Ticket.objects.filter(pk__in=ids).refresh_comment_stats()
+            last_id = ids[-1]
+            self.stdout.write(f'Repaired {repaired} tickets (through id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'Done, {repaired} tickets repaired'))
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0004_alter_ticket_options_alter_comment_content_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ticket',
+            options={'ordering': ['-created_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-created_at', 'id'], name='ticket_created_id_idx'),
+        ),
+    ]
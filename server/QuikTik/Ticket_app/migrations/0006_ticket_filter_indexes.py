@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 17:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0003_alter_team_name'),
+        ('Ticket_app', '0005_ticket_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-updated_at', 'id'], name='ticket_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_to_team', 'status', 'priority', '-created_at', 'id'], name='ticket_team_status_prio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_to', 'status', '-created_at', 'id'], name='ticket_assignee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['created_by', '-created_at', 'id'], name='ticket_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', 'priority', '-created_at', 'id'], name='ticket_status_prio_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0 on 2026-10-17 17:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Ticket.search_vector is rebuilt by a BEFORE trigger whenever the title or
+# description changes or anything writes the column. Comment writes null the
+# column on their ticket, which fires the same trigger, so bulk writes that
+# skip model signals still keep the index current.
+POSTGRES_FORWARDS = [
+    '''
+    CREATE INDEX ticket_search_vector_idx ON "Ticket_app_ticket" USING gin (search_vector)
+    ''',
+    '''
+    CREATE FUNCTION ticket_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(content, ' ') FROM "Ticket_app_comment" WHERE ticket_id = NEW.id), ''
+            )), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER ticket_search_vector_insert BEFORE INSERT ON "Ticket_app_ticket"
+    FOR EACH ROW EXECUTE FUNCTION ticket_search_vector_refresh()
+    ''',
+    '''
+    CREATE TRIGGER ticket_search_vector_update BEFORE UPDATE ON "Ticket_app_ticket"
+    FOR EACH ROW WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.description IS DISTINCT FROM NEW.description
+        OR OLD.search_vector IS DISTINCT FROM NEW.search_vector
+        OR NEW.search_vector IS NULL
+    )
+    EXECUTE FUNCTION ticket_search_vector_refresh()
+    ''',
+    '''
+    CREATE FUNCTION comment_search_vector_touch() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE "Ticket_app_ticket" SET search_vector = NULL WHERE id = OLD.ticket_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE "Ticket_app_ticket" SET search_vector = NULL WHERE id = NEW.ticket_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER comment_search_vector_touch AFTER INSERT OR UPDATE OF content, ticket_id OR DELETE
+    ON "Ticket_app_comment"
+    FOR EACH ROW EXECUTE FUNCTION comment_search_vector_touch()
+    ''',
+    # backfill existing rows through the trigger
+    '''
+    UPDATE "Ticket_app_ticket" SET search_vector = NULL
+    ''',
+]
+
+POSTGRES_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS comment_search_vector_touch ON "Ticket_app_comment"',
+    'DROP FUNCTION IF EXISTS comment_search_vector_touch()',
+    'DROP TRIGGER IF EXISTS ticket_search_vector_update ON "Ticket_app_ticket"',
+    'DROP TRIGGER IF EXISTS ticket_search_vector_insert ON "Ticket_app_ticket"',
+    'DROP FUNCTION IF EXISTS ticket_search_vector_refresh()',
+    'DROP INDEX IF EXISTS ticket_search_vector_idx',
+]
+
+
+def run_on_postgres(schema_editor, statements):
+    # other backends (SQLite in tests) search with the ORM fallback instead
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def forwards(apps, schema_editor):
+    run_on_postgres(schema_editor, POSTGRES_FORWARDS)
+
+
+def backwards(apps, schema_editor):
+    run_on_postgres(schema_editor, POSTGRES_BACKWARDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0006_ticket_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
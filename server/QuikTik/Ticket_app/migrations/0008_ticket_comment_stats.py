@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-17 17:28
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_stats(apps, schema_editor):
+    Ticket = apps.get_model('Ticket_app', 'Ticket')
+    Comment = apps.get_model('Ticket_app', 'Comment')
+    comments = Comment.objects.filter(ticket=models.OuterRef('pk')).order_by()
+    Ticket.objects.update(
+        comment_count=Coalesce(
+            models.Subquery(comments.values('ticket').annotate(total=models.Count('id')).values('total')), 0
+        ),
+        last_activity_at=Coalesce(
+            models.Subquery(comments.order_by('-created_at').values('created_at')[:1]), models.F('created_at')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0003_alter_team_name'),
+        ('Ticket_app', '0007_ticket_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-last_activity_at', 'id'], name='ticket_activity_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-comment_count', '-created_at', 'id'], name='ticket_comment_count_idx'),
+        ),
+    ]
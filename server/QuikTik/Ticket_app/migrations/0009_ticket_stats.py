@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-17 17:29
+
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    Ticket = apps.get_model('Ticket_app', 'Ticket')
+    TicketStat = apps.get_model('Ticket_app', 'TicketStat')
+    columns = {
+        'status': 'status',
+        'priority': 'priority',
+        'category': 'category_id',
+        'team': 'assigned_to_team_id',
+    }
+    stats = []
+    for dimension, column in columns.items():
+        for row in Ticket.objects.order_by().values(column).annotate(total=models.Count('id')):
+            stats.append(TicketStat(dimension=dimension, key=row[column] or 0, count=row['total']))
+    TicketStat.objects.bulk_create(stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0008_ticket_comment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Status'), ('priority', 'Priority'), ('category', 'Category'), ('team', 'Team')], max_length=20)),
+                ('key', models.IntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='ticket_stat_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
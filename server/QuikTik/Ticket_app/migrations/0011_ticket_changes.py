@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 17:33
+
+from django.db import migrations, models
+
+
+def seed_counter(apps, schema_editor):
+    # existing tickets all count as change 1, so a since=0 sync returns them
+    ChangeCounter = apps.get_model('Ticket_app', 'ChangeCounter')
+    Ticket = apps.get_model('Ticket_app', 'Ticket')
+    ChangeCounter.objects.create(pk=1, value=1)
+    Ticket.objects.update(change_seq=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0010_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('pruned_through', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('ticket', 'Ticket'), ('comment', 'Comment')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('ticket_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['change_seq', 'id'], name='ticket_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['seq'], name='tombstone_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.RunPython(seed_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0011_ticket_changes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['-created_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['ticket', '-created_at', 'id'], name='comment_ticket_created_idx'),
+        ),
+    ]
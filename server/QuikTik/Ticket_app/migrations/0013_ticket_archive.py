@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-10-17 17:45
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# archived rows keep the search_vector their ticket had, nothing rewrites
+# it afterwards so the archive needs the GIN index but not the triggers
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX archived_search_vector_idx ON "Ticket_app_archivedticket" USING gin (search_vector)'
+        )
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS archived_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0004_team_updated_at'),
+        ('Ticket_app', '0012_comment_cursor_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='kind',
+            field=models.CharField(choices=[('ticket', 'Ticket'), ('comment', 'Comment'), ('archived', 'Archived ticket')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('status', models.IntegerField(choices=[(1, 'Open'), (2, 'In Progress'), (3, 'Resolved'), (4, 'Closed')])),
+                ('priority', models.IntegerField(choices=[(4, 'Low'), (3, 'Medium'), (2, 'High'), (1, 'Urgent')])),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assigned_tickets', to=settings.AUTH_USER_MODEL)),
+                ('assigned_to_team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_team_tickets', to='Team_app.team')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_tickets', to='Ticket_app.category')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_created_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='Ticket_app.archivedticket')),
+            ],
+            options={
+                'ordering': ['-created_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedticket',
+            index=models.Index(fields=['-created_at', 'id'], name='archived_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['ticket', '-created_at', 'id'], name='archived_comment_created_idx'),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
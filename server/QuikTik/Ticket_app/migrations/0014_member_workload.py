@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 18:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_workloads(apps, schema_editor):
+    # Ticket_app.workload.actual_loads() against the historical models:
+    # open and in progress tickets (status 1 and 2), weighted by priority
+    # urgent 8, high 4, medium 2, low 1
+    Ticket = apps.get_model('Ticket_app', 'Ticket')
+    MemberWorkload = apps.get_model('Ticket_app', 'MemberWorkload')
+    weights = {1: 8, 2: 4, 3: 2, 4: 1}
+    weight = models.Case(
+        *(models.When(priority=priority, then=models.Value(w)) for priority, w in weights.items()),
+        default=models.Value(1),
+    )
+    rows = Ticket.objects.filter(status__in=[1, 2], assigned_to__isnull=False).order_by().values(
+        'assigned_to'
+    ).annotate(open_count=models.Count('id'), load=models.Sum(weight))
+    MemberWorkload.objects.bulk_create(
+        MemberWorkload(user_id=row['assigned_to'], open_count=row['open_count'], load=row['load']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0013_ticket_archive'),
+        ('User_app', '0003_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberWorkload',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_count', models.IntegerField(default=0)),
+                ('load', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_workloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Team_app', '0005_membership_team_page_idx'),
+        ('Ticket_app', '0014_member_workload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # status 1 and 2 are Ticket.Status.OPEN and IN_PROGRESS, Ticket_app.models.ACTIVE_STATUSES
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status__in', [1, 2])), fields=['assigned_to_team', 'assigned_to', 'status', 'priority', 'created_at'], name='ticket_active_workload_idx'),
+        ),
+    ]
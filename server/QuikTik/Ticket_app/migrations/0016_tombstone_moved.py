@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0015_ticket_active_workload_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='previous_assignee_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='previous_team_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='kind',
+            field=models.CharField(choices=[('ticket', 'Ticket'), ('comment', 'Comment'), ('archived', 'Archived ticket'), ('moved', 'Reassigned ticket')], max_length=20),
+        ),
+    ]
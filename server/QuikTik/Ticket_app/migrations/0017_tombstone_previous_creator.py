@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ticket_app', '0016_tombstone_moved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='previous_creator_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,11 +1,15 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest, RowNumber
+from django.utils import timezone
 from User_app.models import User
-from Team_app.models import Team
+from Team_app.models import Team, TeamMembership
 
 
 class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'categories'
@@ -14,12 +18,114 @@ class Category(models.Model):
         return self.name
 
 
+class BaseTicketQuerySet(models.QuerySet):
+    """Read helpers shared by live and archived tickets"""
+    related_fields = ('created_by', 'assigned_to', 'category', 'assigned_to_team')
+
+    def with_related(self, columns=None, comments=True, comment_limit=None):
+        """
+        Joins and prefetches everything TicketSerializer reads
+
+        columns limits the SELECT to those model columns, relations spelled
+        with __ (e.g. 'created_by__email') are joined only when listed.
+        comments=False skips the comments prefetch, comment_limit prefetches
+        only each ticket's newest comments (one windowed query for all tickets)
+        """
+        if columns is None:
+            queryset = self.select_related(*self.related_fields).defer('search_vector')
+        else:
+            queryset = self.only(*columns)
+            related = {column.split('__')[0] for column in columns if '__' in column}
+            if related:
+                # select_related() with no arguments would join every relation
+                queryset = queryset.select_related(*related)
+        if comments:
+            comment_model = self.model._meta.get_field('comments').related_model
+            latest = comment_model.objects.select_related('author')
+            if comment_limit:
+                latest = latest.newest_per_ticket(comment_limit)
+            queryset = queryset.prefetch_related(models.Prefetch('comments', queryset=latest))
+        return queryset
+
+    def visible_to(self, user):
+        """
+        Tickets user may read, as one WHERE clause
+
+        Their own, assigned to them, or assigned to one of their teams (a
+        TeamMembership subquery, not a separate query). Admins and
+        can_view_all_tickets members see everything, go through
+        Ticket_app.access.visible_tickets rather than calling this directly.
+        """
+        teams = TeamMembership.objects.filter(user=user).values('team_id')
+        return self.filter(
+            models.Q(created_by=user) | models.Q(assigned_to=user) | models.Q(assigned_to_team__in=teams)
+        )
+
+
+class TicketQuerySet(BaseTicketQuerySet):
+    # the comment helpers below also advance change_seq (or take a seq the
+    # caller already advanced), the rows they touch show up in the changes feed
+
+    def comment_added(self, at, seq=None):
+        """Bumps the denormalized comment stats in one atomic UPDATE"""
+        return self.update(
+            comment_count=models.F('comment_count') + 1,
+            last_activity_at=Greatest('last_activity_at', models.Value(at)),
+            change_seq=seq or ChangeCounter.advance(),
+        )
+
+    def touch_activity(self, at, seq=None):
+        """Moves last_activity_at forward, e.g. when a comment is edited"""
+        return self.update(
+            last_activity_at=Greatest('last_activity_at', models.Value(at)),
+            change_seq=seq or ChangeCounter.advance(),
+        )
+
+    def comment_removed(self, seq=None):
+        return self.update(
+            # never below zero, even if the counter has drifted
+            comment_count=Greatest(models.F('comment_count') - 1, 0),
+            last_activity_at=self._latest_activity(),
+            change_seq=seq or ChangeCounter.advance(),
+        )
+
+    def mark_changed(self):
+        """Puts the tickets in the changes feed without touching anything else"""
+        return self.update(change_seq=ChangeCounter.advance())
+
+    def refresh_comment_stats(self):
+        """Recomputes comment_count and last_activity_at from the comments table"""
+        counts = Comment.objects.filter(ticket=models.OuterRef('pk')).order_by().values('ticket')
+        return self.update(
+            comment_count=Coalesce(
+                models.Subquery(counts.annotate(total=models.Count('id')).values('total')), 0
+            ),
+            last_activity_at=self._latest_activity(),
+            change_seq=ChangeCounter.advance(),
+        )
+
+    @staticmethod
+    def _latest_activity():
+        # newest comment, or the ticket's creation when it has none
+        latest = Comment.objects.filter(ticket=models.OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+        return Coalesce(models.Subquery(latest), models.F('created_at'))
+
+
+class TicketStatus(models.IntegerChoices):
+    OPEN = 1, 'Open'
+    IN_PROGRESS = 2, 'In Progress'
+    RESOLVED = 3, 'Resolved'
+    CLOSED = 4, 'Closed'
+
+
+# tickets that still need work from their assignee, the ones the workload
+# tracking (Ticket_app.workload) and its partial index below count
+ACTIVE_STATUSES = [TicketStatus.OPEN, TicketStatus.IN_PROGRESS]
+
+
 class Ticket(models.Model):
-    class Status(models.IntegerChoices):
-        OPEN = 1, 'Open'
-        IN_PROGRESS = 2, 'In Progress'
-        RESOLVED = 3, 'Resolved'
-        CLOSED = 4, 'Closed'
+    # defined at module level so Meta can use ACTIVE_STATUSES
+    Status = TicketStatus
 
     class Priority(models.IntegerChoices):
         LOW = 4, 'Low'
@@ -37,22 +143,276 @@ class Ticket(models.Model):
     assigned_to_team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='team_tickets')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # title, description and comment text, kept current by database triggers
+    # on PostgreSQL (see migration 0007), unused elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+    # denormalized from comments, maintained by TicketQuerySet.comment_added/comment_removed
+    # and repairable with `manage.py repair_ticket_activity`
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+    # ChangeCounter value of the last write that changed how this ticket
+    # serializes, drives the delta-sync feed (tickets/changes/). Writes
+    # outside the API views should end with TicketQuerySet.mark_changed()
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = TicketQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', 'id']
+        indexes = [
+            # backs keyset pagination of the ticket list
+            models.Index(fields=['-created_at', 'id'], name='ticket_created_id_idx'),
+            models.Index(fields=['-updated_at', 'id'], name='ticket_updated_id_idx'),
+            # filter + sort combinations used by the ticket list, each ends in
+            # the keyset ordering so a filtered page is a single range scan
+            models.Index(
+                fields=['assigned_to_team', 'status', 'priority', '-created_at', 'id'],
+                name='ticket_team_status_prio_idx',
+            ),
+            models.Index(fields=['assigned_to', 'status', '-created_at', 'id'], name='ticket_assignee_status_idx'),
+            models.Index(fields=['created_by', '-created_at', 'id'], name='ticket_creator_created_idx'),
+            models.Index(fields=['status', 'priority', '-created_at', 'id'], name='ticket_status_prio_idx'),
+            # busy / recently active tickets
+            models.Index(fields=['-last_activity_at', 'id'], name='ticket_activity_id_idx'),
+            models.Index(fields=['-comment_count', '-created_at', 'id'], name='ticket_comment_count_idx'),
+            models.Index(fields=['change_seq', 'id'], name='ticket_change_seq_idx'),
+            # workload report, open and in progress tickets only: every column it
+            # groups, filters and aggregates on, so it never reads the table
+            models.Index(
+                fields=['assigned_to_team', 'assigned_to', 'status', 'priority', 'created_at'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='ticket_active_workload_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class CommentQuerySet(models.QuerySet):
+    def newest_per_ticket(self, limit):
+        """
+        Each ticket's newest limit comments, ranked with a window function
+
+        Unlike a slice this can still be filtered, so it works as a Prefetch
+        queryset under the plain 'comments' name
+        """
+        rank = models.Window(
+            RowNumber(),
+            partition_by=models.F('ticket_id'),
+            order_by=[models.F('created_at').desc(), models.F('id').asc()],
+        )
+        return self.annotate(comment_rank=rank).filter(comment_rank__lte=limit)
+
+    def with_ticket_owner(self):
+        """Joins the comment's ticket for its team and assignee, minus the large columns"""
+        return self.select_related('ticket').defer('ticket__description', 'ticket__search_vector')
+
+
 class Comment(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at', 'id']
+        indexes = [
+            # a ticket's comments newest first, backs the comment list cursor
+            models.Index(fields=['ticket', '-created_at', 'id'], name='comment_ticket_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.author} on {self.ticket}"
+
+
+class TicketStat(models.Model):
+    """
+    Rollup of ticket counts per dashboard bucket
+
+    One row per (dimension, key), kept current by Ticket_app.stats on every
+    ticket write so the dashboard never scans the ticket table.
+    key is the status/priority value or the category/team id, 0 means none.
+    """
+    class Dimension(models.TextChoices):
+        STATUS = 'status', 'Status'
+        PRIORITY = 'priority', 'Priority'
+        CATEGORY = 'category', 'Category'
+        TEAM = 'team', 'Team'
+
+    dimension = models.CharField(max_length=20, choices=Dimension.choices)
+    key = models.IntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='ticket_stat_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.key}: {self.count}"
+
+
+class MemberWorkload(models.Model):
+    """
+    Open ticket load per assignee, read by least-loaded auto assignment
+
+    open_count is the user's open and in progress tickets, load the same
+    tickets weighted by priority (Ticket_app.workload.PRIORITY_WEIGHTS).
+    Kept current by Ticket_app.stats.record_ticket_changes alongside
+    TicketStat, a user without a row has nothing open.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    open_count = models.IntegerField(default=0)
+    load = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"user {self.user_id}: {self.open_count} open, load {self.load}"
+
+
+class ChangeCounter(models.Model):
+    """
+    Single row handing out change tokens for the delta-sync feed
+
+    advance() increments the row inside the caller's transaction, the row
+    lock is held until commit so tokens become visible in order and a
+    client that has seen token N can never miss a write numbered <= N.
+    pruned_through is the newest token whose tombstones have been pruned,
+    older tokens have to resync from scratch.
+    """
+    value = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+    @classmethod
+    def advance(cls):
+        """Takes the next change token, call it as late in the transaction as possible"""
+        if not cls.objects.filter(pk=1).update(value=models.F('value') + 1):
+            cls.objects.get_or_create(pk=1)
+            return cls.advance()
+        return cls.objects.values_list('value', flat=True).get(pk=1)
+
+    @classmethod
+    def current(cls):
+        """Newest committed change token"""
+        return cls.objects.filter(pk=1).values_list('value', 'pruned_through').first() or (0, 0)
+
+    def __str__(self):
+        return f"change {self.value}"
+
+
+class Tombstone(models.Model):
+    """Deleted ticket or comment, so delta-sync clients can drop their copy"""
+    class Kind(models.TextChoices):
+        TICKET = 'ticket', 'Ticket'
+        COMMENT = 'comment', 'Comment'
+        # moved to the archive, still readable but gone from the live list
+        ARCHIVED = 'archived', 'Archived ticket'
+        # team or assignee changed, whoever only saw it through the previous
+        # ones may not see it any more
+        MOVED = 'moved', 'Reassigned ticket'
+
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    ticket_id = models.BigIntegerField()
+    # the ticket's team, assignee and creator when it was written (before the
+    # change for MOVED), the changes feed only hands a tombstone to users who
+    # could read the ticket through one of them
+    previous_team_id = models.BigIntegerField(null=True, blank=True)
+    previous_assignee_id = models.BigIntegerField(null=True, blank=True)
+    previous_creator_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['seq'], name='tombstone_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    @classmethod
+    def for_ticket(cls, seq, kind, ticket, object_id=None):
+        """Unsaved tombstone for ticket (live or archived) or, given object_id, one of its comments"""
+        return cls(
+            seq=seq, kind=kind, object_id=object_id or ticket.pk, ticket_id=ticket.pk,
+            previous_team_id=ticket.assigned_to_team_id, previous_assignee_id=ticket.assigned_to_id,
+            previous_creator_id=ticket.created_by_id,
+        )
+
+    @classmethod
+    def record_moves(cls, seq, moves):
+        """
+        MOVED tombstones from (ticket, (team id, assignee id) before) pairs,
+        pass only the tickets whose team or assignee actually changed
+        """
+        cls.objects.bulk_create(
+            cls(seq=seq, kind=cls.Kind.MOVED, object_id=ticket.pk, ticket_id=ticket.pk,
+                previous_team_id=team, previous_assignee_id=assignee, previous_creator_id=ticket.created_by_id)
+            for ticket, (team, assignee) in moves
+        )
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at change {self.seq}"
+
+
+class ArchivedTicket(models.Model):
+    """
+    A closed ticket moved out of the hot Ticket table by archive_tickets
+
+    Same columns and id as the Ticket it came from so it reads the same
+    through the API, plus archived_at. Rows are written once and never
+    updated, Ticket_app.archive.restore_ticket moves one back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    status = models.IntegerField(choices=Ticket.Status.choices)
+    priority = models.IntegerField(choices=Ticket.Priority.choices)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_tickets'
+    )
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_created_tickets')
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_assigned_tickets'
+    )
+    assigned_to_team = models.ForeignKey(
+        Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_team_tickets'
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    # copied from the ticket, already covers its comments
+    search_vector = SearchVectorField(null=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    objects = BaseTicketQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-created_at', 'id']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='archived_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    ticket = models.ForeignKey(ArchivedTicket, on_delete=models.CASCADE, related_name='comments')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_comments')
+    content = models.TextField()
+    created_at = models.DateTimeField()
+
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', 'id']
+        indexes = [
+            models.Index(fields=['ticket', '-created_at', 'id'], name='archived_comment_created_idx'),
+        ]
 
     def __str__(self):
-        return f"Comment by {self.author} on {self.ticket}"
\ No newline at end of file
+        return f"Archived comment by {self.author} on {self.ticket}"
@@ -0,0 +1,58 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, DecimalField, Exists, F, FloatField, OuterRef, Q, Value, When
+from django.db.models.functions import Cast, Round
+
+
+# must match the configuration the search_vector trigger uses (migration 0007)
+SEARCH_CONFIG = 'english'
+
+# fallback weights mirror ts_rank's defaults for the A/B/C labels the
+# trigger gives title, description and comments
+TITLE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+COMMENT_WEIGHT = 0.2
+
+
+def stable_rank(rank):
+    """
+    rank rounded to a fixed-point number
+
+    The search cursor carries the last rank through JSON and compares it
+    with rank = x on the next page. A float4 ts_rank doesn't come back as
+    the same number, so ties would be skipped or repeated, a decimal does.
+    """
+    return Cast(Round(rank, 6), DecimalField(max_digits=12, decimal_places=6))
+
+
+def search_tickets(queryset, text):
+    """
+    Filters tickets matching text across title, description and comments and
+    annotates a relevance 'rank' (higher is better, a Decimal)
+
+    PostgreSQL uses the GIN indexed search_vector, other backends fall back to
+    case-insensitive term matching so tests run on SQLite.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(rank=stable_rank(SearchRank(F('search_vector'), query)))
+    return _fallback_search(queryset, text)
+
+
+def _fallback_search(queryset, text):
+    # every term must appear somewhere, rank adds up where each one was found
+    rank = Value(0.0, output_field=FloatField())
+    # Comment or ArchivedComment, whichever table the tickets come from
+    comment_model = queryset.model._meta.get_field('comments').related_model
+    for term in text.split():
+        in_comments = Exists(comment_model.objects.filter(ticket=OuterRef('pk'), content__icontains=term))
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term) | in_comments)
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(TITLE_WEIGHT)), default=Value(0.0), output_field=FloatField()
+        ) + Case(
+            When(description__icontains=term, then=Value(DESCRIPTION_WEIGHT)), default=Value(0.0),
+            output_field=FloatField(),
+        ) + Case(
+            When(in_comments, then=Value(COMMENT_WEIGHT)), default=Value(0.0), output_field=FloatField()
+        )
+    return queryset.annotate(rank=stable_rank(rank))
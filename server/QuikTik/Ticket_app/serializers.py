@@ -1,5 +1,48 @@
 from rest_framework import serializers
-from .models import Category, Ticket, Comment
+from .models import ArchivedComment, ArchivedTicket, Category, Ticket, Comment
+
+
+class SparseFieldsMixin:
+    """
+    Lets a caller trim a serializer with fields= and add optional nested
+    data with expand=
+
+    Usage: TicketListSerializer(tickets, many=True, fields=['id', 'title'], expand=['comments'])
+
+    field_columns maps each serializer field to the model columns it reads
+    so views can hand the same selection to QuerySet.only()
+    """
+
+    field_columns = {}
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            if name in self.expandable_fields and name not in self.fields:
+                self.fields[name] = self.expandable_fields[name]()
+        if fields:
+            keep = set(fields) | {'id'} | set(expand)
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_columns(cls, fields=None):
+        names = list(fields) if fields else list(cls.Meta.fields)
+        columns = {'id'}
+        for name in names:
+            columns.update(cls.field_columns.get(name, ()))
+        return columns
+
+    @classmethod
+    def wants(cls, name, fields=None, expand=()):
+        # whether a field will be serialized for this fields/expand selection
+        if name in expand:
+            return name in cls.expandable_fields or name in cls.Meta.fields
+        if fields:
+            return name in fields and name in cls.Meta.fields
+        return name in cls.Meta.fields
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -18,7 +61,7 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'ticket', 'author', 'created_at']
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     status_label = serializers.CharField(source='get_status_display', read_only=True)
     priority_label = serializers.CharField(source='get_priority_display', read_only=True)
     created_by_email = serializers.EmailField(source='created_by.email', read_only=True)
@@ -26,11 +69,92 @@ class TicketSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
     team_name = serializers.CharField(source='assigned_to_team.name', read_only=True, allow_null=True)
     comments = CommentSerializer(many=True, read_only=True)
-    
+
+    field_columns = {
+        'id': ('id',),
+        'title': ('title',),
+        'description': ('description',),
+        'status': ('status',),
+        'status_label': ('status',),
+        'priority': ('priority',),
+        'priority_label': ('priority',),
+        'category': ('category',),
+        'category_name': ('category', 'category__name'),
+        'created_by': ('created_by',),
+        'created_by_email': ('created_by', 'created_by__email'),
+        'assigned_to': ('assigned_to',),
+        'assigned_to_email': ('assigned_to', 'assigned_to__email'),
+        'assigned_to_team': ('assigned_to_team',),
+        'team_name': ('assigned_to_team', 'assigned_to_team__name'),
+        'created_at': ('created_at',),
+        'updated_at': ('updated_at',),
+        'comment_count': ('comment_count',),
+        'last_activity_at': ('last_activity_at',),
+    }
+
     class Meta:
         model = Ticket
         fields = ['id', 'title', 'description', 'status', 'status_label', 
                   'priority', 'priority_label', 'category', 'category_name',
                   'created_by', 'created_by_email', 'assigned_to', 'assigned_to_email',
-                  'assigned_to_team', 'team_name', 'created_at', 'updated_at', 'comments']
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
\ No newline at end of file
+                  'assigned_to_team', 'team_name', 'created_at', 'updated_at',
+                  'comment_count', 'last_activity_at', 'comments']
+        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+
+
+class TicketListSerializer(TicketSerializer):
+    """
+    Compact ticket row for list views
+
+    Leaves out description and comments (comment_count instead),
+    ?expand=comments brings the comments back
+    """
+    comments = None
+
+    expandable_fields = {
+        'comments': lambda: CommentSerializer(many=True, read_only=True),
+    }
+
+    class Meta(TicketSerializer.Meta):
+        fields = ['id', 'title', 'status', 'status_label',
+                  'priority', 'priority_label', 'category', 'category_name',
+                  'created_by', 'created_by_email', 'assigned_to', 'assigned_to_email',
+                  'assigned_to_team', 'team_name', 'created_at', 'updated_at',
+                  'comment_count', 'last_activity_at']
+
+
+
+class TicketSearchSerializer(TicketListSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(TicketListSerializer.Meta):
+        fields = TicketListSerializer.Meta.fields + ['rank']
+
+
+# read-only views of the archive, same shape as the live ticket plus archived_at
+
+
+class ArchivedCommentSerializer(CommentSerializer):
+    class Meta(CommentSerializer.Meta):
+        model = ArchivedComment
+
+
+class ArchivedTicketSerializer(TicketSerializer):
+    comments = ArchivedCommentSerializer(many=True, read_only=True)
+
+    field_columns = {**TicketSerializer.field_columns, 'archived_at': ('archived_at',)}
+
+    class Meta(TicketSerializer.Meta):
+        model = ArchivedTicket
+        fields = TicketSerializer.Meta.fields + ['archived_at']
+
+
+class ArchivedTicketSearchSerializer(TicketSearchSerializer):
+    field_columns = ArchivedTicketSerializer.field_columns
+    expandable_fields = {
+        'comments': lambda: ArchivedCommentSerializer(many=True, read_only=True),
+    }
+
+    class Meta(TicketSearchSerializer.Meta):
+        model = ArchivedTicket
+        fields = TicketSearchSerializer.Meta.fields + ['archived_at']
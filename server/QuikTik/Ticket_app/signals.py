@@ -0,0 +1,69 @@
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from Team_app.models import Team
+from User_app.models import User
+from .models import Category, ChangeCounter, Comment, Ticket, TicketStat, Tombstone
+from .stats import fold_bucket
+
+
+# deleting a category or team nulls it on its tickets with a bulk UPDATE,
+# move their rollup counts to the 'none' bucket to match. The tickets are
+# marked changed first so the change token is always taken before the
+# rollup rows are locked, same order as the ticket views.
+
+
+@receiver(pre_delete, sender=Category)
+def fold_category_stats(sender, instance, **kwargs):
+    Ticket.objects.filter(category=instance).mark_changed()
+    fold_bucket(TicketStat.Dimension.CATEGORY, instance.pk)
+
+
+@receiver(pre_delete, sender=Team)
+def fold_team_stats(sender, instance, **kwargs):
+    Ticket.objects.filter(assigned_to_team=instance).mark_changed()
+    fold_bucket(TicketStat.Dimension.TEAM, instance.pk)
+
+
+# ticket rows embed category and team names and user emails, renaming one
+# puts the affected tickets back in the changes feed
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    if not created:
+        Ticket.objects.filter(category=instance).mark_changed()
+
+
+@receiver(post_save, sender=Team)
+def team_renamed(sender, instance, created, **kwargs):
+    if not created:
+        Ticket.objects.filter(assigned_to_team=instance).mark_changed()
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, update_fields=None, **kwargs):
+    # skips the last_login save on every login
+    if created or (update_fields and not {'email', 'first_name', 'last_name'} & set(update_fields)):
+        return
+    Ticket.objects.filter(
+        Q(created_by=instance) | Q(assigned_to=instance) | Q(comments__author=instance)
+    ).mark_changed()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # their tickets and comments cascade away and their assignments are nulled
+    seq = ChangeCounter.advance()
+    owners = ('assigned_to_team', 'assigned_to', 'created_by')
+    tickets = [
+        Tombstone.for_ticket(seq, Tombstone.Kind.TICKET, ticket)
+        for ticket in Ticket.objects.filter(created_by=instance).only(*owners)
+    ]
+    comments = [
+        Tombstone.for_ticket(seq, Tombstone.Kind.COMMENT, comment.ticket, object_id=comment.pk)
+        for comment in Comment.objects.filter(author=instance).exclude(ticket__created_by=instance).select_related(
+            'ticket').only('ticket', *(f'ticket__{field}' for field in owners))
+    ]
+    Tombstone.objects.bulk_create(tickets + comments)
+    Ticket.objects.filter(assigned_to=instance).exclude(created_by=instance).update(change_seq=seq)
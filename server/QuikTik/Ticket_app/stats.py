@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict
+from django.db.models import Case, Count, F, Q, Value, When
+from .models import ArchivedTicket, Ticket, TicketStat
+from .workload import apply_load_deltas, invalidate_workload_report, ticket_load
+
+
+Dimension = TicketStat.Dimension
+
+# dimension -> Ticket column the bucket key comes from
+DIMENSION_COLUMNS = {
+    Dimension.STATUS: 'status',
+    Dimension.PRIORITY: 'priority',
+    Dimension.CATEGORY: 'category_id',
+    Dimension.TEAM: 'assigned_to_team_id',
+}
+# not a TicketStat dimension, its bucket is (WORKLOAD, (assignee id, weight))
+# and feeds MemberWorkload instead
+WORKLOAD = 'workload'
+
+
+def ticket_buckets(ticket):
+    """The (dimension, key) buckets one ticket counts towards, plus its assignee's workload"""
+    buckets = [(dimension, getattr(ticket, column) or 0) for dimension, column in DIMENSION_COLUMNS.items()]
+    load = ticket_load(ticket)
+    if load:
+        buckets.append((WORKLOAD, load))
+    return buckets
+
+
+def record_ticket_changes(added=(), removed=()):
+    """
+    Applies ticket writes to the rollup and the member workloads, and drops
+    the cached workload report
+
+    added/removed are tickets (or bucket lists from ticket_buckets) that
+    entered or left a bucket. An update is the old buckets removed and the
+    new ones added, unchanged dimensions cancel out.
+
+    Usage: before = ticket_buckets(ticket); ticket.save()
+           record_ticket_changes(added=[ticket], removed=[before])
+    """
+    deltas = Counter()
+    loads = defaultdict(lambda: (0, 0))
+    for items, sign in ((added, 1), (removed, -1)):
+        for item in items:
+            for bucket in _buckets(item):
+                if bucket[0] == WORKLOAD:
+                    user, weight = bucket[1]
+                    count, load = loads[user]
+                    loads[user] = (count + sign, load + sign * weight)
+                else:
+                    deltas[bucket] += sign
+    apply_deltas(deltas)
+    apply_load_deltas(loads)
+    invalidate_workload_report()
+
+
+def apply_deltas(deltas):
+    deltas = {bucket: delta for bucket, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    # make sure every bucket we add to exists, lock them in (dimension, key)
+    # order, then bump them all with one UPDATE ... SET count = count + CASE.
+    # With a fixed lock order two opposite status changes (+1 OPEN / -1
+    # CLOSED against -1 OPEN / +1 CLOSED) queue up instead of deadlocking.
+    # Callers are already inside the ticket write's transaction.
+    new_buckets = [TicketStat(dimension=d, key=k) for (d, k), delta in deltas.items() if delta > 0]
+    if new_buckets:
+        TicketStat.objects.bulk_create(new_buckets, ignore_conflicts=True)
+
+    buckets, change = Q(), []
+    for (dimension, key), delta in sorted(deltas.items()):
+        buckets |= Q(dimension=dimension, key=key)
+        change.append(When(dimension=dimension, key=key, then=Value(delta)))
+    rows = TicketStat.objects.filter(buckets)
+    if len(change) > 1:
+        list(rows.select_for_update().order_by('dimension', 'key').values_list('pk', flat=True))
+    rows.update(count=F('count') + Case(*change, default=Value(0)))
+
+
+def fold_bucket(dimension, key):
+    """Moves a bucket's count to 'none', for a category or team being deleted"""
+    count = TicketStat.objects.filter(dimension=dimension, key=key).values_list('count', flat=True).first()
+    if count:
+        apply_deltas({(dimension, 0): count})
+    TicketStat.objects.filter(dimension=dimension, key=key).delete()
+
+
+def actual_counts():
+    """
+    Counts straight from the ticket tables, one GROUP BY per dimension and table
+
+    Archived tickets still count, archiving moves a ticket but leaves the rollup alone
+    """
+    counts = Counter()
+    for model in (Ticket, ArchivedTicket):
+        for dimension, column in DIMENSION_COLUMNS.items():
+            rows = model.objects.order_by().values(column).annotate(total=Count('id'))
+            for row in rows:
+                counts[(dimension, row[column] or 0)] += row['total']
+    return dict(counts)
+
+
+def ticket_counts(querysets):
+    """
+    {(dimension, key): count} over querysets of live and/or archived tickets
+
+    For a part of the tickets, e.g. what a user may read, where the rollup
+    covering all of them doesn't apply. One GROUP BY on all four columns
+    per queryset.
+    """
+    counts = Counter()
+    for queryset in querysets:
+        rows = queryset.order_by().values(*DIMENSION_COLUMNS.values()).annotate(total=Count('id'))
+        for row in rows:
+            for dimension, column in DIMENSION_COLUMNS.items():
+                counts[(dimension, row[column] or 0)] += row['total']
+    return dict(counts)
+
+
+def _buckets(item):
+    return item if isinstance(item, list) else ticket_buckets(item)
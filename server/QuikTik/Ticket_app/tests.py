@@ -1,3 +1,1192 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from QuikTik.authz import AuthContext, Perm
+from QuikTik.broker import BaseBackend, get_broker
+from QuikTik.pagination import KeysetPagination
+from QuikTik.testing import QueryBudgetTestCase
+from User_app.models import User
+from Team_app.models import TeamMembership
+from .models import (
+    ArchivedComment, ArchivedTicket, ChangeCounter, Comment, MemberWorkload, Ticket, TicketStat, Tombstone,
+)
+from .stats import actual_counts
+from .workload import actual_loads
+from .archive import restore_ticket
+from .events import CHANNEL, event_visible
+from .importer import TicketImporter
+from .views import LATEST_COMMENTS, TicketChangesView
 
-# Create your tests here.
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = user = User.objects.create_user('pager@example.com', 'pass1234a', role=User.Role.ADMIN)
+        start = timezone.now()
+        for i in range(7):
+            ticket = Ticket.objects.create(title=f'T{i}', description='x', created_by=user, priority=i % 2 + 1)
+            # two tickets per timestamp, so pages have to break ties on id
+            Ticket.objects.filter(pk=ticket.pk).update(created_at=start - timedelta(minutes=i // 2))
+
+    def paginate(self, url, ordering=None):
+        paginator = KeysetPagination()
+        if ordering:
+            paginator.ordering = ordering
+        rows = paginator.paginate_queryset(Ticket.objects.all(), Request(APIRequestFactory().get(url)))
+        return [ticket.pk for ticket in rows], paginator.get_next_link(), paginator.get_previous_link()
+
+    def walk(self, ordering=None):
+        # forward to the end, then back to the start through the previous links
+        pages, url = [], '/?page_size=3'
+        while url:
+            ids, url, previous = self.paginate(url, ordering)
+            pages.append(ids)
+        backwards = [ids]
+        while previous:
+            ids, _, previous = self.paginate(previous, ordering)
+            backwards.append(ids)
+        self.assertEqual(backwards[::-1], pages)
+        return [pk for ids in pages for pk in ids]
+
+    def test_pages_forward_and_back(self):
+        expected = list(Ticket.objects.order_by('-created_at', 'id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(), expected)
+        ids, next_link, previous = self.paginate('/?page_size=3')
+        self.assertEqual(len(ids), 3)
+        self.assertIsNone(previous)
+
+    def test_mixed_directions(self):
+        ordering = ('priority', '-created_at', 'id')
+        expected = list(Ticket.objects.order_by(*ordering).values_list('pk', flat=True))
+        self.assertEqual(self.walk(ordering), expected)
+
+    def test_invalid_cursor(self):
+        for cursor in ('%%%', 'bm90IGpzb24=', 'eyJwIjogWzFdfQ==', 'eyJwIjogWyJub3QgYSBkYXRlIiwgMV19'):
+            with self.assertRaises(NotFound, msg=cursor):
+                self.paginate(f'/?cursor={cursor}')
+        date = timezone.now().isoformat()
+        for position in ([{}, 1], [None, 1], [date, None], [[1], 1], [date, 'x'], [date, True], [1.5, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            with self.assertRaises(NotFound, msg=position):
+                self.paginate(f'/?cursor={cursor}')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/ticket/tickets/?cursor=bm90IGpzb24=')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class TicketQueryBudgetTests(QueryBudgetTestCase):
+    def test_ticket_list(self):
+        self.assertQueryBudget(1, self.member, 'get', '/api/v1/ticket/tickets/', status_code=200)
+
+    def test_ticket_list_does_not_grow_with_rows(self):
+        client = self.client_for(self.member)
+        client.get('/api/v1/ticket/tickets/')  # warm the token cache
+        with CaptureQueriesContext(connection) as small:
+            client.get('/api/v1/ticket/tickets/')
+        self.make_tickets(20)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get('/api/v1/ticket/tickets/')
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertEqual(len(small), len(large))
+
+    def test_ticket_list_expand_comments(self):
+        self.assertQueryBudget(2, self.member, 'get', '/api/v1/ticket/tickets/?expand=comments', status_code=200)
+
+    def test_ticket_detail(self):
+        self.assertQueryBudget(3, self.member, 'get', f'/api/v1/ticket/tickets/{self.ticket.pk}/', status_code=200)
+
+    def test_ticket_create(self):
+        data = {'title': 'New', 'description': 'Broken', 'category': self.category.pk}
+        # includes locking the rollup buckets before bumping them
+        self.assertQueryBudget(10, self.member, 'post', '/api/v1/ticket/tickets/', data, status_code=201)
+
+    def test_ticket_update(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        # includes the assignee's workload update
+        self.assertQueryBudget(11, self.member, 'patch', url, {'priority': 1}, status_code=200)
+
+    def test_ticket_assign(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/assign/'
+        data = {'assigned_to': self.member.pk, 'assigned_to_team': self.team.pk}
+        # steady state, the new assignee already has a workload row to move the load to,
+        # plus the tombstone for the previous assignee
+        MemberWorkload.objects.create(user=self.member)
+        self.assertQueryBudget(13, self.lead, 'patch', url, data, status_code=200)
+
+    def test_ticket_stats(self):
+        # the rollup, categories, teams
+        self.assertQueryBudget(3, self.admin, 'get', '/api/v1/ticket/stats/', status_code=200)
+        # live and archived tickets counted instead of the rollup
+        self.assertQueryBudget(4, self.member, 'get', '/api/v1/ticket/stats/', status_code=200)
+
+    def test_ticket_bulk(self):
+        # one batch costs the same however many tickets it touches
+        items = [{'id': pk, 'status': 4, 'assigned_to_team': self.team.pk}
+                 for pk in Ticket.objects.values_list('id', flat=True)]
+        self.assertQueryBudget(11, self.lead, 'post', '/api/v1/ticket/tickets/bulk/', {'tickets': items},
+                               status_code=200)
+
+    def test_ticket_changes(self):
+        self.assertQueryBudget(3, self.member, 'get', '/api/v1/ticket/tickets/changes/?since=0', status_code=200)
+
+    def test_ticket_delete(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        self.assertQueryBudget(11, self.admin, 'delete', url, status_code=204)
+
+
+class CommentQueryBudgetTests(QueryBudgetTestCase):
+    def test_comment_list(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/'
+        self.assertQueryBudget(2, self.member, 'get', url, status_code=200)
+
+    def test_comment_create(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/'
+        # insert + counter update, wrapped in a savepoint
+        self.assertQueryBudget(7, self.member, 'post', url, {'content': 'Any update?'}, status_code=201)
+
+    def test_comment_update(self):
+        comment = self.ticket.comments.filter(author=self.member).first()
+        url = f'/api/v1/ticket/comments/{comment.pk}/'
+        self.assertQueryBudget(7, self.member, 'patch', url, {'content': 'Edited'}, status_code=200)
+
+    def test_comment_delete(self):
+        comment = self.ticket.comments.filter(author=self.member).first()
+        url = f'/api/v1/ticket/comments/{comment.pk}/'
+        self.assertQueryBudget(8, self.member, 'delete', url, status_code=204)
+
+
+class TicketSparseFieldsTests(QueryBudgetTestCase):
+    def test_list_rows_are_compact(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/')
+        row = response.data['results'][0]
+        self.assertNotIn('description', row)
+        self.assertNotIn('comments', row)
+        self.assertEqual(row['comment_count'], 2)
+
+    def test_list_expand_comments(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/?expand=comments')
+        self.assertEqual(len(response.data['results'][0]['comments']), 2)
+
+    def test_list_fetches_only_requested_columns(self):
+        client = self.client_for(self.member)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/v1/ticket/tickets/?fields=title,status_label')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'status_label'})
+        ticket_sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('"description"', ticket_sql)
+        self.assertNotIn('"priority"', ticket_sql)
+        self.assertNotIn('JOIN', ticket_sql)
+
+    def test_detail_fields(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/?fields=title,description'
+        response = self.client_for(self.member).get(url)
+        self.assertEqual(set(response.data), {'id', 'title', 'description'})
+
+    def test_detail_fields_with_expand(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/?fields=title&expand=comments'
+        response = self.client_for(self.member).get(url)
+        self.assertEqual(set(response.data), {'id', 'title', 'comments', 'comments_next'})
+        self.assertEqual(len(response.data['comments']), 2)
+        self.assertIsNone(response.data['comments_next'])
+
+
+class TicketFilterTests(QueryBudgetTestCase):
+    def get_ids(self, query):
+        response = self.client_for(self.member).get(f'/api/v1/ticket/tickets/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filter_by_team_status_and_priority(self):
+        urgent = Ticket.objects.create(
+            title='Down', description='All down', created_by=self.member,
+            assigned_to_team=self.team, priority=Ticket.Priority.URGENT,
+        )
+        Ticket.objects.create(
+            title='Closed', description='Done', created_by=self.member, assigned_to_team=self.team,
+            priority=Ticket.Priority.URGENT, status=Ticket.Status.CLOSED,
+        )
+        ids = self.get_ids(f'assigned_to_team={self.team.pk}&status=1&priority=1')
+        self.assertEqual(ids, [urgent.pk])
+
+    def test_filter_unassigned(self):
+        ticket = Ticket.objects.create(title='Loose', description='x', created_by=self.member)
+        self.assertEqual(self.get_ids('assigned_to=none'), [ticket.pk])
+
+    def test_filter_created_range(self):
+        self.assertEqual(self.get_ids('created_after=2999-01-01'), [])
+        self.assertEqual(len(self.get_ids('created_before=2999-01-01')), 5)
+
+    def test_ordering_pages_through_every_ticket(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(priority=Ticket.Priority.URGENT)
+        client = self.client_for(self.member)
+        url = '/api/v1/ticket/tickets/?ordering=priority&page_size=2'
+        ids = []
+        while url:
+            response = client.get(url)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids[0], self.ticket.pk)
+        self.assertEqual(sorted(ids), sorted(Ticket.objects.values_list('id', flat=True)))
+
+    def test_invalid_params(self):
+        client = self.client_for(self.member)
+        for query in ('status=9', 'priority=high', 'created_after=yesterday', 'ordering=title'):
+            response = client.get(f'/api/v1/ticket/tickets/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+class TicketSearchTests(QueryBudgetTestCase):
+    def search(self, query):
+        response = self.client_for(self.member).get(f'/api/v1/ticket/tickets/search/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_ranks_title_above_description_and_comments(self):
+        in_title = Ticket.objects.create(title='VPN drops', description='x', created_by=self.member)
+        in_description = Ticket.objects.create(title='Remote', description='vpn keeps failing', created_by=self.member)
+        in_comment = Ticket.objects.create(title='Laptop', description='slow', created_by=self.member)
+        Comment.objects.create(ticket=in_comment, author=self.lead, content='Check the VPN client')
+        ids = [row['id'] for row in self.search('q=vpn')['results']]
+        self.assertEqual(ids, [in_title.pk, in_description.pk, in_comment.pk])
+
+    def test_all_terms_must_match(self):
+        match = Ticket.objects.create(title='Printer jam', description='tray 2', created_by=self.member)
+        Ticket.objects.create(title='Printer toner', description='empty', created_by=self.member)
+        ids = [row['id'] for row in self.search('q=printer tray')['results']]
+        self.assertEqual(ids, [match.pk])
+
+    def test_results_paginate(self):
+        client = self.client_for(self.member)
+        url = '/api/v1/ticket/tickets/search/?q=printer&page_size=2'
+        ids = []
+        while url:
+            response = client.get(url)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(ids), sorted(Ticket.objects.values_list('id', flat=True)))
+
+    def test_tied_ranks_page_once(self):
+        # title, description and comment hits add up to a rank that isn't exact in binary
+        for i in range(5):
+            ticket = Ticket.objects.create(title=f'Modem {i}', description='modem lights', created_by=self.member)
+            Comment.objects.create(ticket=ticket, author=self.lead, content='Reset the modem')
+        client = self.client_for(self.member)
+        url = '/api/v1/ticket/tickets/search/?q=modem&page_size=2'
+        rows = []
+        while url:
+            response = client.get(url)
+            rows += response.data['results']
+            url = response.data['next']
+        self.assertEqual({row['rank'] for row in rows}, {1.6})
+        expected = Ticket.objects.filter(title__startswith='Modem').order_by('-created_at', 'id')
+        self.assertEqual([row['id'] for row in rows], list(expected.values_list('id', flat=True)))
+
+    def test_query_required(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/search/')
+        self.assertEqual(response.status_code, 400)
+
+
+class TicketCommentStatsTests(QueryBudgetTestCase):
+    def test_comment_create_and_delete_maintain_stats(self):
+        client = self.client_for(self.member)
+        response = client.post(f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/', {'content': 'Bump'})
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 3)
+        self.assertEqual(self.ticket.last_activity_at.isoformat(), response.data['created_at'].replace('Z', '+00:00'))
+
+        client.delete(f'/api/v1/ticket/comments/{response.data["id"]}/')
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 2)
+        self.assertEqual(self.ticket.last_activity_at, self.ticket.comments.first().created_at)
+
+    def test_repair_command_fixes_drift(self):
+        Ticket.objects.update(comment_count=99, last_activity_at=self.ticket.created_at)
+        call_command('repair_ticket_activity', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(set(Ticket.objects.values_list('comment_count', flat=True)), {2})
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.last_activity_at, self.ticket.comments.first().created_at)
+
+    def test_order_by_busiest(self):
+        busy = Ticket.objects.create(title='Busy', description='x', created_by=self.member)
+        for _ in range(3):
+            self.client_for(self.member).post(f'/api/v1/ticket/tickets/{busy.pk}/comments/', {'content': '+1'})
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/?ordering=-comment_count&min_comments=3')
+        self.assertEqual([row['id'] for row in response.data['results']], [busy.pk])
+        self.assertEqual(response.data['results'][0]['comment_count'], 3)
+
+
+class TicketStatsTests(QueryBudgetTestCase):
+    def assertRollupMatches(self):
+        stored = {(s.dimension, s.key): s.count for s in TicketStat.objects.exclude(count=0)}
+        self.assertEqual(stored, actual_counts())
+
+    def test_writes_keep_rollup_current(self):
+        member, lead = self.client_for(self.member), self.client_for(self.lead)
+        response = member.post('/api/v1/ticket/tickets/', {'title': 'New', 'description': 'x', 'priority': 1})
+        self.assertRollupMatches()
+        pk = response.data['id']
+        member.patch(f'/api/v1/ticket/tickets/{pk}/', {'status': 2, 'category': self.category.pk}, format='json')
+        self.assertRollupMatches()
+        lead.patch(f'/api/v1/ticket/tickets/{pk}/assign/', {'assigned_to_team': self.team.pk}, format='json')
+        self.assertRollupMatches()
+        member.delete(f'/api/v1/ticket/tickets/{pk}/')
+        self.assertRollupMatches()
+
+    def test_deleting_category_folds_bucket(self):
+        self.category.delete()
+        self.assertRollupMatches()
+
+    def test_stats_endpoint(self):
+        data = self.client_for(self.member).get('/api/v1/ticket/stats/').data
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['by_status'], [{'status': 1, 'label': 'Open', 'count': 5}])
+        self.assertEqual(data['by_team'], [{'team': self.team.pk, 'name': 'Support', 'count': 5}])
+
+    def test_stats_count_visible_tickets(self):
+        Ticket.objects.create(title='Switch', description='x', created_by=self.admin, assigned_to_team=self.other_team)
+        call_command('reconcile_ticket_stats', stdout=StringIO())
+        # the lead is only in Support, the admin reads the rollup
+        self.assertEqual(self.client_for(self.lead).get('/api/v1/ticket/stats/').data['total'], 5)
+        self.assertEqual(self.client_for(self.member).get('/api/v1/ticket/stats/').data['total'], 6)
+        data = self.client_for(self.admin).get('/api/v1/ticket/stats/').data
+        self.assertEqual(data['by_team'], [
+            {'team': self.team.pk, 'name': 'Support', 'count': 5},
+            {'team': self.other_team.pk, 'name': 'Network', 'count': 1},
+        ])
+
+    def test_reconcile_fixes_drift(self):
+        TicketStat.objects.filter(dimension='status').update(count=42)
+        TicketStat.objects.filter(dimension='team').delete()
+        out = StringIO()
+        call_command('reconcile_ticket_stats', stdout=out)
+        self.assertIn('Fixed 2 drifted buckets', out.getvalue())
+        self.assertRollupMatches()
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+    def revalidate(self, user, url):
+        client = self.client_for(user)
+        first = client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first.headers)
+        with CaptureQueriesContext(connection) as ctx:
+            second = client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 304)
+        # just the validator, the token is cached and nothing is serialized
+        self.assertEqual(len(ctx), 1, '\n'.join(q['sql'] for q in ctx.captured_queries))
+        return first.headers['ETag']
+
+    def test_not_modified_responses(self):
+        self.revalidate(self.member, f'/api/v1/ticket/tickets/{self.ticket.pk}/')
+        self.revalidate(self.member, '/api/v1/ticket/categories/')
+        self.revalidate(self.admin, '/api/v1/team/')
+        self.revalidate(self.lead, '/api/v1/user/current/')
+
+    def test_ticket_etag_changes_with_ticket_and_comments(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        client = self.client_for(self.member)
+        etag = self.revalidate(self.member, url)
+
+        client.patch(url, {'priority': 1}, format='json')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        comment = self.ticket.comments.filter(author=self.member).first()
+        client.patch(f'/api/v1/ticket/comments/{comment.pk}/', {'content': 'Edited'}, format='json')
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ticket_etag_changes_with_category_rename(self):
+        # category_name is in the body, the rename leaves updated_at alone
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        etag = self.revalidate(self.member, url)
+        self.category.name = 'Printers'
+        self.category.save()
+        response = self.client_for(self.member).get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category_name'], 'Printers')
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_etag_depends_on_query_string(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        etag = self.revalidate(self.member, url)
+        response = self.client_for(self.member).get(f'{url}?fields=title', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_team_list_etag_changes_with_membership(self):
+        etag = self.revalidate(self.admin, '/api/v1/team/')
+        TeamMembership.objects.create(user=self.admin, team=self.other_team)
+        response = self.client_for(self.admin).get('/api/v1/team/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_ticket_still_404s(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/999/')
+        self.assertEqual(response.status_code, 404)
+
+
+class TicketChangesTests(QueryBudgetTestCase):
+    url = '/api/v1/ticket/tickets/changes/'
+
+    def sync(self, since, user=None, **params):
+        response = self.client_for(user or self.member).get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_initial_sync_returns_everything(self):
+        data = self.sync(0)
+        self.assertEqual(len(data['tickets']), Ticket.objects.count())
+        self.assertEqual(data['token'], ChangeCounter.current()[0])
+        self.assertFalse(data['has_more'])
+
+    def test_only_changes_after_token(self):
+        token = self.sync(0)['token']
+        self.assertEqual(self.sync(token)['tickets'], [])
+
+        client = self.client_for(self.member)
+        client.patch(f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'priority': 1}, format='json')
+        data = self.sync(token)
+        self.assertEqual([t['id'] for t in data['tickets']], [self.ticket.pk])
+        self.assertGreater(data['token'], token)
+
+    def test_tombstones(self):
+        token = self.sync(0)['token']
+        other = Ticket.objects.exclude(pk=self.ticket.pk).first()
+        comment = self.ticket.comments.filter(author=self.member).first()
+        self.client_for(self.member).delete(f'/api/v1/ticket/comments/{comment.pk}/')
+        self.client_for(self.admin).delete(f'/api/v1/ticket/tickets/{other.pk}/')
+
+        data = self.sync(token)
+        self.assertEqual(data['deleted'], {
+            'tickets': [other.pk],
+            'comments': [{'id': comment.pk, 'ticket': self.ticket.pk}],
+            'archived': [],
+            'hidden': [],
+        })
+        # the ticket's comment_count changed too
+        self.assertEqual([t['id'] for t in data['tickets']], [self.ticket.pk])
+
+    def test_tombstones_only_for_readable_tickets(self):
+        # a Network ticket, the lead (Support only) never saw it
+        ticket = Ticket.objects.create(
+            title='Switch', description='x', created_by=self.admin, assigned_to_team=self.other_team,
+        )
+        comment = Comment.objects.create(ticket=ticket, author=self.admin, content='Rebooting')
+        token = self.sync(0, self.lead)['token']
+        admin = self.client_for(self.admin)
+        admin.delete(f'/api/v1/ticket/comments/{comment.pk}/')
+        admin.delete(f'/api/v1/ticket/tickets/{ticket.pk}/')
+
+        empty = {'tickets': [], 'comments': [], 'archived': [], 'hidden': []}
+        self.assertEqual(self.sync(token, self.lead)['deleted'], empty)
+        expected = dict(empty, tickets=[ticket.pk], comments=[{'id': comment.pk, 'ticket': ticket.pk}])
+        self.assertEqual(self.sync(token)['deleted'], expected)
+        self.assertEqual(self.sync(token, self.admin)['deleted'], expected)
+
+    def test_reassigned_away(self):
+        ticket = Ticket.objects.create(
+            title='Router', description='x', created_by=self.admin, assigned_to=self.lead, assigned_to_team=self.team,
+        )
+        token = self.sync(0, self.lead)['token']
+        self.client_for(self.admin).patch(
+            f'/api/v1/ticket/tickets/{ticket.pk}/assign/',
+            {'assigned_to': self.admin.pk, 'assigned_to_team': self.other_team.pk}, format='json',
+        )
+        # the lead saw it through Support and as its assignee, now can't read it
+        data = self.sync(token, self.lead)
+        self.assertEqual(data['tickets'], [])
+        self.assertEqual(data['deleted']['hidden'], [ticket.pk])
+        # the member is in Network too, they get the new version instead
+        data = self.sync(token)
+        self.assertEqual([row['id'] for row in data['tickets']], [ticket.pk])
+        self.assertEqual(data['deleted']['hidden'], [])
+
+        # moved back: it's a changed ticket again, not a hidden one
+        self.client_for(self.admin).patch(
+            f'/api/v1/ticket/tickets/{ticket.pk}/', {'assigned_to_team': self.team.pk}, format='json',
+        )
+        data = self.sync(token, self.lead)
+        self.assertEqual([row['id'] for row in data['tickets']], [ticket.pk])
+        self.assertEqual(data['deleted']['hidden'], [])
+
+    def test_category_rename_marks_tickets(self):
+        token = self.sync(0)['token']
+        self.category.name = 'Devices'
+        self.category.save()
+        data = self.sync(token, fields='category_name')
+        self.assertEqual(len(data['tickets']), Ticket.objects.filter(category=self.category).count())
+        self.assertTrue(all(t['category_name'] == 'Devices' for t in data['tickets']))
+
+    def test_pages_by_token(self):
+        TicketChangesView.page_size = 2
+        try:
+            data = self.sync(0)
+            self.assertTrue(data['has_more'])
+            seen = [t['id'] for t in data['tickets']]
+            while data['has_more']:
+                data = self.sync(data['token'])
+                seen += [t['id'] for t in data['tickets']]
+        finally:
+            TicketChangesView.page_size = 500
+        self.assertEqual(sorted(seen), sorted(Ticket.objects.values_list('id', flat=True)))
+
+    def test_bad_and_expired_tokens(self):
+        client = self.client_for(self.member)
+        self.assertEqual(client.get(self.url, {'since': 'abc'}).status_code, 400)
+        self.assertEqual(client.get(self.url, {'since': 10 ** 9}).status_code, 410)
+
+        token = self.sync(0)['token']
+        self.client_for(self.admin).delete(f'/api/v1/ticket/tickets/{self.ticket.pk}/')
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+        call_command('prune_tombstones', days=30, stdout=StringIO())
+        self.assertEqual(client.get(self.url, {'since': token}).status_code, 410)
+        self.assertEqual(client.get(self.url, {'since': 0}).status_code, 200)
+
+
+class RecordingBackend(BaseBackend):
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+@override_settings(EVENT_BROKER={'BACKEND': 'Ticket_app.tests.RecordingBackend'})
+
+
+class TicketEventPublishTests(QueryBudgetTestCase):
+    def events(self):
+        return [message for channel, message in get_broker().published if channel == CHANNEL]
+
+    def test_writes_publish_after_commit(self):
+        client = self.client_for(self.lead)
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(f'{url}assign/', {'assigned_to': self.member.pk, 'assigned_to_team': self.team.pk},
+                         format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'{url}comments/', {'content': 'On it'}, format='json')
+
+        assigned, commented = self.events()
+        self.assertEqual(assigned['type'], 'ticket.assigned')
+        self.assertEqual(assigned['teams'], [self.team.pk])
+        # old and new assignee both hear about it
+        self.assertIn(self.member.pk, assigned['assignees'])
+        self.assertEqual(commented['type'], 'comment.created')
+        self.assertEqual(commented['ticket'], self.ticket.pk)
+        self.assertGreater(commented['change'], assigned['change'])
+
+    def test_failed_write_publishes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.member).patch(
+                f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'priority': 99}, format='json')
+        self.assertEqual(self.events(), [])
+
+
+class TicketEventStreamTests(QueryBudgetTestCase):
+    url = '/api/v1/ticket/tickets/events/'
+
+    async def test_stream_filters_by_team(self):
+        token = self.tokens[self.member.pk]
+        response = await self.async_client.get(
+            self.url, {'assigned_to_team': self.team.pk}, headers={'Authorization': f'Token {token}'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        broker = get_broker()
+        other = {'type': 'ticket.updated', 'ticket': 1, 'change': 7, 'teams': [self.other_team.pk], 'assignees': []}
+        ours = {'type': 'ticket.updated', 'ticket': 2, 'change': 8, 'teams': [self.team.pk], 'assignees': []}
+        broker.publish(CHANNEL, other)
+        broker.publish(CHANNEL, ours)
+        chunk = (await anext(stream)).decode()
+        self.assertTrue(chunk.startswith('id: 8\nevent: ticket.updated\n'))
+
+    async def test_token_required(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_slow_subscriber_gets_resync(self):
+        subscription = get_broker().subscribe(CHANNEL)
+        subscription.queue = asyncio.Queue(maxsize=1)
+        try:
+            subscription.deliver({'type': 'ticket.created'})
+            subscription.deliver({'type': 'ticket.updated'})
+            # the backlog is replaced by a single resync
+            self.assertEqual(await subscription.get(timeout=1), {'type': 'resync'})
+            self.assertIsNone(await subscription.get(timeout=0.01))
+        finally:
+            subscription.close()
+
+
+class TicketBulkTests(QueryBudgetTestCase):
+    url = '/api/v1/ticket/tickets/bulk/'
+
+    def bulk(self, user, items):
+        response = self.client_for(user).post(self.url, {'tickets': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_close_many(self):
+        ids = list(Ticket.objects.values_list('id', flat=True))
+        data = self.bulk(self.admin, [{'id': pk, 'status': Ticket.Status.CLOSED} for pk in ids])
+        self.assertEqual(data['updated'], len(ids))
+        self.assertFalse(Ticket.objects.exclude(status=Ticket.Status.CLOSED).exists())
+        # the rollup and the changes feed follow along
+        self.assertEqual(TicketStat.objects.get(dimension='status', key=Ticket.Status.CLOSED).count, len(ids))
+        self.assertEqual(Ticket.objects.values('change_seq').distinct().count(), 1)
+
+    def test_per_item_results(self):
+        data = self.bulk(self.lead, [
+            {'id': self.ticket.pk, 'priority': 1},
+            {'id': self.ticket.pk + 1000, 'priority': 1},
+            {'id': self.ticket.pk, 'assigned_to_team': self.other_team.pk},
+            {'id': self.ticket.pk, 'assigned_to': self.admin.pk},
+            {'id': self.ticket.pk, 'status': 42},
+            {'id': self.ticket.pk, 'title': 'Nope'},
+            {'status': 1},
+        ])
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['updated', 'error', 'error', 'error', 'error', 'error', 'error'])
+        self.assertEqual(data['results'][1]['error'], 'Ticket not found')
+        self.assertEqual(data['results'][2]['error'], 'Can only assign to your teams')
+        self.assertEqual(data['results'][3]['error'], 'Can only assign to members of your teams')
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.priority, 1)
+
+    def test_member_can_only_edit_own_tickets(self):
+        other = Ticket.objects.create(
+            title='Admin ticket', description='x', created_by=self.admin, assigned_to_team=self.team
+        )
+        hidden = Ticket.objects.create(title='Hidden', description='x', created_by=self.admin)
+        data = self.bulk(self.member, [
+            {'id': other.pk, 'status': Ticket.Status.CLOSED},
+            {'id': self.ticket.pk, 'assigned_to': self.member.pk},
+            {'id': hidden.pk, 'status': Ticket.Status.CLOSED},
+        ])
+        self.assertEqual(
+            [r['error'] for r in data['results']], ['Permission denied', 'Permission denied', 'Ticket not found']
+        )
+
+    def test_rejects_bad_payload(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.post(self.url, {'tickets': []}, format='json').status_code, 400)
+        self.assertEqual(client.post(self.url, [1, 2], format='json').status_code, 400)
+
+
+async def read_stream(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class TicketImportTests(QueryBudgetTestCase):
+    url = '/api/v1/ticket/tickets/import/'
+
+    def upload(self, user, name, content, **fields):
+        # through the ASGI handler, the way the progress is streamed
+        upload = SimpleUploadedFile(name, content if isinstance(content, bytes) else content.encode())
+        headers = {'Authorization': f'Token {self.tokens[user.pk]}'}
+        return async_to_sync(self.async_client.post)(self.url, {'file': upload, **fields}, headers=headers)
+
+    def progress(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in async_to_sync(read_stream)(response).splitlines()]
+
+    def test_progress_goes_out_per_batch(self):
+        content = 'title\n' + ''.join(f'Streamed {n}\n' for n in range(2500))
+        response = self.upload(self.admin, 'tickets.csv', content)
+
+        async def read():
+            # one loop for the whole stream, closing a loop closes its generators
+            stream = aiter(response.streaming_content)
+            first = json.loads(await anext(stream))
+            saved = await Ticket.objects.filter(title__startswith='Streamed').acount()
+            return first, saved, [json.loads(line) async for line in stream]
+        first, saved, rest = async_to_sync(read)()
+        # the first batch is reported before the next one is read
+        self.assertEqual((first['processed'], saved), (1000, 1000))
+        self.assertEqual([step['processed'] for step in rest], [2000, 2500])
+
+    def test_csv_upload(self):
+        before = Ticket.objects.count()
+        content = (
+            'title,description,status,priority,category,assigned_to_team,assigned_to\n'
+            f'Printer jam,Paper stuck,In Progress,high,hardware,Support,{self.member.email}\n'
+            'No title row,,,,,,\n'
+            ',missing title,,,,,\n'
+            'Bad team,x,,,,Nowhere,\n'
+        )
+        steps = self.progress(self.upload(self.admin, 'tickets.csv', content))
+        self.assertEqual(steps[-1]['created'], 2)
+        self.assertEqual(steps[-1]['failed'], 2)
+        self.assertEqual([error['line'] for error in steps[-1]['errors']], [4, 5])
+
+        ticket = Ticket.objects.get(title='Printer jam')
+        self.assertEqual(ticket.status, Ticket.Status.IN_PROGRESS)
+        self.assertEqual(ticket.priority, Ticket.Priority.HIGH)
+        self.assertEqual((ticket.category_id, ticket.assigned_to_team_id, ticket.assigned_to_id),
+                         (self.category.pk, self.team.pk, self.member.pk))
+        self.assertEqual(ticket.created_by, self.admin)
+        self.assertEqual(Ticket.objects.count(), before + 2)
+        self.assertEqual(TicketStat.objects.get(dimension='status', key=Ticket.Status.IN_PROGRESS).count, 1)
+
+    def test_ndjson_batches(self):
+        lines = [json.dumps({'title': f'Imported {n}', 'created_by': self.lead.email}) for n in range(5)]
+        lines.insert(2, '{not json')
+        steps = self.progress(self.upload(self.admin, 'tickets.txt', '\n'.join(lines), format='ndjson'))
+        self.assertEqual(len(steps), 1)
+        self.assertEqual((steps[0]['created'], steps[0]['failed']), (5, 1))
+        self.assertEqual(Ticket.objects.filter(title__startswith='Imported', created_by=self.lead).count(), 5)
+
+    def test_not_utf8(self):
+        steps = self.progress(self.upload(self.admin, 'tickets.csv', 'title\nCaf\xe9\n'.encode('latin-1')))
+        self.assertEqual((steps[-1]['created'], steps[-1]['failed']), (0, 1))
+        self.assertIn('not valid UTF-8', steps[-1]['errors'][0]['error'])
+
+        # rows decoded before the bad bytes still import
+        rows = ''.join(f'Imported row {n}\n' for n in range(1000))
+        steps = self.progress(self.upload(self.admin, 'tickets.csv', ('title\n' + rows).encode() + b'\xff\n'))
+        self.assertEqual(steps[-1]['failed'], 1)
+        self.assertEqual(Ticket.objects.filter(title__startswith='Imported row').count(), steps[-1]['created'])
+        self.assertGreater(steps[-1]['created'], 0)
+
+    def test_admin_only(self):
+        response = self.upload(self.lead, 'tickets.csv', 'title\nx\n')
+        self.assertEqual(response.status_code, 403)
+        response = self.upload(self.admin, 'tickets.xlsx', 'title\nx\n')
+        self.assertEqual(response.status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('title,priority\n' + ''.join(f'Row {n},urgent\n' for n in range(7)))
+        try:
+            out = StringIO()
+            call_command('import_tickets', handle.name, created_by=self.admin.email, batch_size=3, stdout=out)
+        finally:
+            os.unlink(handle.name)
+        self.assertIn('Done, 7 tickets imported, 0 rows failed', out.getvalue())
+        self.assertEqual(out.getvalue().count(' rows, '), 3)
+        self.assertEqual(Ticket.objects.filter(title__startswith='Row ', priority=Ticket.Priority.URGENT).count(), 7)
+
+
+class TicketExportTests(QueryBudgetTestCase):
+    def get(self, fmt, **params):
+        # through the ASGI handler, the way the export is served
+        headers = {'Authorization': f'Token {self.tokens[self.member.pk]}', 'Accept': f'text/{fmt}'}
+        response = async_to_sync(self.async_client.get)(f'/api/v1/ticket/tickets/export.{fmt}', params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        return response
+
+    def export(self, fmt, **params):
+        self.warm_caches(self.member)
+        with CaptureQueriesContext(connection) as ctx:
+            body = async_to_sync(read_stream)(self.get(fmt, **params)).decode()
+        # one cursor over the joined rows
+        self.assertEqual(len(ctx), 1)
+        return body
+
+    def test_header_goes_out_before_the_rows_are_read(self):
+        self.warm_caches(self.member)
+        response = self.get('csv')
+        with CaptureQueriesContext(connection) as ctx:
+            async def read():
+                # one loop for the whole stream, closing a loop closes its generators
+                stream = aiter(response.streaming_content)
+                header = await anext(stream)
+                queries = len(ctx)
+                return header, queries, await anext(stream)
+            header, queries, rows = async_to_sync(read)()
+        self.assertTrue(header.startswith(b'id,title,'))
+        self.assertEqual(queries, 0)
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(len(rows.splitlines()), Ticket.objects.count())
+
+    def test_csv_round_trips_through_import(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(len(rows), Ticket.objects.count())
+        row = next(r for r in rows if int(r['id']) == self.ticket.pk)
+        self.assertEqual(row['status'], self.ticket.get_status_display())
+        self.assertEqual(row['category'], 'Hardware')
+        self.assertEqual(row['created_by'], self.member.email)
+        self.assertEqual(row['assigned_to'], self.ticket.assigned_to.email if self.ticket.assigned_to else '')
+
+        importer = TicketImporter(self.admin)
+        self.assertIsInstance(importer.build(row), Ticket)
+
+    def test_ndjson_honours_filters_and_ordering(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(priority=Ticket.Priority.URGENT)
+        body = self.export('ndjson', priority=Ticket.Priority.URGENT, ordering='priority')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.ticket.pk])
+        self.assertEqual(rows[0]['priority'], 'Urgent')
+
+    def test_unknown_format(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/export.xlsx')
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentPaginationTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Comment.objects.bulk_create(
+            Comment(ticket=cls.ticket, author=cls.lead, content=f'Update {n}') for n in range(25)
+        )
+        Ticket.objects.filter(pk=cls.ticket.pk).refresh_comment_stats()
+
+    def test_detail_embeds_latest_with_cursor(self):
+        client = self.client_for(self.member)
+        detail = client.get(f'/api/v1/ticket/tickets/{self.ticket.pk}/').data
+        self.assertEqual(len(detail['comments']), LATEST_COMMENTS)
+        self.assertIsNotNone(detail['comments_next'])
+
+        seen = [comment['id'] for comment in detail['comments']]
+        page = client.get(detail['comments_next']).data
+        seen += [comment['id'] for comment in page['results']]
+        self.assertIsNone(page['next'])
+        expected = Comment.objects.filter(ticket=self.ticket).order_by('-created_at', 'id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_writes_return_the_detail_shape(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        detail = self.client_for(self.member).get(url).data
+        updated = self.client_for(self.member).patch(url, {'priority': 1}, format='json').data
+        assigned = self.client_for(self.admin).patch(
+            f'{url}assign/', {'assigned_to': self.member.pk, 'assigned_to_team': self.team.pk}, format='json').data
+        for data in (updated, assigned):
+            self.assertEqual(set(data), set(detail))
+            self.assertEqual(data['comments_next'], detail['comments_next'])
+
+    def test_list_expand_is_capped(self):
+        response = self.client_for(self.member).get('/api/v1/ticket/tickets/?expand=comments')
+        row = next(row for row in response.data['results'] if row['id'] == self.ticket.pk)
+        self.assertEqual(len(row['comments']), LATEST_COMMENTS)
+        self.assertEqual(row['comment_count'], 27)
+
+    def test_comment_pages(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/?page_size=10'
+        client = self.client_for(self.member)
+        pages = 0
+        while url:
+            data = client.get(url).data
+            pages += 1
+            url = data['next']
+        self.assertEqual(pages, 3)
+
+
+class TicketArchiveTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        old = timezone.now() - timedelta(days=400)
+        Ticket.objects.filter(pk=self.ticket.pk).update(
+            status=Ticket.Status.CLOSED, updated_at=old, last_activity_at=old
+        )
+        call_command('reconcile_ticket_stats', stdout=StringIO())
+        self.created_at = Ticket.objects.get(pk=self.ticket.pk).created_at
+        call_command('archive_tickets', batch_size=1, stdout=StringIO())
+
+    def stat_counts(self):
+        return {(s.dimension, s.key): s.count for s in TicketStat.objects.exclude(count=0)}
+
+    def test_moves_closed_tickets_only(self):
+        self.assertFalse(Ticket.objects.filter(pk=self.ticket.pk).exists())
+        self.assertEqual(Ticket.objects.count(), 4)
+        archived = ArchivedTicket.objects.get(pk=self.ticket.pk)
+        self.assertEqual(archived.created_at, self.created_at)
+        self.assertEqual(ArchivedComment.objects.filter(ticket=archived).count(), 2)
+        self.assertTrue(Tombstone.objects.filter(kind=Tombstone.Kind.ARCHIVED, object_id=self.ticket.pk).exists())
+        # archived tickets still count in the rollup
+        self.assertEqual(actual_counts(), self.stat_counts())
+
+    def test_archived_ticket_is_readable(self):
+        client = self.client_for(self.member)
+        detail = client.get(f'/api/v1/ticket/tickets/{self.ticket.pk}/')
+        self.assertEqual(detail.status_code, 200)
+        self.assertIsNotNone(detail.data['archived_at'])
+        self.assertEqual(len(detail.data['comments']), 2)
+
+        comments = client.get(f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/')
+        self.assertEqual(len(comments.data['results']), 2)
+
+        live = client.get('/api/v1/ticket/tickets/search/?q=Printer').data['results']
+        self.assertNotIn(self.ticket.pk, [row['id'] for row in live])
+        archive = client.get('/api/v1/ticket/tickets/search/?q=Printer&archived=1').data['results']
+        self.assertEqual([row['id'] for row in archive], [self.ticket.pk])
+
+    def test_reopening_restores(self):
+        token = ChangeCounter.current()[0]
+        response = self.client_for(self.member).patch(
+            f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'status': Ticket.Status.OPEN}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(ArchivedTicket.objects.filter(pk=self.ticket.pk).exists())
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual(ticket.status, Ticket.Status.OPEN)
+        self.assertEqual(ticket.created_at, self.created_at)
+        self.assertEqual(ticket.comments.count(), 2)
+        self.assertEqual(actual_counts(), self.stat_counts())
+
+        data = self.client_for(self.member).get(f'/api/v1/ticket/tickets/changes/?since={token}').data
+        self.assertEqual([row['id'] for row in data['tickets']], [self.ticket.pk])
+
+    def test_restore_inserts_comments_before_ticket(self):
+        # on PostgreSQL the ticket's search_vector is then built once, not once per comment
+        with CaptureQueriesContext(connection) as ctx:
+            restore_ticket(self.ticket.pk)
+        inserts = [q['sql'].split('"')[1] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(inserts[:2], ['Ticket_app_comment', 'Ticket_app_ticket'])
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).comments.count(), 2)
+
+    def test_restore_permission(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/restore/'
+        other = User.objects.create_user('other@example.com', 'pass1234a')
+        self.tokens[other.pk] = Token.objects.create(user=other).key
+        # can't see it at all
+        self.assertEqual(self.client_for(other).post(url).status_code, 404)
+        # can see it through the team, but not edit it
+        TeamMembership.objects.create(user=other, team=self.team)
+        self.assertEqual(self.client_for(other).post(url).status_code, 403)
+        self.assertEqual(self.client_for(self.admin).post(url).status_code, 200)
+        self.assertEqual(self.client_for(self.admin).post(url).status_code, 404)
+
+
+class TeamPermissionTests(QueryBudgetTestCase):
+    def grant(self, flag):
+        setattr(self.other_team, flag, True)
+        self.other_team.save()
+
+    def test_cached_roles_cost_no_queries(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/'
+        client = self.client_for(self.lead)
+        with CaptureQueriesContext(connection) as cold:
+            client.patch(url, {'priority': 1}, format='json')
+        with CaptureQueriesContext(connection) as warm:
+            client.patch(url, {'priority': 2}, format='json')
+        # the token and the roles both come from the cache
+        self.assertEqual(len(warm), len(cold) - 2)
+
+    def test_flags_change_invalidates(self):
+        self.assertEqual(AuthContext(self.member).perms, Perm(0))
+        self.grant('can_delete_tickets')
+        self.assertEqual(AuthContext(self.member).perms, Perm.DELETE_TICKETS)
+        TeamMembership.objects.filter(user=self.member, team=self.other_team).delete()
+        self.assertEqual(AuthContext(self.member).perms, Perm(0))
+
+    def test_close_flag(self):
+        # on a team the member is in, so they can read it but not edit it
+        ticket = Ticket.objects.create(
+            title='Not mine', description='x', created_by=self.admin, assigned_to_team=self.other_team
+        )
+        url = f'/api/v1/ticket/tickets/{ticket.pk}/'
+        client = self.client_for(self.member)
+        self.assertEqual(client.patch(url, {'status': Ticket.Status.CLOSED}, format='json').status_code, 403)
+        self.grant('can_close_tickets')
+        self.assertEqual(client.patch(url, {'priority': 1}, format='json').status_code, 403)
+        self.assertEqual(client.patch(url, {'status': Ticket.Status.CLOSED}, format='json').status_code, 200)
+
+    def test_assign_flag(self):
+        url = f'/api/v1/ticket/tickets/{self.ticket.pk}/assign/'
+        data = {'assigned_to': self.admin.pk, 'assigned_to_team': self.other_team.pk}
+        client = self.client_for(self.member)
+        self.assertEqual(client.patch(url, data, format='json').status_code, 403)
+        self.grant('can_assign_tickets')
+        self.assertEqual(client.patch(url, data, format='json').status_code, 200)
+
+    def test_delete_flag(self):
+        ticket = Ticket.objects.create(
+            title='Not mine', description='x', created_by=self.admin, assigned_to_team=self.other_team
+        )
+        url = f'/api/v1/ticket/tickets/{ticket.pk}/'
+        client = self.client_for(self.member)
+        self.assertEqual(client.delete(url).status_code, 403)
+        self.grant('can_delete_tickets')
+        self.assertEqual(client.delete(url).status_code, 204)
+
+
+class TicketVisibilityTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outsider = User.objects.create_user('outsider@example.com', 'pass1234a')
+        cls.tokens[cls.outsider.pk] = Token.objects.create(user=cls.outsider).key
+        cls.own = Ticket.objects.create(title='Mine', description='x', created_by=cls.outsider)
+        cls.network = Ticket.objects.create(
+            title='Switch down', description='x', created_by=cls.admin, assigned_to_team=cls.other_team
+        )
+
+    def ids(self, user, url):
+        return {row['id'] for row in self.client_for(user).get(url).data['results']}
+
+    def test_list_is_scoped(self):
+        url = '/api/v1/ticket/tickets/'
+        self.assertEqual(self.ids(self.outsider, url), {self.own.pk})
+        # the lead's team and own assignments, not the Network ticket
+        self.assertNotIn(self.network.pk, self.ids(self.lead, url))
+        # member of both teams
+        self.assertIn(self.network.pk, self.ids(self.member, url))
+        self.assertEqual(len(self.ids(self.admin, url)), Ticket.objects.count())
+
+    def test_view_all_flag(self):
+        self.team.can_view_all_tickets = True
+        self.team.save()
+        self.assertEqual(len(self.ids(self.lead, '/api/v1/ticket/tickets/')), Ticket.objects.count())
+
+    def test_hidden_ticket_reads_404(self):
+        client = self.client_for(self.outsider)
+        for url in (f'/api/v1/ticket/tickets/{self.ticket.pk}/', f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/'):
+            self.assertEqual(client.get(url).status_code, 404)
+        response = client.post(f'/api/v1/ticket/tickets/{self.ticket.pk}/comments/', {'content': 'Hi'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.ids(self.outsider, '/api/v1/ticket/tickets/search/?q=Printer'), set())
+        changes = client.get('/api/v1/ticket/tickets/changes/?since=0').data
+        self.assertEqual([row['id'] for row in changes['tickets']], [self.own.pk])
+
+    def test_scope_is_one_query(self):
+        self.assertQueryBudget(1, self.outsider, 'get', '/api/v1/ticket/tickets/', status_code=200)
+
+    def test_event_visibility(self):
+        event = {'type': 'ticket.updated', 'teams': [self.other_team.pk], 'assignees': [], 'creator': self.admin.pk}
+        self.assertTrue(event_visible(event, self.member.pk, {self.team.pk, self.other_team.pk}))
+        self.assertFalse(event_visible(event, self.lead.pk, {self.team.pk}))
+        self.assertTrue(event_visible(dict(event, creator=self.lead.pk), self.lead.pk, {self.team.pk}))
+
+
+class AutoAssignTests(QueryBudgetTestCase):
+    def loads(self):
+        return {row.user_id: (row.open_count, row.load) for row in MemberWorkload.objects.exclude(open_count=0, load=0)}
+
+    def test_picks_least_loaded_and_keeps_table_current(self):
+        # the lead holds the five fixture tickets
+        self.assertEqual(self.loads(), {self.lead.pk: (5, 10)})
+        client = self.client_for(self.member)
+        data = {'title': 'VPN', 'description': 'Down', 'priority': 1, 'assigned_to_team': self.team.pk}
+        response = client.post('/api/v1/ticket/tickets/?auto=1', data, format='json')
+        self.assertEqual(response.data['assigned_to'], self.member.pk)
+        # urgent weighs 8, a low ticket tips the member (9) under the lead (10) once more
+        response = client.post('/api/v1/ticket/tickets/?auto=1', dict(data, priority=4), format='json')
+        self.assertEqual(response.data['assigned_to'], self.member.pk)
+        self.assertEqual(self.loads(), {self.lead.pk: (5, 10), self.member.pk: (2, 9)})
+
+        response = self.client_for(self.lead).patch(
+            f'/api/v1/ticket/tickets/{self.ticket.pk}/assign/?auto=1', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned_to'], self.member.pk)
+        client.patch(f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'status': 4}, format='json')
+        self.client_for(self.admin).delete(f'/api/v1/ticket/tickets/{response.data["id"]}/')
+        self.assertEqual(self.loads(), actual_loads())
+
+    def test_needs_team(self):
+        # no team, visible to the lead as its assignee
+        ticket = Ticket.objects.create(title='Loose', description='x', created_by=self.member, assigned_to=self.lead)
+        url = f'/api/v1/ticket/tickets/{ticket.pk}/assign/?auto=1'
+        self.assertEqual(self.client_for(self.admin).patch(url, {}, format='json').status_code, 400)
+        # lead of Support can't auto-assign into Network
+        response = self.client_for(self.lead).patch(url, {'assigned_to_team': self.other_team.pk}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_reconcile_fixes_workload(self):
+        MemberWorkload.objects.filter(user=self.lead).update(load=1)
+        out = StringIO()
+        call_command('reconcile_ticket_stats', stdout=out)
+        self.assertIn('1 drifted workloads', out.getvalue())
+        self.assertEqual(self.loads(), actual_loads())
+
+    def test_missing_row_stays_at_zero(self):
+        # a ticket whose increment the table missed can't take its assignee below an idle member
+        MemberWorkload.objects.filter(user=self.lead).delete()
+        response = self.client_for(self.lead).patch(
+            f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'status': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.loads(), {})
+        self.assertEqual(MemberWorkload.objects.get(user=self.lead).load, 0)
+
+
+class WorkloadMigrationTests(TransactionTestCase):
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(list(targets) or executor.loader.graph.leaf_nodes())
+        executor.loader.build_graph()
+        return executor.loader.project_state(list(executor.loader.applied_migrations)).apps
+
+    def test_backfills_tickets_from_before_the_table(self):
+        apps = self.migrate(('Ticket_app', '0013_ticket_archive'))
+        User, Ticket = apps.get_model('User_app', 'User'), apps.get_model('Ticket_app', 'Ticket')
+        busy = User.objects.create(email='busy@example.com', password='')
+        idle = User.objects.create(email='idle@example.com', password='')
+        for priority in (1, 3, 3, 4):
+            Ticket.objects.create(title='Old', description='x', created_by=idle, assigned_to=busy, priority=priority)
+        Ticket.objects.create(title='Done', description='x', created_by=idle, assigned_to=busy, status=4)
+
+        self.migrate()
+        self.assertEqual(
+            {row.user_id: (row.open_count, row.load) for row in MemberWorkload.objects.all()},
+            {busy.pk: (4, 13)},
+        )
+        self.assertEqual(actual_loads(), {busy.pk: (4, 13)})
+
+
+class WorkloadReportTests(QueryBudgetTestCase):
+    url = '/api/v1/ticket/workload/'
+
+    def test_report(self):
+        # one grouped query, then served from the cache
+        response = self.assertQueryBudget(1, self.lead, 'get', self.url, status_code=200)
+        self.assertQueryBudget(0, self.lead, 'get', self.url, status_code=200)
+        # the lead only sees Support
+        [team] = response.data['teams']
+        self.assertEqual((team['id'], team['open'], team['in_progress'], team['urgent']), (self.team.pk, 5, 0, 0))
+        self.assertGreaterEqual(team['oldest_open_age'], 0)
+        members = {member['user']: member for member in team['members']}
+        self.assertEqual(members[self.lead.pk]['open'], 5)
+        self.assertEqual(members[self.lead.pk]['name'], 'Lea Lead')
+        self.assertEqual(members[self.member.pk]['open'], 0)
+        self.assertIsNone(members[self.member.pk]['oldest_open_age'])
+        self.assertEqual(team['unassigned']['open'], 0)
+
+    def test_ticket_write_refreshes(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(len(client.get(self.url).data['teams']), 2)
+        client.post('/api/v1/ticket/tickets/', {
+            'title': 'Fan', 'description': 'Loud', 'priority': 1, 'assigned_to_team': self.team.pk,
+        }, format='json')
+        client.patch(f'/api/v1/ticket/tickets/{self.ticket.pk}/', {'status': 2}, format='json')
+        [team] = client.get(self.url, {'team': self.team.pk}).data['teams']
+        self.assertEqual((team['open'], team['in_progress'], team['urgent']), (5, 1, 1))
+        self.assertEqual((team['unassigned']['open'], team['unassigned']['urgent']), (1, 1))
+
+    def test_membership_change_refreshes(self):
+        client = self.client_for(self.admin)
+
+        def members():
+            [team] = client.get(self.url, {'team': self.team.pk}).data['teams']
+            return {member['user'] for member in team['members']}
+
+        self.assertEqual(members(), {self.lead.pk, self.member.pk})
+        client.post(f'/api/v1/team/{self.team.pk}/members/', {'user_id': self.admin.pk}, format='json')
+        self.assertEqual(members(), {self.lead.pk, self.member.pk, self.admin.pk})
+        client.post(f'/api/v1/team/{self.team.pk}/members/bulk/', {'remove': [self.member.pk]}, format='json')
+        self.assertEqual(members(), {self.lead.pk, self.admin.pk})
+
+    def test_members_forbidden(self):
+        self.assertEqual(self.client_for(self.member).get(self.url).status_code, 403)
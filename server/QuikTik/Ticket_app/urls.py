@@ -3,8 +3,17 @@ from .views import (
     CategoryListView,
     CategoryDetailView,
     TicketListView,
+    TicketSearchView,
+    TicketChangesView,
+    TicketEventStreamView,
+    TicketBulkView,
+    TicketImportView,
+    TicketExportView,
     TicketDetailView,
+    TicketRestoreView,
     TicketAssignView,
+    TicketStatsView,
+    TicketWorkloadView,
     CommentListView,
     CommentDetailView
 )
@@ -16,8 +25,17 @@ urlpatterns = [
     
     # Tickets
     path('tickets/', TicketListView.as_view(), name='ticket-list'),
+    path('tickets/search/', TicketSearchView.as_view(), name='ticket-search'),
+    path('tickets/changes/', TicketChangesView.as_view(), name='ticket-changes'),
+    path('tickets/events/', TicketEventStreamView.as_view(), name='ticket-events'),
+    path('tickets/bulk/', TicketBulkView.as_view(), name='ticket-bulk'),
+    path('tickets/import/', TicketImportView.as_view(), name='ticket-import'),
+    path('tickets/export.<str:fmt>', TicketExportView.as_view(), name='ticket-export'),
     path('tickets/<int:pk>/', TicketDetailView.as_view(), name='ticket-detail'),
+    path('tickets/<int:pk>/restore/', TicketRestoreView.as_view(), name='ticket-restore'),
     path('tickets/<int:pk>/assign/', TicketAssignView.as_view(), name='ticket-assign'),
+    path('stats/', TicketStatsView.as_view(), name='ticket-stats'),
+    path('workload/', TicketWorkloadView.as_view(), name='ticket-workload'),
     
     # Comments
     path('tickets/<int:ticket_pk>/comments/', CommentListView.as_view(), name='comment-list'),
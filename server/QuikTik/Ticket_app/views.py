@@ -1,15 +1,132 @@
+import json
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from QuikTik.authentication import aresolve_token
+from QuikTik.authz import Perm, get_auth, load_roles
+from QuikTik.broker import get_broker
+from QuikTik.conditional import conditional_get
+from QuikTik.pagination import KeysetPagination
 from User_app.models import User
-from .models import Category, Ticket, Comment
-from .serializers import CategorySerializer, TicketSerializer, CommentSerializer
+from Team_app.models import Team
+from .models import ArchivedComment, ArchivedTicket, Category, ChangeCounter, Ticket, Comment, TicketStat, Tombstone
+from .archive import restore_ticket
+from .access import assigns_anywhere, can_assign, can_delete, can_edit, visible_tickets, visible_tombstones
+from .bulk import MAX_ITEMS, bulk_update_tickets
+from .events import CHANNEL, EventType, event_matches, event_visible, publish_ticket_event
+from .export import FORMATS as EXPORT_FORMATS, stream_export
+from .filters import event_filters, filter_tickets, get_ordering, team_filter
+from .importer import FORMATS as IMPORT_FORMATS, TicketImporter, guess_format, iter_records
+from .search import search_tickets
+from .stats import record_ticket_changes, ticket_buckets, ticket_counts
+from .workload import least_loaded_member, workload_report
+from .serializers import (
+    ArchivedCommentSerializer,
+    ArchivedTicketSerializer,
+    ArchivedTicketSearchSerializer,
+    CategorySerializer,
+    TicketSerializer,
+    TicketListSerializer,
+    TicketSearchSerializer,
+    CommentSerializer
+)
+
+
+# comments embedded in a ticket (detail, or list with ?expand=comments),
+# the full history pages through the comment list
+LATEST_COMMENTS = 20
+
+
+def sparse_params(request):
+    # ?fields=id,title,status&expand=comments -> (['id', 'title', 'status'], ['comments'])
+    fields = [f for f in request.query_params.get('fields', '').split(',') if f]
+    expand = [e for e in request.query_params.get('expand', '').split(',') if e]
+    return fields or None, expand
+
+
+def wants_auto(request):
+    # ?auto=1 on create and assign picks the assignee by workload
+    return request.query_params.get('auto') in ('1', 'true')
+
+
+def ticket_rows(request, serializer_class, ordering, model=Ticket):
+    """
+    Filtered ticket queryset for a list-style endpoint
+
+    Selects only the columns serializer_class needs for ?fields=/?expand=,
+    plus the model columns the keyset ordering reads. model=ArchivedTicket
+    reads the archive instead. Only tickets the user may see come back.
+    """
+    fields, expand = sparse_params(request)
+    columns = serializer_class.get_columns(fields)
+    model_fields = {field.name for field in model._meta.concrete_fields}
+    columns.update(name for name in (field.lstrip('-') for field in ordering) if name in model_fields)
+    tickets = model.objects.with_related(
+        columns=columns,
+        comments=serializer_class.wants('comments', fields, expand),
+        comment_limit=LATEST_COMMENTS,
+    )
+    return filter_tickets(visible_tickets(get_auth(request), tickets), request.query_params)
+
+
+def ticket_detail(request, ticket, serializer_class=TicketSerializer, fields=None, expand=()):
+    """
+    The body of a single ticket, the same for reads and every write
+
+    When comments are embedded only the newest LATEST_COMMENTS are, and
+    comments_next links the comment list page after them (None when that's
+    all of them).
+    """
+    data = serializer_class(ticket, fields=fields, expand=expand).data
+    if serializer_class.wants('comments', fields, expand):
+        latest = list(ticket.comments.all())
+        data['comments_next'] = None
+        if latest and ticket.comment_count > len(latest):
+            paginator = CommentListView.pagination_class()
+            paginator.ordering = CommentListView.ordering
+            data['comments_next'] = paginator.link_after(
+                request.build_absolute_uri(reverse('comment-list', args=[ticket.pk])), latest[-1]
+            )
+    return data
+
+
+def category_list_validator(request):
+    summary = Category.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return (summary['count'], summary['last_modified']), summary['last_modified']
+
+
+def ticket_validator(request, pk):
+    # comments are embedded, so comment writes count through last_activity_at/comment_count,
+    # and renamed categories, teams and users only move change_seq (mark_changed)
+    auth = get_auth(request)
+    row = visible_tickets(auth, Ticket.objects.filter(pk=pk)).values_list(
+        'updated_at', 'last_activity_at', 'comment_count', 'change_seq'
+    ).first()
+    if row is None:
+        # archived rows never change, restoring one makes it a live ticket again
+        archived = visible_tickets(auth, ArchivedTicket.objects.filter(pk=pk))
+        archived_at = archived.values_list('archived_at', flat=True).first()
+        if archived_at is None:
+            return None
+        return (pk, 'archived', archived_at), archived_at
+    updated_at, last_activity_at, comment_count, change_seq = row
+    return (pk, updated_at, last_activity_at, comment_count, change_seq), max(updated_at, last_activity_at)
 
 
 class CategoryListView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(category_list_validator)
     def get(self, request):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
@@ -66,73 +183,442 @@ class CategoryDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def restore_archived(request, pk):
+    """
+    Moves archived ticket pk back into the live table if the request user may edit it
+
+    Same rules as editing a ticket, tickets the user can't read are not
+    found. Returns an error Response, or None once
+    the ticket is live again.
+    """
+    archived = visible_tickets(get_auth(request), ArchivedTicket.objects.filter(pk=pk))
+    created_by = archived.values_list('created_by_id', flat=True).first()
+    if created_by is None:
+        return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not can_edit(get_auth(request), created_by, request.data):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    if restore_ticket(pk) is None:
+        # restored by someone else in the meantime
+        if not Ticket.objects.filter(pk=pk).exists():
+            return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
+    return None
+
+
 class TicketListView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get(self, request):
-        tickets = Ticket.objects.all()
-        serializer = TicketSerializer(tickets, many=True)
-        return Response(serializer.data)
+        fields, expand = sparse_params(request)
+        paginator = self.pagination_class()
+        paginator.ordering = get_ordering(request.query_params)
+        tickets = ticket_rows(request, TicketListSerializer, paginator.ordering)
+        
+        page = paginator.paginate_queryset(tickets, request, view=self)
+        serializer = TicketListSerializer(page, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
+        # ?auto=1 gives a ticket filed to a team without an assignee to the team's least loaded member
         serializer = TicketSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(created_by=request.user)
+            with transaction.atomic():
+                extra = {}
+                team = serializer.validated_data.get('assigned_to_team')
+                if wants_auto(request) and team and not serializer.validated_data.get('assigned_to'):
+                    extra['assigned_to_id'] = least_loaded_member(team.pk)
+                ticket = serializer.save(created_by=request.user, change_seq=ChangeCounter.advance(), **extra)
+                record_ticket_changes(added=[ticket])
+                publish_ticket_event(EventType.TICKET_CREATED, ticket, ticket.change_seq)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TicketSearchView(APIView):
+    """Full text search over live tickets, ?archived=1 searches the archive instead"""
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'Search text required (?q=)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        model, serializer_class = Ticket, TicketSearchSerializer
+        if request.query_params.get('archived') in ('1', 'true'):
+            model, serializer_class = ArchivedTicket, ArchivedTicketSearchSerializer
+        
+        fields, expand = sparse_params(request)
+        paginator = self.pagination_class()
+        paginator.ordering = ('-rank', '-created_at', 'id')
+        tickets = search_tickets(ticket_rows(request, serializer_class, paginator.ordering, model=model), text)
+        
+        page = paginator.paginate_queryset(tickets, request, view=self)
+        serializer = serializer_class(page, many=True, fields=fields, expand=expand)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TicketChangesView(APIView):
+    """
+    Delta sync for a local copy of the ticket list
+
+    Returns the tickets written after ?since=<token> plus tombstones for
+    deleted tickets and comments, for tickets moved to the archive (still
+    readable at tickets/<id>/) and for tickets reassigned away from the
+    user ('hidden', no longer readable), and the token to send next time.
+    Tombstones only cover tickets the user could read at the time. Start
+    from since=0. has_more means call again straight away, a 410 means the
+    token predates the pruned tombstones and the copy has to be rebuilt
+    from since=0. Takes ?fields= and ?expand= like the ticket list.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 500
+    
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            since = -1
+        if since < 0:
+            return Response({'error': 'Invalid change token'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        head, pruned_through = ChangeCounter.current()
+        if since > head or 0 < since < pruned_through:
+            return Response(
+                {'error': 'Change token expired, sync again from since=0'}, status=status.HTTP_410_GONE
+            )
+        
+        # cut pages on a token boundary so one change never straddles two
+        # responses, a single change larger than a page comes back whole
+        changed = visible_tickets(get_auth(request), Ticket.objects.filter(change_seq__lte=head))
+        if since:
+            changed = changed.filter(change_seq__gt=since)
+        seqs = list(changed.order_by('change_seq').values_list('change_seq', flat=True)[:self.page_size + 1])
+        has_more = len(seqs) > self.page_size
+        token = seqs[self.page_size - 1] if has_more else head
+        
+        fields, expand = sparse_params(request)
+        tickets = changed.filter(change_seq__lte=token).with_related(
+            columns=TicketListSerializer.get_columns(fields),
+            comments=TicketListSerializer.wants('comments', fields, expand),
+            comment_limit=LATEST_COMMENTS,
+        ).order_by('change_seq', 'id')
+        
+        serializer = TicketListSerializer(tickets, many=True, fields=fields, expand=expand)
+        deleted = {'tickets': [], 'comments': [], 'archived': [], 'hidden': []}
+        if since:
+            # a fresh copy has nothing to delete
+            auth = get_auth(request)
+            moved = []
+            # only for tickets the user could read then, other teams' deletes stay private
+            tombstones = visible_tombstones(auth, Tombstone.objects.filter(seq__gt=since, seq__lte=token))
+            for kind, object_id, ticket_id in tombstones.order_by('seq').values_list('kind', 'object_id', 'ticket_id'):
+                if kind == Tombstone.Kind.TICKET:
+                    deleted['tickets'].append(object_id)
+                elif kind == Tombstone.Kind.ARCHIVED:
+                    deleted['archived'].append(object_id)
+                elif kind == Tombstone.Kind.MOVED:
+                    moved.append(object_id)
+                else:
+                    deleted['comments'].append({'id': object_id, 'ticket': ticket_id})
+            # archived and restored again within this page, it's live
+            live = {row['id'] for row in serializer.data}
+            deleted['archived'] = [pk for pk in deleted['archived'] if pk not in live]
+            if moved and not auth.has_perm(Perm.VIEW_ALL_TICKETS):
+                # still readable some other way (e.g. their own ticket) stays in the copy
+                readable = set(visible_tickets(auth, Ticket.objects.filter(pk__in=moved)).values_list('id', flat=True))
+                gone = set(deleted['tickets']) | set(deleted['archived'])
+                deleted['hidden'] = list(dict.fromkeys(
+                    pk for pk in moved if pk not in readable and pk not in gone
+                ))
+        
+        return Response({
+            'token': token,
+            'has_more': has_more,
+            'tickets': serializer.data,
+            'deleted': deleted,
+        })
+
+
+async def stream_user(request):
+    # EventSource can't send headers, so the token may also come as ?token=
+    header = request.headers.get('Authorization', '')
+    key = header[len('Token '):] if header.startswith('Token ') else request.GET.get('token')
+    if not key:
+        return None
+    token = await aresolve_token(key)
+    if token is None:
+        return None
+    return token.user if token.user.is_active else None
+
+
+async def stream_in_thread(iterator):
+    """
+    Async iterator over a sync one, for StreamingHttpResponse under ASGI
+
+    Django reads a sync iterator there with sync_to_async(list), the whole
+    body before the first byte goes out. This steps it one item per
+    sync_to_async call instead, on the request's sync thread, so queries
+    keep using the view's connection and a database cursor stays open
+    between steps.
+    """
+    iterator = iter(iterator)
+    step = sync_to_async(next)
+    done = object()
+    try:
+        while (item := await step(iterator, done)) is not done:
+            yield item
+    finally:
+        # a client that hangs up closes the generator, and with it the cursor
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
+
+
+class TicketEventStreamView(View):
+    """
+    Server-sent events for ticket and comment writes
+
+    ?assigned_to_team=1,2 and/or ?assigned_to=5 (or 'me') narrow the stream,
+    an event passes when either matches. Events only carry ids and the
+    change token (also the SSE id), a client brings its copy up to date
+    with tickets/changes/?since= when it connects, after a reconnect and
+    on a 'resync' event. Meant for ASGI, each stream holds a connection.
+    """
+    heartbeat = 15
+    retry_ms = 5000
+    
+    async def get(self, request):
+        user = await stream_user(request)
+        if user is None:
+            return JsonResponse({'error': 'Invalid or missing token'}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            teams, assignees = event_filters(request.GET, user)
+        except ValidationError as error:
+            return JsonResponse(error.detail, status=status.HTTP_400_BAD_REQUEST)
+        
+        # same visibility as the changes feed, fixed for the life of the stream
+        visibility = None
+        if not user.is_admin:
+            team_roles, perms = await sync_to_async(load_roles)(user.pk)
+            if not Perm.VIEW_ALL_TICKETS & perms:
+                visibility = (user.pk, set(team_roles))
+        
+        events = self.events(teams, assignees, visibility)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    async def events(self, teams, assignees, visibility=None):
+        subscription = get_broker().subscribe(CHANNEL)
+        try:
+            yield f'retry: {self.retry_ms}\n\n'
+            while True:
+                event = await subscription.get(timeout=self.heartbeat)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif event_matches(event, teams, assignees) and (
+                    visibility is None or event_visible(event, *visibility)
+                ):
+                    event_id = f"id: {event['change']}\n" if 'change' in event else ''
+                    yield f"{event_id}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+
+class TicketBulkView(APIView):
+    """
+    Updates status, priority, category and assignment on many tickets at once
+
+    POST {"tickets": [{"id": 1, "status": 4}, {"id": 2, "assigned_to": 5}]}
+    Returns a result per item, items that fail don't stop the others.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @transaction.atomic
+    def post(self, request):
+        items = request.data.get('tickets') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty "tickets" list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_ITEMS:
+            return Response(
+                {'error': f'At most {MAX_ITEMS} tickets per request'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = bulk_update_tickets(get_auth(request), items)
+        return Response({
+            'updated': sum(result['status'] == 'updated' for result in results),
+            'failed': sum(result['status'] == 'error' for result in results),
+            'results': results,
+        })
+
+
+class TicketExportView(APIView):
+    """
+    Streams every ticket matching the list filters as tickets/export.csv or
+    tickets/export.ndjson, in the list's ?ordering=
+
+    Rows are written as they come off the database cursor, nothing is
+    serialized up front. Streams under ASGI, WSGI servers buffer the body.
+    """
+    permission_classes = [IsAuthenticated]
+    content_types = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+    
+    def perform_content_negotiation(self, request, force=False):
+        # the body is CSV/NDJSON whatever Accept says, only errors go through a renderer
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            return Response({'error': 'Export as .csv or .ndjson'}, status=status.HTTP_404_NOT_FOUND)
+        
+        tickets = filter_tickets(visible_tickets(get_auth(request), Ticket.objects.all()), request.query_params)
+        tickets = tickets.order_by(*get_ordering(request.query_params))
+        response = StreamingHttpResponse(
+            stream_in_thread(stream_export(tickets, fmt)), content_type=self.content_types[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="tickets.{fmt}"'
+        return response
+
+
+class TicketImportView(APIView):
+    """
+    Admin upload of a CSV or NDJSON ticket file (multipart field 'file')
+
+    The file is parsed as it is read and inserted in batches, the response
+    streams one NDJSON progress line per batch so large imports neither
+    buffer nor time out (under ASGI, like the export). Send a 'format'
+    field (csv or ndjson) when the file name doesn't say.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if not request.user.is_admin:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        # not ?format=, DRF reserves that for renderer selection
+        fmt = request.data.get('format') or guess_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            return Response(
+                {'error': 'Unknown file type, send format=csv or format=ndjson'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        importer = TicketImporter(request.user)
+        progress = (json.dumps(step) + '\n' for step in importer.run(iter_records(upload, fmt)))
+        return StreamingHttpResponse(stream_in_thread(progress), content_type='application/x-ndjson')
+
+
 class TicketDetailView(APIView):
+    """
+    A single ticket
+
+    Archived tickets are served read-only from the archive (with archived_at),
+    editing one restores it first.
+    """
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(ticket_validator)
     def get(self, request, pk):
-        try:
-            ticket = Ticket.objects.get(pk=pk)
-        except Ticket.DoesNotExist:
+        fields, expand = sparse_params(request)
+        comments = TicketSerializer.wants('comments', fields, expand)
+        for model, serializer_class in ((Ticket, TicketSerializer), (ArchivedTicket, ArchivedTicketSerializer)):
+            columns = serializer_class.get_columns(fields) if fields else None
+            if columns and comments:
+                columns.add('comment_count')
+            tickets = model.objects.with_related(columns=columns, comments=comments, comment_limit=LATEST_COMMENTS)
+            ticket = visible_tickets(get_auth(request), tickets).filter(pk=pk).first()
+            if ticket is not None:
+                break
+        else:
             return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = TicketSerializer(ticket)
-        return Response(serializer.data)
+        return Response(ticket_detail(request, ticket, serializer_class, fields, expand))
     
+    @transaction.atomic
     def patch(self, request, pk):
+        # row lock so the stats delta is taken against the committed state
+        # tickets the user can't read are not found, for writes as for GET
+        tickets = visible_tickets(get_auth(request), Ticket.objects.with_related(comment_limit=LATEST_COMMENTS))
         try:
-            ticket = Ticket.objects.get(pk=pk)
+            ticket = tickets.select_for_update(of=('self',)).get(pk=pk)
         except Ticket.DoesNotExist:
-            return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
+            # e.g. reopening an archived ticket
+            error = restore_archived(request, pk)
+            if error:
+                return error
+            ticket = tickets.select_for_update(of=('self',)).get(pk=pk)
         
-        if not (request.user.is_admin or request.user.is_team_lead or ticket.created_by == request.user):
+        if not can_edit(get_auth(request), ticket.created_by_id, request.data):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        before = ticket_buckets(ticket)
+        owners = (ticket.assigned_to_team_id, ticket.assigned_to_id)
         serializer = TicketSerializer(ticket, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            serializer.save(change_seq=ChangeCounter.advance())
+            if owners != (ticket.assigned_to_team_id, ticket.assigned_to_id):
+                Tombstone.record_moves(ticket.change_seq, [(ticket, owners)])
+            record_ticket_changes(added=[ticket], removed=[before])
+            publish_ticket_event(EventType.TICKET_UPDATED, ticket, ticket.change_seq, before=owners)
+            return Response(ticket_detail(request, ticket))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @transaction.atomic
     def delete(self, request, pk):
+        auth = get_auth(request)
         try:
-            ticket = Ticket.objects.get(pk=pk)
+            ticket = visible_tickets(auth, Ticket.objects.select_for_update()).get(pk=pk)
         except Ticket.DoesNotExist:
             return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if not (request.user.is_admin or request.user.is_team_lead or ticket.created_by == request.user):
+        if not can_delete(auth, ticket.created_by_id):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        seq = ChangeCounter.advance()
+        Tombstone.for_ticket(seq, Tombstone.Kind.TICKET, ticket).save()
+        publish_ticket_event(EventType.TICKET_DELETED, ticket, seq)
         ticket.delete()
+        record_ticket_changes(removed=[ticket])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class TicketRestoreView(APIView):
+    """Moves an archived ticket back into the live ticket list"""
+    permission_classes = [IsAuthenticated]
+    
+    @transaction.atomic
+    def post(self, request, pk):
+        error = restore_archived(request, pk)
+        if error:
+            return error
+        ticket = Ticket.objects.with_related(comment_limit=LATEST_COMMENTS).get(pk=pk)
+        return Response(ticket_detail(request, ticket))
+
+
 class TicketAssignView(APIView):
+    """
+    Sets a ticket's assignee and team
+
+    ?auto=1 picks the assignee: the least loaded active member of
+    assigned_to_team (the ticket's current team when not given), see
+    Ticket_app.workload.
+    """
     permission_classes = [IsAuthenticated]
     
+    @transaction.atomic
     def patch(self, request, pk):
+        auth = get_auth(request)
         try:
-            ticket = Ticket.objects.get(pk=pk)
+            ticket = visible_tickets(auth, Ticket.objects.select_for_update()).get(pk=pk)
         except Ticket.DoesNotExist:
             return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Only admin and team leads can assign tickets
-        if not (request.user.is_admin or request.user.is_team_lead):
+        # Only admin, team leads and can_assign_tickets teams can assign tickets
+        if not can_assign(auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         assigned_to_id = request.data.get('assigned_to')
@@ -149,17 +635,25 @@ class TicketAssignView(APIView):
         else:
             assigned_to_team_id = int(assigned_to_team_id)
         
-        # Admins can assign to anyone, team leads have restrictions
-        if request.user.is_admin:
+        auto = wants_auto(request)
+        if auto:
+            assigned_to_id = None
+            if 'assigned_to_team' not in request.data:
+                assigned_to_team_id = ticket.assigned_to_team_id
+            if assigned_to_team_id is None:
+                return Response({'error': 'Auto assignment needs a team'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Admins and can_assign_tickets teams can assign to anyone, team leads have restrictions
+        if assigns_anywhere(auth):
             pass
-        elif request.user.is_team_lead:
-            led_teams = request.user.get_led_teams()
+        elif auth.is_team_lead:
+            led_teams = auth.led_team_ids
             
             # If assigning to a user, check they're in one of the lead's teams
             if assigned_to_id:
                 try:
                     assigned_user = User.objects.get(pk=assigned_to_id)
-                    if not assigned_user.teams.filter(id__in=led_teams).exists():
+                    if not assigned_user.team_memberships.filter(team_id__in=led_teams).exists():
                         return Response(
                             {'error': 'Can only assign to members of your teams'}, 
                             status=status.HTTP_403_FORBIDDEN
@@ -169,43 +663,158 @@ class TicketAssignView(APIView):
             
             # If assigning to a team, check it's one of their teams
             if assigned_to_team_id:
-                if not led_teams.filter(id=assigned_to_team_id).exists():
+                if assigned_to_team_id not in led_teams:
                     return Response(
                         {'error': 'Can only assign to your teams'}, 
                         status=status.HTTP_403_FORBIDDEN
                     )
         
+        if auto:
+            assigned_to_id = least_loaded_member(assigned_to_team_id)
+            if assigned_to_id is None:
+                return Response({'error': 'Team has no active members'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Update ticket assignment
+        before = ticket_buckets(ticket)
+        owners = (ticket.assigned_to_team_id, ticket.assigned_to_id)
         ticket.assigned_to_id = assigned_to_id
         ticket.assigned_to_team_id = assigned_to_team_id
+        ticket.change_seq = ChangeCounter.advance()
         ticket.save()
+        if owners != (assigned_to_team_id, assigned_to_id):
+            Tombstone.record_moves(ticket.change_seq, [(ticket, owners)])
+        record_ticket_changes(added=[ticket], removed=[before])
+        publish_ticket_event(EventType.TICKET_ASSIGNED, ticket, ticket.change_seq, before=owners)
         
-        serializer = TicketSerializer(ticket)
-        return Response(serializer.data)
+        # reload so the new assignee and team come back joined
+        ticket = Ticket.objects.with_related(comment_limit=LATEST_COMMENTS).get(pk=ticket.pk)
+        return Response(ticket_detail(request, ticket))
+
+
+class TicketStatsView(APIView):
+    """
+    Ticket counts by status, priority, category and team, over the tickets
+    the user may read
+
+    Admins and can_view_all_tickets members read the TicketStat rollup,
+    everyone else gets their visible tickets counted.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        auth = get_auth(request)
+        if auth.has_perm(Perm.VIEW_ALL_TICKETS):
+            rows = TicketStat.objects.filter(count__gt=0).values_list('dimension', 'key', 'count')
+            counts = {(dimension, key): count for dimension, key, count in rows}
+        else:
+            counts = ticket_counts(visible_tickets(auth, model.objects.all()) for model in (Ticket, ArchivedTicket))
+        buckets = defaultdict(dict)
+        for (dimension, key), count in counts.items():
+            buckets[dimension][key] = count
+        
+        categories = dict(Category.objects.filter(
+            pk__in=buckets[TicketStat.Dimension.CATEGORY]).values_list('id', 'name'))
+        teams = dict(Team.objects.filter(
+            pk__in=buckets[TicketStat.Dimension.TEAM]).values_list('id', 'name'))
+        
+        return Response({
+            'total': sum(buckets[TicketStat.Dimension.STATUS].values()),
+            'by_status': [
+                {'status': key, 'label': Ticket.Status(key).label, 'count': count}
+                for key, count in sorted(buckets[TicketStat.Dimension.STATUS].items())
+            ],
+            'by_priority': [
+                {'priority': key, 'label': Ticket.Priority(key).label, 'count': count}
+                for key, count in sorted(buckets[TicketStat.Dimension.PRIORITY].items())
+            ],
+            'by_category': [
+                {'category': key or None, 'name': categories.get(key), 'count': count}
+                for key, count in sorted(buckets[TicketStat.Dimension.CATEGORY].items())
+            ],
+            'by_team': [
+                {'team': key or None, 'name': teams.get(key), 'count': count}
+                for key, count in sorted(buckets[TicketStat.Dimension.TEAM].items())
+            ],
+        })
+
+
+def with_age(work, now):
+    # seconds the oldest open ticket has waited, the report caches the timestamp
+    oldest = work['oldest_open_at']
+    return {**work, 'oldest_open_age': int((now - oldest).total_seconds()) if oldest else None}
+
+
+class TicketWorkloadView(APIView):
+    """
+    Open, in progress and urgent tickets per team and per member, and how
+    long the oldest open ticket has waited
+
+    Admins and teams that can view all tickets see every team, team leads
+    the teams they lead. ?team=1,2 narrows it down. 'unassigned' counts a
+    team's tickets that no member of the team holds.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        auth = get_auth(request)
+        if auth.has_perm(Perm.VIEW_ALL_TICKETS):
+            allowed = None
+        elif auth.is_team_lead:
+            allowed = auth.led_team_ids
+        else:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        wanted = team_filter(request.query_params)
+        
+        now = timezone.now()
+        teams = []
+        for team in sorted(workload_report().values(), key=lambda team: team['name']):
+            if (allowed is not None and team['id'] not in allowed) or (wanted and team['id'] not in wanted):
+                continue
+            teams.append({
+                **with_age(team, now),
+                'unassigned': with_age(team['unassigned'], now),
+                'members': [with_age(member, now) for member in team['members']],
+            })
+        return Response({'teams': teams})
 
 
 class CommentListView(APIView):
+    """A ticket's comments newest first, cursor paginated"""
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', 'id')
     
     def get(self, request, ticket_pk):
-        try:
-            ticket = Ticket.objects.get(pk=ticket_pk)
-        except Ticket.DoesNotExist:
-            return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
+        auth = get_auth(request)
+        model, serializer_class = Comment, CommentSerializer
+        if not visible_tickets(auth, Ticket.objects.filter(pk=ticket_pk)).exists():
+            if not visible_tickets(auth, ArchivedTicket.objects.filter(pk=ticket_pk)).exists():
+                return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
+            model, serializer_class = ArchivedComment, ArchivedCommentSerializer
         
-        comments = ticket.comments.all()
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        paginator.ordering = self.ordering
+        comments = model.objects.filter(ticket_id=ticket_pk).select_related('author')
+        page = paginator.paginate_queryset(comments, request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request, ticket_pk):
         try:
-            ticket = Ticket.objects.get(pk=ticket_pk)
+            tickets = visible_tickets(get_auth(request), Ticket.objects.only(
+                'id', 'created_by', 'assigned_to', 'assigned_to_team'
+            ))
+            ticket = tickets.get(pk=ticket_pk)
         except Ticket.DoesNotExist:
             return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
         
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(ticket=ticket, author=request.user)
+            with transaction.atomic():
+                comment = serializer.save(ticket=ticket, author=request.user)
+                seq = ChangeCounter.advance()
+                Ticket.objects.filter(pk=ticket.pk).comment_added(comment.created_at, seq=seq)
+                publish_ticket_event(EventType.COMMENT_CREATED, ticket, seq, comment_id=comment.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -215,27 +824,36 @@ class CommentDetailView(APIView):
     
     def patch(self, request, pk):
         try:
-            comment = Comment.objects.get(pk=pk)
+            comment = Comment.objects.with_ticket_owner().select_related('author').get(pk=pk)
         except Comment.DoesNotExist:
             return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if comment.author != request.user and not request.user.is_admin:
+        if comment.author_id != request.user.id and not request.user.is_admin:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         serializer = CommentSerializer(comment, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                seq = ChangeCounter.advance()
+                Ticket.objects.filter(pk=comment.ticket_id).touch_activity(timezone.now(), seq=seq)
+                publish_ticket_event(EventType.COMMENT_UPDATED, comment.ticket, seq, comment_id=comment.pk)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def delete(self, request, pk):
         try:
-            comment = Comment.objects.get(pk=pk)
+            comment = Comment.objects.with_ticket_owner().get(pk=pk)
         except Comment.DoesNotExist:
             return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if comment.author != request.user and not request.user.is_admin:
+        if comment.author_id != request.user.id and not request.user.is_admin:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        comment.delete()
+        with transaction.atomic():
+            seq = ChangeCounter.advance()
+            Tombstone.for_ticket(seq, Tombstone.Kind.COMMENT, comment.ticket, object_id=comment.pk).save()
+            publish_ticket_event(EventType.COMMENT_DELETED, comment.ticket, seq, comment_id=comment.pk)
+            comment.delete()
+            Ticket.objects.filter(pk=comment.ticket_id).comment_removed(seq=seq)
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
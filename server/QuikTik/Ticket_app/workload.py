@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, Count, Exists, F, FilteredRelation, Min, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from Team_app.models import Team, TeamMembership
+from .models import ACTIVE_STATUSES, MemberWorkload, Ticket
+
+
+PRIORITY_WEIGHTS = {
+    Ticket.Priority.URGENT: 8,
+    Ticket.Priority.HIGH: 4,
+    Ticket.Priority.MEDIUM: 2,
+    Ticket.Priority.LOW: 1,
+}
+
+
+def ticket_load(ticket):
+    """(assignee id, weight) a ticket adds to its assignee's workload, or None"""
+    if ticket.assigned_to_id and ticket.status in ACTIVE_STATUSES:
+        return ticket.assigned_to_id, PRIORITY_WEIGHTS.get(ticket.priority, 1)
+    return None
+
+
+def apply_load_deltas(deltas):
+    """
+    deltas maps a user id to (open_count delta, load delta)
+
+    Each row is bumped with UPDATE ... SET load = load + delta so concurrent
+    writers never lose each other's changes. Like ChangeCounter.advance()
+    the row is only created when the update finds none, an assignee's
+    first ticket, so the usual write costs one query per assignee. Both
+    stop at 0, a row that missed a ticket's increment must not fall below
+    an idle member (reconcile_ticket_stats puts drifted rows right).
+    """
+    for user, (count, load) in sorted(deltas.items()):
+        if not (count or load):
+            continue
+        rows = MemberWorkload.objects.filter(user_id=user)
+        values = {'open_count': Greatest(F('open_count') + count, 0), 'load': Greatest(F('load') + load, 0)}
+        if not rows.update(**values):
+            MemberWorkload.objects.bulk_create([MemberWorkload(user_id=user)], ignore_conflicts=True)
+            rows.update(**values)
+
+
+def actual_loads():
+    """
+    user id -> (open_count, load) counted straight from the ticket table
+
+    Only live tickets, the archive only takes resolved and closed ones
+    """
+    weight = Case(*(When(priority=priority, then=Value(w)) for priority, w in PRIORITY_WEIGHTS.items()), default=Value(1))
+    rows = Ticket.objects.filter(status__in=ACTIVE_STATUSES, assigned_to__isnull=False).order_by().values(
+        'assigned_to'
+    ).annotate(open_count=Count('id'), load=Sum(weight))
+    return {row['assigned_to']: (row['open_count'], row['load']) for row in rows}
+
+
+def least_loaded_member(team_id):
+    """
+    The active member of team_id with the lowest workload, or None
+
+    Reads MemberWorkload rows by primary key for the team's memberships
+    instead of counting tickets. Ties go to fewer open tickets, then the
+    lower user id. Locks the team row until the caller's transaction ends,
+    call inside one and save the assignment before it commits: two
+    auto-assignments into one team then take turns and the second sees the
+    load the first added, rather than both picking the same member.
+    """
+    if not Team.objects.select_for_update().filter(pk=team_id).exists():
+        return None
+    return TeamMembership.objects.filter(team_id=team_id, user__is_active=True).annotate(
+        load=Coalesce('user__workload__load', 0),
+        open_count=Coalesce('user__workload__open_count', 0),
+    ).order_by('load', 'open_count', 'user_id').values_list('user_id', flat=True).first()
+
+
+REPORT_CACHE_KEY = 'tickets:workload-report'
+COUNTS = ('open', 'in_progress', 'urgent')
+
+
+def _work_counts(prefix=''):
+    # per group: open, in progress and urgent tickets and the oldest open one
+    status, priority, created = f'{prefix}status', f'{prefix}priority', f'{prefix}created_at'
+    return {
+        'open': Count(f'{prefix}id', filter=Q(**{status: Ticket.Status.OPEN})),
+        'in_progress': Count(f'{prefix}id', filter=Q(**{status: Ticket.Status.IN_PROGRESS})),
+        'urgent': Count(f'{prefix}id', filter=Q(**{priority: Ticket.Priority.URGENT})),
+        'oldest_open_at': Min(created, filter=Q(**{status: Ticket.Status.OPEN})),
+    }
+
+
+def _report_rows():
+    """
+    (team, team name, user, email, first name, last name, open, in progress, urgent, oldest open)
+
+    One grouped query: every membership LEFT JOINed to its member's active
+    tickets in that team, UNION the team's active tickets that nobody in
+    the team holds (unassigned, or assigned to a non-member) with user None.
+    """
+    counts = _work_counts('work__')
+    members = TeamMembership.objects.annotate(
+        work=FilteredRelation('user__assigned_tickets', condition=Q(
+            user__assigned_tickets__assigned_to_team=F('team'),
+            user__assigned_tickets__status__in=ACTIVE_STATUSES,
+        )),
+    ).values(
+        'team_id', 'team__name', 'user_id', 'user__email', 'user__first_name', 'user__last_name',
+    ).annotate(**counts).values_list(
+        'team_id', 'team__name', 'user_id', 'user__email', 'user__first_name', 'user__last_name', *counts,
+    ).order_by()
+
+    held_by_member = TeamMembership.objects.filter(team=OuterRef('assigned_to_team'), user=OuterRef('assigned_to'))
+    blank = Value('', output_field=models.CharField())
+    queue = Ticket.objects.filter(
+        ~Exists(held_by_member), status__in=ACTIVE_STATUSES, assigned_to_team__isnull=False,
+    ).values('assigned_to_team', 'assigned_to_team__name').annotate(
+        no_user=Value(None, output_field=models.BigIntegerField()), email=blank, first_name=blank, last_name=blank,
+        **_work_counts(),
+    ).values_list(
+        'assigned_to_team', 'assigned_to_team__name', 'no_user', 'email', 'first_name', 'last_name', *counts,
+    ).order_by()
+    return members.union(queue, all=True)
+
+
+def workload_report():
+    """
+    Per team open / in progress / urgent counts and oldest open ticket, with
+    the same per member and for tickets no member holds ('unassigned')
+
+    Cached for WORKLOAD_REPORT_CACHE_TIMEOUT seconds, every ticket write
+    drops it (record_ticket_changes), as do team and membership changes
+    (Team_app.signals, Team_app.bulk). Returns {team id: team dict},
+    oldest_open_at stays a datetime so callers can work out ages when they
+    serve it.
+    """
+    report = cache.get(REPORT_CACHE_KEY)
+    if report is not None:
+        return report
+
+    report = {}
+    for team_id, team_name, user_id, email, first_name, last_name, *values in _report_rows():
+        work = dict(zip((*COUNTS, 'oldest_open_at'), values))
+        team = report.setdefault(team_id, {
+            'id': team_id, 'name': team_name, **dict.fromkeys(COUNTS, 0), 'oldest_open_at': None,
+            'unassigned': None, 'members': [],
+        })
+        for name in COUNTS:
+            team[name] += work[name]
+        if work['oldest_open_at'] and (team['oldest_open_at'] is None or work['oldest_open_at'] < team['oldest_open_at']):
+            team['oldest_open_at'] = work['oldest_open_at']
+        if user_id is None:
+            team['unassigned'] = work
+        else:
+            name = f'{first_name or ""} {last_name or ""}'.strip()
+            team['members'].append({'user': user_id, 'email': email, 'name': name, **work})
+
+    empty = {**dict.fromkeys(COUNTS, 0), 'oldest_open_at': None}
+    for team in report.values():
+        team['unassigned'] = team['unassigned'] or dict(empty)
+        team['members'].sort(key=lambda member: member['email'])
+    cache.set(REPORT_CACHE_KEY, report, getattr(settings, 'WORKLOAD_REPORT_CACHE_TIMEOUT', 30))
+    return report
+
+
+def invalidate_workload_report():
+    # straight away and on commit, like QuikTik.authz.invalidate_roles
+    cache.delete(REPORT_CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(REPORT_CACHE_KEY))
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UserAppConfig(AppConfig):
     name = 'User_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
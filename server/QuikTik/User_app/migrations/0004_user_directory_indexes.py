@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 18:10
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+# user directory search (User_app.search), not declared on the model because
+# the index type depends on the database: trigram GIN on PostgreSQL, plain
+# LOWER() expression indexes for prefix ranges elsewhere
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(
+                f'CREATE INDEX user_{field}_trgm_idx ON "User_app_user" USING gin (UPPER("{field}") gin_trgm_ops)'
+            )
+    else:
+        User = apps.get_model('User_app', 'User')
+        for field in SEARCH_FIELDS:
+            schema_editor.add_index(User, models.Index(Lower(field), name=f'user_{field}_prefix_idx'))
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_trgm_idx')
+    else:
+        User = apps.get_model('User_app', 'User')
+        for field in SEARCH_FIELDS:
+            schema_editor.remove_index(User, models.Index(Lower(field), name=f'user_{field}_prefix_idx'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_app', '0003_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -28,6 +28,7 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=50, null=True, blank=True)
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.USER)
     email = models.EmailField(unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
     username = None
     
     objects = UserManager()
@@ -40,6 +41,10 @@ class User(AbstractUser):
     
     @property
     def is_team_lead(self):
+        # answered from prefetched memberships when a list view loaded them,
+        # for the request user use QuikTik.authz.get_auth(request) instead
+        if 'team_memberships' in getattr(self, '_prefetched_objects_cache', {}):
+            return any(membership.role == 'lead' for membership in self.team_memberships.all())
         return self.team_memberships.filter(role='lead').exists()
     
     @property
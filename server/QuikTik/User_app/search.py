@@ -0,0 +1,36 @@
+from functools import reduce
+from operator import or_
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+# columns a directory search matches the start of, each has an index from migration 0004
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+# sorts after anything a column can hold, closes the prefix range
+PREFIX_END = '\U0010ffff'
+
+
+def search_users(queryset, text):
+    """
+    Filters users so every term of text starts their email, first or last name
+
+    PostgreSQL uses istartswith, served by the trigram GIN indexes on
+    UPPER(column) (terms under three characters fall back to a scan).
+    Other backends get a range over LOWER(column), which the plain
+    expression indexes serve like any prefix lookup.
+    """
+    terms = text.lower().split()
+    if not terms:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        for term in terms:
+            queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__istartswith': term}) for field in SEARCH_FIELDS)))
+        return queryset
+
+    queryset = queryset.annotate(**{f'{field}_lower': Lower(field) for field in SEARCH_FIELDS})
+    for term in terms:
+        queryset = queryset.filter(reduce(or_, (
+            Q(**{f'{field}_lower__gte': term, f'{field}_lower__lt': term + PREFIX_END}) for field in SEARCH_FIELDS
+        )))
+    return queryset
@@ -1,12 +1,13 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from QuikTik.authz import get_auth
 from Team_app.serializers import TeamMembershipSerializer
 from .models import User
 
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(read_only=True)
-    is_team_lead = serializers.BooleanField(read_only=True)
+    is_team_lead = serializers.SerializerMethodField()
     teams = serializers.SerializerMethodField()
     
     class Meta:
@@ -19,13 +20,20 @@ class UserSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         
         # Only admin and team leads can see role, is_active, and teams
-        if request and not (request.user.is_admin or request.user.is_team_lead):
+        auth = get_auth(request) if request else None
+        if auth and not (auth.is_admin or auth.is_team_lead):
             fields.pop('role', None)
             fields.pop('is_active', None)
             fields.pop('teams', None)
         
         return fields
     
+    def get_is_team_lead(self, obj):
+        request = self.context.get('request')
+        if request and obj.pk == request.user.pk:
+            return get_auth(request).is_team_lead
+        return obj.is_team_lead
+    
     def get_teams(self, obj):
         return TeamMembershipSerializer(obj.team_memberships.all(), many=True).data
 
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from QuikTik.authentication import forget_tokens
+from .models import User
+
+
+# CachedTokenAuthentication keeps a copy of the user next to the token,
+# any change to the user (deactivation, role, name) drops it
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # skips the last_login save on every login
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    forget_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # logout, or the user's deletion cascading
+    forget_tokens([instance.key])
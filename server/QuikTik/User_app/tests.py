@@ -1,3 +1,183 @@
-from django.test import TestCase
+import asyncio
+import threading
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from QuikTik.authz import AuthContext
+from QuikTik.hashing import PoolBusy, get_pool
+from QuikTik.permissions import SpecialPermission
+from QuikTik.testing import QueryBudgetTestCase
+from Team_app.models import TeamMembership
+from .models import User
 
-# Create your tests here.
+
+class AuthContextTests(QueryBudgetTestCase):
+    def test_roles_load_once(self):
+        auth = AuthContext(self.lead)
+        with self.assertNumQueries(1):
+            self.assertTrue(auth.is_team_lead)
+            self.assertTrue(auth.leads(self.team.pk))
+            self.assertFalse(auth.leads(self.other_team.pk))
+            self.assertEqual(auth.led_team_ids, {self.team.pk})
+            self.assertEqual(auth.team_ids, {self.team.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(AuthContext(self.admin).is_admin)
+
+    def test_special_permission(self):
+        factory = APIRequestFactory()
+        for user, allowed in ((self.admin, True), (self.lead, True), (self.member, False)):
+            request = factory.post('/')
+            request.user = user
+            self.assertEqual(SpecialPermission().has_permission(request, None), allowed)
+
+    def test_user_list_does_not_grow_with_rows(self):
+        client = self.client_for(self.lead)
+        client.get('/api/v1/user/all/')  # warm the role cache
+        with CaptureQueriesContext(connection) as small:
+            client.get('/api/v1/user/all/')
+        for n in range(10):
+            user = User.objects.create_user(f'extra{n}@example.com', 'pass1234a')
+            TeamMembership.objects.create(user=user, team=self.other_team, role=TeamMembership.TeamRole.LEAD)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get('/api/v1/user/all/')
+        self.assertEqual(len(response.data['results']), 13)
+        self.assertEqual(len(small), len(large))
+        leads = {row['email'] for row in response.data['results'] if row['is_team_lead']}
+        self.assertEqual(leads, {'lead@example.com'} | {f'extra{n}@example.com' for n in range(10)})
+
+
+class CachedTokenAuthenticationTests(QueryBudgetTestCase):
+    url = '/api/v1/user/current/'
+
+    def test_warm_request_skips_token_lookup(self):
+        client = self.client_for(self.member)
+        client.get('/api/v1/ticket/stats/')
+        with CaptureQueriesContext(connection) as ctx:
+            client.get('/api/v1/ticket/stats/')
+        self.assertFalse([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+
+    def test_logout_revokes(self):
+        client = self.client_for(self.member)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.post('/api/v1/user/logout/').status_code, 200)
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+    def test_deactivation_revokes(self):
+        client = self.client_for(self.member)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.client_for(self.admin).delete(f'/api/v1/user/{self.member.pk}/')
+        self.assertEqual(client.get(self.url).status_code, 401)
+
+    def test_role_change_applies(self):
+        client = self.client_for(self.member)
+        self.assertEqual(client.post('/api/v1/ticket/categories/', {'name': 'Net'}).status_code, 403)
+        self.client_for(self.admin).patch(f'/api/v1/user/{self.member.pk}/', {'role': 'admin'}, format='json')
+        self.assertEqual(client.post('/api/v1/ticket/categories/', {'name': 'Net'}).status_code, 201)
+
+
+class QuickPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 1000
+
+
+class SignInTests(QueryBudgetTestCase):
+    login_url = '/api/v1/user/login/'
+
+    def login(self, password='pass1234a', email='member@example.com'):
+        return self.client.post(self.login_url, {'email': email, 'password': password}, content_type='application/json')
+
+    def test_login(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], self.tokens[self.member.pk])
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login(email='nobody@example.com').status_code, 401)
+        User.objects.filter(pk=self.member.pk).update(is_active=False)
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_register(self):
+        response = self.client.post('/api/v1/user/register/', {
+            'email': 'New@Example.com', 'password': 'pass1234a', 'first_name': 'New',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        user = User.objects.get(email='New@example.com')
+        self.assertTrue(user.check_password('pass1234a'))
+        self.assertEqual(response.json()['token'], user.auth_token.key)
+        response = self.client.post('/api/v1/user/register/', {'email': 'New@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    @override_settings(PASSWORD_HASHERS=[
+        'User_app.tests.QuickPBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_login_upgrades_hash(self):
+        # stored by a hasher that is still accepted but no longer the default
+        User.objects.filter(pk=self.member.pk).update(password=make_password('pass1234a', hasher='md5'))
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.member.refresh_from_db()
+        self.assertTrue(self.member.password.startswith('md5$'))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.member.refresh_from_db()
+        self.assertTrue(self.member.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    async def test_full_pool_answers_503(self):
+        release = threading.Event()
+        blocked = asyncio.ensure_future(get_pool().run(release.wait))
+        await asyncio.sleep(0)
+        try:
+            with self.assertRaises(PoolBusy):
+                await get_pool().run(len, 'x')
+            response = await self.async_client.post(
+                self.login_url, {'email': 'member@example.com', 'password': 'pass1234a'},
+                content_type='application/json')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+        finally:
+            release.set()
+            await blocked
+        self.assertEqual(get_pool().pending, 0)
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    def test_current_user(self):
+        self.assertQueryBudget(2, self.lead, 'get', '/api/v1/user/current/', status_code=200)
+
+    def test_user_list(self):
+        # a page of users, then their memberships with the teams joined
+        self.assertQueryBudget(2, self.admin, 'get', '/api/v1/user/all/', status_code=200)
+
+    def test_user_detail(self):
+        self.assertQueryBudget(2, self.admin, 'get', f'/api/v1/user/{self.lead.pk}/', status_code=200)
+
+
+class UserDirectoryTests(QueryBudgetTestCase):
+    url = '/api/v1/user/all/'
+
+    def emails(self, **params):
+        response = self.client_for(self.admin).get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['email'] for row in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.emails(role='admin'), ['admin@example.com'])
+        self.assertEqual(self.emails(team=self.other_team.pk), ['member@example.com'])
+        User.objects.filter(pk=self.member.pk).update(is_active=False)
+        self.assertEqual(self.emails(is_active='false'), ['member@example.com'])
+        self.assertEqual(self.client_for(self.admin).get(self.url, {'role': 'owner'}).status_code, 400)
+
+    def test_prefix_search(self):
+        self.assertEqual(self.emails(q='MEM'), ['member@example.com'])
+        # first and last name, every word has to match the start of one
+        self.assertEqual(self.emails(q='lea lead'), ['lead@example.com'])
+        self.assertEqual(self.emails(q='example'), [])
+
+    def test_paginates_by_email(self):
+        client = self.client_for(self.admin)
+        page = client.get(self.url, {'page_size': 2}).data
+        self.assertEqual([row['email'] for row in page['results']], ['admin@example.com', 'lead@example.com'])
+        page = client.get(page['next']).data
+        self.assertEqual([row['email'] for row in page['results']], ['member@example.com'])
@@ -1,44 +1,114 @@
-from django.contrib.auth import authenticate
+import json
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Prefetch, prefetch_related_objects
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
+from QuikTik.authz import get_auth
+from QuikTik.conditional import conditional_get
+from QuikTik.hashing import PoolBusy, acheck_password, ahash_password
+from QuikTik.pagination import KeysetPagination
+from Team_app.models import TeamMembership
 from .models import User
+from .search import search_users
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
 
 
-class RegisterView(APIView):
-    def post(self, request):
-        serializer = RegisterSerializer(data=request.data)
-        if serializer.is_valid():
-            user = serializer.save()
-            token = Token.objects.create(user=user)
-            return Response({
-                'email': user.email,
-                'role': user.role,
-                'token': token.key
-            }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def request_data(request):
+    # the JSON body the client sends, or a form post
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
 
 
-class LoginView(APIView):
-    def post(self, request):
-        serializer = LoginSerializer(data=request.data)
-        if serializer.is_valid():
-            user = authenticate(
-                email=serializer.validated_data['email'],
-                password=serializer.validated_data['password']
+def pool_busy():
+    response = JsonResponse(
+        {'error': 'Too many sign-ins in progress, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RegisterView(View):
+    """
+    Creates an account and returns its token
+
+    Async so an ASGI worker isn't held up while the password is hashed, the
+    hashing runs on QuikTik.hashing's bounded pool and a full pool answers
+    503 with Retry-After.
+    """
+
+    async def post(self, request):
+        try:
+            serializer = RegisterSerializer(data=request_data(request))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+        # the unique email check queries
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = dict(serializer.validated_data)
+        try:
+            encoded = await ahash_password(fields.pop('password'))
+        except PoolBusy:
+            return pool_busy()
+        # what User.objects.create_user() does, with the hash made off the loop
+        user = User(email=User.objects.normalize_email(fields.pop('email')), password=encoded, **fields)
+        await user.asave()
+        token = await Token.objects.acreate(user=user)
+        return JsonResponse({
+            'email': user.email,
+            'role': user.role,
+            'token': token.key
+        }, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class LoginView(View):
+    """
+    Exchanges email and password for the user's token
+
+    Checks the password like ModelBackend (inactive users and unknown emails
+    get the same 401 after the same hashing work) but on the hashing pool.
+    A password stored with an outdated hasher or work factor is rehashed
+    with the current PASSWORD_HASHERS[0] on a successful login.
+    """
+
+    async def post(self, request):
+        try:
+            serializer = LoginSerializer(data=request_data(request))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await User.objects.filter(email=serializer.validated_data['email']).afirst()
+        try:
+            is_correct, upgraded = await acheck_password(
+                serializer.validated_data['password'], user.password if user else None
             )
-            if user:
-                token, _ = Token.objects.get_or_create(user=user)
-                return Response({
-                    'email': user.email,
-                    'role': user.role,
-                    'token': token.key
-                })
-            return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except PoolBusy:
+            return pool_busy()
+        if not (is_correct and user.is_active):
+            return JsonResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        if upgraded:
+            # a plain update, the new hash is no reason to drop cached tokens
+            await User.objects.filter(pk=user.pk).aupdate(password=upgraded)
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return JsonResponse({
+            'email': user.email,
+            'role': user.role,
+            'token': token.key
+        })
 
 
 class LogoutView(APIView):
@@ -49,26 +119,80 @@ class LogoutView(APIView):
         return Response({'message': 'Logged out successfully'})
 
 
+def memberships():
+    # is_team_lead and teams read these, one query for the memberships with their teams
+    return Prefetch('team_memberships', queryset=TeamMembership.objects.select_related('team'))
+
+
+def filter_users(queryset, params):
+    """?role=admin  ?is_active=false  ?team=3  ?q=prefix of email or name"""
+    role = params.get('role')
+    if role:
+        if role not in User.Role.values:
+            raise ValidationError({'role': [f"Expected one of {', '.join(User.Role.values)}"]})
+        queryset = queryset.filter(role=role)
+    active = params.get('is_active')
+    if active:
+        if active.lower() not in ('true', 'false', '1', '0'):
+            raise ValidationError({'is_active': ['Expected true or false']})
+        queryset = queryset.filter(is_active=active.lower() in ('true', '1'))
+    team = params.get('team')
+    if team:
+        try:
+            queryset = queryset.filter(team_memberships__team_id=int(team))
+        except ValueError:
+            raise ValidationError({'team': ['Expected a team id']})
+    return search_users(queryset, params.get('q', ''))
+
+
+def current_user_validator(request):
+    # the user row is already loaded by authentication, only memberships need a query
+    user = request.user
+    summary = TeamMembership.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        memberships_modified=Max('updated_at'),
+        teams_modified=Max('team__updated_at'),
+    )
+    last_modified = max(
+        (value for value in (user.updated_at, summary['memberships_modified'], summary['teams_modified']) if value),
+    )
+    return (user.pk, user.updated_at, *summary.values()), last_modified
+
+
 class CurrentUserView(APIView):
     """Get the currently logged-in user's data"""
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(current_user_validator)
     def get(self, request):
+        prefetch_related_objects([request.user], memberships())
         serializer = UserSerializer(request.user, context={'request': request})
         return Response(serializer.data)
 
 
 class UserListView(APIView):
+    """
+    The user directory by email, cursor paginated
+
+    Filter with ?role=, ?is_active= and ?team=, ?q= matches the start of
+    the email, first or last name (every word has to match one).
+    """
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ('email', 'id')
     
     def get(self, request):
         # Admin and team leads can view all users
-        if not (request.user.is_admin or request.user.is_team_lead):
+        auth = get_auth(request)
+        if not (auth.is_admin or auth.is_team_lead):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True, context={'request': request})
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        paginator.ordering = self.ordering
+        users = filter_users(User.objects.prefetch_related(memberships()), request.query_params)
+        page = paginator.paginate_queryset(users, request, view=self)
+        serializer = UserSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         # Only admin can create users
@@ -87,12 +211,13 @@ class UserDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            user = User.objects.get(pk=pk)
+            user = User.objects.prefetch_related(memberships()).get(pk=pk)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Users can view themselves, admin/team leads can view anyone
-        if not (request.user == user or request.user.is_admin or request.user.is_team_lead):
+        auth = get_auth(request)
+        if not (request.user == user or auth.is_admin or auth.is_team_lead):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         serializer = UserSerializer(user, context={'request': request})
@@ -100,7 +225,7 @@ class UserDetailView(APIView):
     
     def patch(self, request, pk):
         try:
-            user = User.objects.get(pk=pk)
+            user = User.objects.prefetch_related(memberships()).get(pk=pk)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         